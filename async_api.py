@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import threading
+import time
+from http import HTTPStatus
+
+import aiohttp
+import telegram
+
+import breaker
+import config
+import exceptions
+import frontend
+import homework
+import http_pool
+import metrics
+import notifiers
+import scheduler
+import send_queue
+import snapshot
+import state
+import tenants
+import vault
+
+logger = logging.getLogger('homework.async_api')
+
+POLL_CONCURRENCY = 100
+
+
+def apply_config(settings):
+    global POLL_CONCURRENCY
+    POLL_CONCURRENCY = settings.poll_concurrency
+
+
+config.on_reload(apply_config)
+
+
+async def async_get_api_answer(session, current_timestamp, headers):
+    """Асинхронный запрос к API Яндекс.Домашка."""
+    timestamp = current_timestamp or int(time.time())
+    params = {'from_date': timestamp}
+    breaker.PRACTICUM.check()
+    started = time.perf_counter()
+    try:
+        async with session.get(homework.ENDPOINT,
+                               headers=headers,
+                               params=params) as api_answer:
+            homework.record_api_status(api_answer.status)
+            if api_answer.status != HTTPStatus.OK:
+                raise homework.status_error(api_answer.status)
+            response = await api_answer.json(content_type=None)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+        breaker.PRACTICUM.failure()
+        message = f'Ошибка при запросе к API: {error}'
+        raise exceptions.ApiUnavailable(message) from error
+    finally:
+        metrics.API_LATENCY.observe(time.perf_counter() - started)
+    if response is None:
+        message = 'Пустой ответ от API.'
+        raise exceptions.ApiEmptyResponse(message)
+    return response
+
+
+async def async_poll_tenant(session, semaphore, bot, tenant, store=None):
+    """Опрашиваем подписку, ограничивая число одновременных запросов.
+
+    Возвращаем паузу до следующего опроса этой подписки.
+    """
+    try:
+        async with semaphore:
+            response = await async_get_api_answer(
+                session, tenant.timestamp, tenant.headers)
+        statuses = await asyncio.to_thread(
+            tenants.apply_response, bot, tenant, response, store)
+    except Exception as error:
+        await asyncio.to_thread(tenants.report_error, bot, tenant, error)
+        return scheduler.next_delay(tenant, error=error,
+                                    base=homework.RETRY_TIME)
+    return scheduler.next_delay(tenant, statuses, base=homework.RETRY_TIME)
+
+
+async def async_poll_all(session, bot, registry,
+                         concurrency=None, store=None):
+    """Один цикл опроса всех подписок с конкурентными запросами."""
+    semaphore = asyncio.Semaphore(concurrency or POLL_CONCURRENCY)
+    jobs = [async_poll_tenant(session, semaphore, bot, tenant, store)
+            for tenant in registry]
+    await asyncio.gather(*jobs)
+    return len(jobs)
+
+
+async def async_run_scheduled(session, bot, registry, store=None,
+                              concurrency=None, stop=None,
+                              snapshot_path=None):
+    """Опрашиваем подписки по адаптивному расписанию пачками.
+
+    Без `concurrency` предел берётся из `POLL_CONCURRENCY` и меняется
+    после перечитывания конфигурации. Новый семафор создаётся между
+    пачками, когда запросов прежней пачки уже нет. После `stop` текущая
+    пачка доводится до конца, и расписание записывается в снимок.
+    """
+    limit = concurrency or POLL_CONCURRENCY
+    semaphore = asyncio.Semaphore(limit)
+    stop = stop or threading.Event()
+    timetable = scheduler.Timetable()
+    snapshot.restore(registry, timetable, time.time(), snapshot_path)
+    while not stop.is_set():
+        if concurrency is None and limit != POLL_CONCURRENCY:
+            limit = POLL_CONCURRENCY
+            semaphore = asyncio.Semaphore(limit)
+        now = time.time()
+        tenants.schedule_new(registry, timetable, now)
+        due = [tenant for tenant in timetable.pop_due(now)
+               if registry.holds(tenant)]
+        if due:
+            metrics.SCHEDULER_LAG.set(now - due[0].due)
+        delays = await asyncio.gather(*(
+            async_poll_tenant(session, semaphore, bot, tenant, store)
+            for tenant in due))
+        for tenant, delay in zip(due, delays):
+            timetable.schedule(tenant, time.time() + delay)
+        if store is not None:
+            tenants.save_state(registry, store, bot)
+        tenants.report_digest(bot)
+        next_due = timetable.next_due() or now + homework.RETRY_TIME
+        await asyncio.to_thread(
+            registry.changed.wait, max(0.0, next_due - time.time()))
+    snapshot.save(((tenant.token, tenant) for tenant in registry),
+                  snapshot_path)
+
+
+async def async_main(bot, registry, store, concurrency=None, stop=None):
+    """Асинхронный цикл опроса всех подписок.
+
+    Число соединений ограничивает семафор опроса, а не пул: иначе предел
+    нельзя было бы поднять без перезапуска.
+    """
+    connector = aiohttp.TCPConnector(limit=concurrency or 0)
+    timeout = aiohttp.ClientTimeout(sock_connect=http_pool.CONNECT_TIMEOUT,
+                                    sock_read=http_pool.READ_TIMEOUT)
+    async with aiohttp.ClientSession(connector=connector,
+                                     timeout=timeout) as session:
+        await async_run_scheduled(session, bot, registry, store, concurrency,
+                                  stop)
+
+
+def main():
+    """Запускаем асинхронный опрос всех подписок."""
+    config.setup()
+    if not homework.TELEGRAM_TOKEN:
+        raise exceptions.TokenError('Проблема с токеном API Telegram!')
+    metrics.start_server()
+    vault.open_vault()
+    telegram_bot = telegram.Bot(token=homework.TELEGRAM_TOKEN)
+    sender = send_queue.SendQueue(telegram_bot).start()
+    config.on_reload(sender.apply_config)
+    bot = notifiers.build(sender)
+    store = state.StateStore()
+    registry = tenants.load_subscriptions(tenants.SUBSCRIPTIONS_FILE,
+                                          store=store)
+    tenants.restore_cursors(registry, store)
+    logger.info('Загружено подписок: %s', len(registry))
+    config.on_reload(
+        lambda _: tenants.reload_subscriptions(registry, store))
+    stop = snapshot.stop_on_signals(threading.Event(), registry.changed)
+    if tenants.SELF_SUBSCRIBE:
+        frontend.UpdatePoller(telegram_bot, registry, sender, store).start()
+    asyncio.run(async_main(bot, registry, store, stop=stop))
+    snapshot.drain(bot, sender, store)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import config
+import history
+import homework
+import http_pool
+import models
+import state
+import tenants
+import vault
+
+logger = logging.getLogger('homework.backfill')
+
+# Раньше 2019 года домашек в API нет, а from_date=0 API понял бы
+# как «с текущего момента».
+BACKFILL_SINCE = 1546300800
+BACKFILL_STEP = 90 * 24 * 3600
+BACKFILL_WORKERS = 4
+
+
+def split_ranges(start, end, step=BACKFILL_STEP):
+    """Делим [start, end) на диапазоны по `step` секунд."""
+    return [(left, min(left + step, end))
+            for left in range(start, end, step)]
+
+
+def fetch_range(start, end, headers, session=requests):
+    """Домашки, обновлённые в [start, end): список (домашка, момент).
+
+    У API есть только нижняя граница `from_date`, поэтому более поздние
+    домашки из ответа отбрасываются: их увидит бот при обычном опросе.
+    Домашки без `date_updated` остаются в списке с моментом None.
+    """
+    response = homework.request_api(start, headers, session)
+    found = []
+    for record in models.parse_homeworks(response):
+        updated = history.parse_time(record.date_updated)
+        if updated is None or start <= updated < end:
+            found.append((record, updated))
+    return found
+
+
+def split_found(found, start, end, step=BACKFILL_STEP):
+    """Раскладываем домашки из [start, end) по диапазонам `split_ranges`.
+
+    Домашки без `date_updated` попадают в первый диапазон.
+    """
+    buckets = [[] for _ in split_ranges(start, end, step)]
+    for record, updated in found:
+        index = 0 if updated is None else (updated - start) // step
+        buckets[index].append((record, updated))
+    return buckets
+
+
+def seed(store, chat_id, found, seen):
+    """Запоминаем статусы без уведомлений; возвращаем их число.
+
+    Домашку, статус которой уже известен, не трогаем: его мог записать
+    бот, опросивший API позже.
+    """
+    seeded = 0
+    for record, updated in found:
+        if record.name in seen:
+            continue
+        seen.add(record.name)
+        if store.get_status(chat_id, record.name) is not None:
+            continue
+        store.record(chat_id, record.name, record.status.value)
+        store.log_event(chat_id, record.name, record.status.value,
+                        updated or int(time.time()))
+        seeded += 1
+    return seeded
+
+
+def backfill(tenant, store, session=requests, since=BACKFILL_SINCE,
+             until=None, step=BACKFILL_STEP):
+    """Догружаем статусы подписки за всё время, не отправляя уведомлений.
+
+    API отдаёт всё, что обновлено после `from_date`, поэтому история
+    забирается одним запросом с места, где догрузка остановилась, и уже
+    на месте делится на диапазоны по `step` секунд. Диапазоны — только
+    контрольные точки: отметка о каждом пишется вместе с его статусами.
+    Граница `until` запоминается при первом запуске, так что прерванная
+    догрузка продолжается по тем же диапазонам.
+    """
+    chat_id = tenant.chat_id
+    progress = store.backfill_progress(tenant.token)
+    if progress is None:
+        progress = (since, until or int(time.time()), since)
+        store.mark_backfilled(tenant.token, *progress)
+        store.flush()
+    since, until, done = progress
+    ranges = split_ranges(done, until, step)
+    summary = {'ranges': len(ranges),
+               'skipped': len(split_ranges(since, done, step)),
+               'failed': 0, 'seeded': 0}
+    found = []
+    if ranges:
+        try:
+            found = fetch_range(done, until, tenant.headers, session)
+        except Exception as error:
+            summary['failed'] = len(ranges)
+            logger.error('История с %s не догружена: %s', done, error,
+                         extra={'chat_id': chat_id})
+            return summary
+    seen = set()
+    for (_, end), part in zip(ranges, split_found(found, done, until, step)):
+        summary['seeded'] += seed(store, chat_id, part, seen)
+        store.mark_backfilled(tenant.token, since, until, end)
+        store.flush()
+    if store.get_cursor(tenant.token) is None:
+        store.set_cursor(tenant.token, until)
+        store.flush()
+    return summary
+
+
+def report(tenant, summary):
+    logger.info('Догрузка: диапазонов %s, пропущено %s, со сбоем %s, '
+                'статусов %s', summary['ranges'], summary['skipped'],
+                summary['failed'], summary['seeded'],
+                extra={'chat_id': tenant.chat_id})
+
+
+def main():
+    """Догружаем статусы всех подписок или только перечисленных чатов.
+
+    Подписки догружаются параллельно в `BACKFILL_WORKERS` потоков, по
+    одному запросу к API на каждую.
+
+    Запуск: python backfill.py [chat_id ...]
+    """
+    config.setup()
+    vault.open_vault()
+    chats = set(sys.argv[1:])
+    store = state.StateStore()
+    session = http_pool.make_session(pool_size=BACKFILL_WORKERS)
+    registry = tenants.load_subscriptions(tenants.SUBSCRIPTIONS_FILE,
+                                          store=store)
+    selected = [tenant for tenant in registry
+                if not chats or str(tenant.chat_id) in chats]
+    with ThreadPoolExecutor(BACKFILL_WORKERS,
+                            thread_name_prefix='backfill') as pool:
+        for tenant, summary in zip(selected, pool.map(
+                lambda tenant: backfill(tenant, store, session), selected)):
+            report(tenant, summary)
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
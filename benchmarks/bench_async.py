@@ -0,0 +1,51 @@
+"""Задержка и пропускная способность синхронного и асинхронного опроса.
+
+Запуск: python -m benchmarks.bench_async [подписок] [задержка, с]
+"""
+import asyncio
+import sys
+import time
+
+import aiohttp
+
+import async_api
+import homework
+import tenants
+from benchmarks.bench_tenants import NullBot, build_registry
+from benchmarks.stub_server import start_stub
+
+
+async def run_async(registry, concurrency):
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        return await async_api.async_poll_all(
+            session, NullBot(), registry, concurrency)
+
+
+def report(name, polled, elapsed):
+    print(f'{name:>16}: {elapsed:6.2f} с, {polled / elapsed:7.0f} опросов/с')
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    server, url = start_stub(latency=latency)
+    homework.ENDPOINT = url
+    print(f'подписок: {count}, задержка API: {latency * 1000:.0f} мс')
+
+    registry = build_registry(count)
+    started = time.perf_counter()
+    polled = tenants.poll_all(NullBot(), registry)
+    report('requests.get', polled, time.perf_counter() - started)
+
+    for concurrency in (10, 50, 200):
+        registry = build_registry(count)
+        started = time.perf_counter()
+        polled = asyncio.run(run_async(registry, concurrency))
+        report(f'asyncio x{concurrency}', polled,
+               time.perf_counter() - started)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
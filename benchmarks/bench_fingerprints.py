@@ -0,0 +1,60 @@
+"""Сколько циклов опроса обходятся без разбора ответа и сколько CPU это даёт.
+
+Прогоняет одни и те же циклы опроса через заглушку Практикума в отдельном
+процессе: без отпечатков, с отпечатком тела и с ETag. Печатает долю
+пропущенных циклов, процессорное время клиента и его измеренную разницу
+с опросом без отпечатков: минус — экономия, плюс — режим дороже.
+
+Запуск: python -m benchmarks.bench_fingerprints [подписок] [циклов]
+"""
+import logging
+import sys
+import time
+
+import fingerprints
+import homework
+import http_pool
+import tenants
+from benchmarks.bench_tenants import NullBot, build_registry
+from benchmarks.stub_server import API_PATH, start_stub_process
+
+CHURN = 0.02
+PAGE_SIZE = 50
+
+
+def run_case(count, cycles, conditional, etag):
+    process, base_url = start_stub_process(churn=CHURN, etag=etag, seed=1,
+                                           page_size=PAGE_SIZE)
+    homework.ENDPOINT = base_url + API_PATH
+    tenants.CONDITIONAL_REQUESTS = conditional
+    fingerprints.STATS = fingerprints.Stats()
+    registry = build_registry(count)
+    for tenant in registry:
+        tenant.timestamp = 1
+    session = http_pool.make_session()
+    bot = NullBot()
+    started = time.process_time()
+    for _ in range(cycles):
+        tenants.poll_all(bot, registry, session)
+    cpu = time.process_time() - started
+    process.terminate()
+    return cpu, fingerprints.STATS.report()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    cycles = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    logging.getLogger('homework').setLevel(logging.WARNING)
+    print(f'подписок: {count}, циклов: {cycles}, churn: {CHURN}')
+    print('режим             | CPU клиента, с | пропущено | разница, с')
+    baseline, _ = run_case(count, cycles, False, False)
+    print(f'без отпечатков    | {baseline:>14.2f} | {"-":>9} | {"-":>10}')
+    for name, etag in (('отпечаток тела', False), ('ETag', True)):
+        cpu, report = run_case(count, cycles, True, etag)
+        print(f'{name:<17} | {cpu:>14.2f} | '
+              f'{report["skipped_percent"]:>8.0f}% | '
+              f'{cpu - baseline:>+10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Запросы аналитики по журналу из миллиона смен статусов.
+
+Запуск: python -m benchmarks.bench_history [событий]
+"""
+import random
+import sys
+import time
+
+import history
+
+HOMEWORKS = 20
+DAY = 86400
+
+
+def build(count, rng):
+    log = history.History()
+    students = max(count // (3 * HOMEWORKS), 1)
+    moment = 1640995200
+    while len(log) < count:
+        moment += rng.randrange(60)
+        chat = rng.randrange(students)
+        name = f'hw{rng.randrange(HOMEWORKS):02}'
+        log.append(chat, name, 'reviewing', moment)
+        log.append(chat, name, rng.choice(('approved', 'rejected')),
+                   moment + int(rng.expovariate(1 / DAY)))
+    return log
+
+
+def timed(title, func, repeat=100):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - started) / repeat
+    print(f'{title:<28} {elapsed * 1000:>8.3f} мс')
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    rng = random.Random(1)
+    started = time.perf_counter()
+    log = build(count, rng)
+    elapsed = time.perf_counter() - started
+    print(f'событий: {len(log)}, запись: {len(log) / elapsed:.0f} событий/с')
+    middle = log.ended[len(log.ended) // 2]
+    timed('перцентили домашки', lambda: log.turnaround('hw07'))
+    timed('все домашки', log.per_homework)
+    timed('все когорты', log.per_cohort)
+    timed('окно в сутки', lambda: log.window(middle, middle + DAY))
+    timed('окно в неделю', lambda: log.window(middle, middle + 7 * DAY), 10)
+    timed('история домашки', lambda: log.timeline(7, 'hw07'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""Сколько новых соединений открывает опрос без сессии и с пулом.
+
+Запуск: python -m benchmarks.bench_http_pool [число подписок]
+"""
+import sys
+import time
+
+import homework
+import http_pool
+import tenants
+from benchmarks.bench_tenants import NullBot, build_registry
+from benchmarks.stub_server import start_stub
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    server, url = start_stub()
+    homework.ENDPOINT = url
+
+    started = time.perf_counter()
+    tenants.poll_all(NullBot(), build_registry(count))
+    elapsed = time.perf_counter() - started
+    print(f'requests.get: {elapsed:.2f} с, новых соединений: {count}')
+
+    session = http_pool.make_session()
+    started = time.perf_counter()
+    tenants.poll_all(NullBot(), build_registry(count), session)
+    elapsed = time.perf_counter() - started
+    stats = http_pool.connection_stats(session)
+    print(f'сессия с пулом: {elapsed:.2f} с, '
+          f'новых соединений: {stats["connections"]}, '
+          f'переиспользовано: {stats["reused"]}')
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
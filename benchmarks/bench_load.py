@@ -0,0 +1,86 @@
+"""Сквозная нагрузка: заглушка Практикума и Telegram в отдельном процессе.
+
+Для 1, 100 и 10000 подписок прогоняет несколько циклов опроса через
+настоящие `requests`-сессию, хранилище состояния и очередь отправки с
+`telegram.Bot`, направленным на заглушку, и печатает опросы в секунду,
+p50/p99 задержки от смены статуса до доставки уведомления и RSS.
+
+Запуск: python -m benchmarks.bench_load [число подписок ...]
+"""
+import logging
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+import requests
+import telegram
+
+import homework
+import http_pool
+import send_queue
+import state
+import tenants
+from benchmarks.stub_server import API_PATH, start_stub_process
+
+CASES = (1, 100, 10000)
+CYCLES = 3
+MIN_DURATION = 2.0
+CHURN = 0.05
+
+
+def rss_megabytes():
+    """Текущий RSS процесса; если /proc нет — пиковый."""
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10
+
+
+def run_case(count):
+    process, base_url = start_stub_process(churn=CHURN, seed=count)
+    homework.ENDPOINT = base_url + API_PATH
+    bot = telegram.Bot(token='123456:bench', base_url=f'{base_url}/bot')
+    queue = send_queue.SendQueue(bot, global_rate=1e6, chat_rate=1e6).start()
+    session = http_pool.make_session()
+    registry = tenants.Registry()
+    for number in range(count):
+        registry.subscribe(f'token{number}', 100000 + number)
+    with tempfile.TemporaryDirectory() as directory:
+        store = state.StateStore(os.path.join(directory, 'state.sqlite3'))
+        polls = cycles = 0
+        started = time.perf_counter()
+        while cycles < CYCLES or time.perf_counter() - started < MIN_DURATION:
+            polls += tenants.poll_all(queue, registry, session, store)
+            tenants.save_state(registry, store, queue)
+            cycles += 1
+        elapsed = time.perf_counter() - started
+        queue.stop(timeout=60)
+        store.close()
+    rss = rss_megabytes()
+    stats = requests.get(f'{base_url}/stats').json()
+    process.terminate()
+    latencies = stats['latencies']
+    if len(latencies) >= 2:
+        quantiles = statistics.quantiles(latencies, n=100)
+        p50, p99 = quantiles[49] * 1000, quantiles[98] * 1000
+    else:
+        p50 = p99 = float('nan')
+    print(f'{count:>6} | {polls / elapsed:>9.0f} | {p50:>9.1f} | '
+          f'{p99:>9.1f} | {stats["messages"]:>9} | {rss:>7.1f}')
+
+
+def main():
+    cases = [int(arg) for arg in sys.argv[1:]] or CASES
+    logging.getLogger('homework').setLevel(logging.WARNING)
+    print('подписок | опросов/с | p50, мс   | p99, мс   | сообщений | RSS, МБ')
+    for count in cases:
+        run_case(count)
+
+
+if __name__ == '__main__':
+    main()
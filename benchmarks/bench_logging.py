@@ -0,0 +1,84 @@
+"""Стоимость логирования в цикле опроса: прежняя схема и очередь.
+
+Прежняя схема — синхронный StreamHandler и f-строки, новая — запись в
+очередь, ленивое форматирование и прореживание повторов. Меряется время
+в потоке опроса; вывод идёт в поток, каждая запись в который занимает
+`WRITE_DELAY` секунд, как запись в stdout, который читают не сразу.
+
+Запуск: python -m benchmarks.bench_logging [итераций]
+"""
+import logging
+import sys
+import time
+
+import log_setup
+
+WRITE_DELAY = 0.00005
+
+
+class SlowStream:
+    """Поток вывода, запись в который блокируется на `WRITE_DELAY`."""
+
+    def write(self, text):
+        time.sleep(WRITE_DELAY)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def old_logger(stream, level):
+    logger = logging.getLogger('bench.old')
+    logger.handlers.clear()
+    logger.propagate = False
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter(
+        fmt='[%(asctime)s - %(name)s - %(levelname)s - %(message)s]'))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    return logger
+
+
+def new_logger(stream, level):
+    logger = logging.getLogger('bench.new')
+    logger.handlers.clear()
+    logger.propagate = False
+    listener = log_setup.setup_logging(logger, level=level, stream=stream)
+    return logger, listener
+
+
+def run_old(logger, count):
+    started = time.perf_counter()
+    for number in range(count):
+        chat_id = number % 1000
+        logger.debug(f'Нет новых статусов (чат {chat_id})')
+        logger.debug(f'Опрошена подписка {chat_id}: '
+                     f'{{"homeworks": [], "current_date": {number}}}')
+    return time.perf_counter() - started
+
+
+def run_new(logger, count):
+    started = time.perf_counter()
+    for number in range(count):
+        chat_id = number % 1000
+        logger.debug('Нет новых статусов', extra={'chat_id': chat_id})
+        logger.debug('Опрошена подписка: %s',
+                     {'homeworks': [], 'current_date': number},
+                     extra={'chat_id': chat_id})
+    return time.perf_counter() - started
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    stream = SlowStream()
+    for level in ('DEBUG', 'INFO'):
+        old = run_old(old_logger(stream, level), count)
+        logger, listener = new_logger(stream, level)
+        new = run_new(logger, count)
+        log_setup.stop_logging(listener)
+        print(f'{level:>5}: прежняя схема {old / count * 1e6:6.2f} мкс, '
+              f'очередь {new / count * 1e6:6.2f} мкс на итерацию')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+"""Цена инструментирования: вызовы метрик выключенными и включёнными.
+
+Запуск: python -m benchmarks.bench_metrics [вызовов]
+"""
+import sys
+import time
+
+import metrics
+
+
+def run(count):
+    started = time.perf_counter()
+    for number in range(count):
+        metrics.API_LATENCY.observe(0.2)
+        metrics.MESSAGES.inc('suppressed')
+    return (time.perf_counter() - started) / count * 1e9
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    metrics.ENABLED = False
+    print(f'выключены: {run(count):6.0f} нс на итерацию')
+    metrics.ENABLED = True
+    print(f'включены:  {run(count):6.0f} нс на итерацию')
+
+
+if __name__ == '__main__':
+    main()
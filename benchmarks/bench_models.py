@@ -0,0 +1,76 @@
+"""Разбор ответа: словари + check_response/parse_status против записей.
+
+Запуск: python -m benchmarks.bench_models [число домашек]
+"""
+import json
+import sys
+import time
+import tracemalloc
+
+import homework
+import models
+
+
+def make_body(count):
+    return json.dumps({
+        'homeworks': [{
+            'id': number,
+            'homework_name': f'hw-{number}',
+            'status': ('approved', 'rejected', 'reviewing')[number % 3],
+            'reviewer_comment': 'Всё нравится',
+            'date_updated': '2020-02-13T14:40:57Z',
+            'lesson_name': 'Итоговый проект',
+        } for number in range(count)],
+        'current_date': 1000198000,
+    })
+
+
+def dict_path(body):
+    homeworks = homework.check_response(json.loads(body))
+    for hw in homeworks:
+        homework.parse_status(hw)
+    return homeworks
+
+
+def record_path(body):
+    return models.parse_homeworks(json.loads(body))
+
+
+def validate_dicts(response):
+    for hw in homework.check_response(response):
+        homework.parse_status(hw)
+
+
+def throughput(func, response, count, repeat=5):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(response)
+    return count * repeat / (time.perf_counter() - started)
+
+
+def retained(func, body, count):
+    tracemalloc.start()
+    result = func(body)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    body = make_body(count)
+    response = json.loads(body)
+    print(f'домашек: {count}')
+    print(f'проверка словарей: '
+          f'{throughput(validate_dicts, response, count):10.0f} домашек/с')
+    print(f'записи Homework:   '
+          f'{throughput(models.parse_homeworks, response, count):10.0f} '
+          f'домашек/с')
+    print(f'память на домашку: словарь '
+          f'{retained(dict_path, body, count):.0f} байт, запись '
+          f'{retained(record_path, body, count):.0f} байт')
+
+
+if __name__ == '__main__':
+    main()
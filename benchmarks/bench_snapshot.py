@@ -0,0 +1,67 @@
+"""Сколько занимают запись снимка расписания и тёплый старт по нему.
+
+Собирает реестр из N подписок со случайным состоянием расписания,
+пишет снимок и меряет: открытие снимка через mmap, восстановление
+расписания всего реестра и холодный старт без снимка для сравнения.
+
+Запуск: python -m benchmarks.bench_snapshot [подписок]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+import scheduler
+import snapshot
+import tenants
+
+ROUNDS = 5
+
+
+def build_registry(count, rng=None):
+    registry = tenants.Registry()
+    for number in range(count):
+        tenant = registry.subscribe(f'token-{number:08d}', number)
+        if rng is not None:
+            tenant.due = time.time() + rng.uniform(0, 1200)
+            tenant.failures = rng.randrange(3)
+            tenant.idle_polls = rng.randrange(20)
+            tenant.reviewing = rng.random() < 0.2
+    return registry
+
+
+def best_of(function):
+    timings = []
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    registry = build_registry(count, random.Random(1))
+    fresh = [build_registry(count) for _ in range(ROUNDS * 2)]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'snapshot.bin')
+        save = best_of(lambda: snapshot.save(
+            ((tenant.token, tenant) for tenant in registry), path))
+        size = os.path.getsize(path)
+        opened = best_of(lambda: snapshot.load(path).close())
+        warm = best_of(lambda: snapshot.restore(
+            fresh.pop(), scheduler.Timetable(), time.time(), path))
+        cold = best_of(lambda: tenants.schedule_new(
+            fresh.pop(), scheduler.Timetable(), time.time()))
+    print(f'подписок: {count}, снимок: {size / 1024:.0f} КБ')
+    print('операция                    | мс')
+    for title, seconds in (('запись снимка', save),
+                           ('открытие через mmap', opened),
+                           ('восстановление расписания', warm),
+                           ('холодный старт без снимка', cold)):
+        print(f'{title:<27} | {seconds * 1000:>7.2f}')
+
+
+if __name__ == '__main__':
+    main()
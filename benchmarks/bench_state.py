@@ -0,0 +1,53 @@
+"""Скорость записи состояния за цикл опроса при 100k домашек.
+
+Запуск: python -m benchmarks.bench_state [число домашек]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+import state
+
+STATUSES = ('reviewing', 'approved', 'rejected')
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    chats = max(count // 10, 1)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'state.sqlite3')
+        store = state.StateStore(path)
+        keys = [(number % chats, f'hw-{number}') for number in range(count)]
+
+        started = time.perf_counter()
+        for chat_id, name in keys:
+            store.record(chat_id, name, 'reviewing', 1)
+        written = store.flush()
+        elapsed = time.perf_counter() - started
+        print(f'первичная запись: {written} строк за {elapsed:.2f} с '
+              f'({written / elapsed:.0f} строк/с)')
+
+        for share in (0.01, 0.1, 1.0):
+            started = time.perf_counter()
+            for chat_id, name in keys:
+                status = (random.choice(STATUSES)
+                          if random.random() < share else None)
+                if status and store.is_transition(chat_id, name, status):
+                    store.record(chat_id, name, status, 2)
+            written = store.flush()
+            elapsed = time.perf_counter() - started
+            print(f'цикл, меняется {share:.0%}: {written} строк за '
+                  f'{elapsed * 1000:.0f} мс')
+
+        store.close()
+        started = time.perf_counter()
+        store = state.StateStore(path)
+        print(f'загрузка {len(store)} статусов: '
+              f'{(time.perf_counter() - started) * 1000:.0f} мс')
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
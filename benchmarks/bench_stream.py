@@ -0,0 +1,71 @@
+"""Пиковая память: разбор ответа целиком и потоковый разбор.
+
+Ответ с N домашками генерируется кусками на лету, как его отдаёт
+`iter_content`. Для разбора целиком куски склеиваются (так делает
+`response.json()`), потоковый разбор получает их по одному.
+
+Запуск: python -m benchmarks.bench_stream [число домашек ...]
+"""
+import json
+import sys
+import time
+import tracemalloc
+
+import homework
+import json_stream
+
+CASES = (1000, 10000, 100000)
+
+
+def body_chunks(count, size=json_stream.CHUNK_SIZE):
+    """Куски JSON-ответа API с `count` домашками."""
+    buffer = '{"homeworks": ['
+    for number in range(count):
+        buffer += json.dumps({
+            'id': number,
+            'homework_name': f'hw-{number}',
+            'status': 'approved',
+            'reviewer_comment': 'Всё нравится' * 5,
+            'date_updated': '2020-02-13T14:40:57Z',
+            'lesson_name': 'Итоговый проект',
+        }, ensure_ascii=False)
+        buffer += ', ' if number < count - 1 else ''
+        while len(buffer) >= size:
+            yield buffer[:size].encode()
+            buffer = buffer[size:]
+    yield (buffer + '], "current_date": 1000198000}').encode()
+
+
+def parse_whole(count):
+    response = json.loads(b''.join(body_chunks(count)))
+    for hw in homework.check_response(response):
+        homework.parse_status(hw)
+
+
+def parse_stream(count):
+    for hw in json_stream.iter_homeworks(body_chunks(count)):
+        homework.parse_status(hw)
+
+
+def measure(func, count):
+    tracemalloc.start()
+    started = time.perf_counter()
+    func(count)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 2 ** 20, elapsed
+
+
+def main():
+    cases = [int(arg) for arg in sys.argv[1:]] or CASES
+    print('домашек | целиком: МБ, с   | потоком: МБ, с')
+    for count in cases:
+        whole = measure(parse_whole, count)
+        stream = measure(parse_stream, count)
+        print(f'{count:>7} | {whole[0]:>8.1f} {whole[1]:>6.2f} | '
+              f'{stream[0]:>8.1f} {stream[1]:>6.2f}')
+
+
+if __name__ == '__main__':
+    main()
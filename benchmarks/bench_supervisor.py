@@ -0,0 +1,77 @@
+"""Масштабирование опроса по процессам-воркерам супервизора.
+
+Для 1..N воркеров подписки делятся консистентным хешированием, каждый
+воркер опрашивает свою долю через локальную заглушку Практикума, пока
+не истечёт время. Заглушка запускается в нескольких процессах на одном
+порту, чтобы не стать узким местом. Печатает опросы в секунду и
+ускорение относительно одного воркера.
+
+Запуск: python -m benchmarks.bench_supervisor [воркеров] [подписок]
+"""
+import logging
+import os
+import sys
+import time
+
+import homework
+import http_pool
+import supervisor
+import tenants
+from benchmarks.bench_tenants import NullBot, build_registry
+from benchmarks.stub_server import API_PATH, start_stub_process
+
+DURATION = 3.0
+
+
+def bench_worker(index, conn, workers, endpoint, count, duration):
+    """Воркер бенчмарка: опрашивает свою долю подписок `duration` секунд."""
+    logging.getLogger('homework').setLevel(logging.WARNING)
+    homework.ENDPOINT = endpoint
+    everyone = build_registry(count)
+    shard = supervisor.Shard(index, load_all=lambda: everyone)
+    shard.sync(conn.recv())
+    session = http_pool.make_session()
+    bot = NullBot()
+    polls = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < duration:
+        polls += tenants.poll_all(bot, shard.registry, session)
+    conn.send((polls, len(shard.registry), time.perf_counter() - started))
+    conn.recv()
+
+
+def run_case(workers, endpoint, count):
+    boss = supervisor.Supervisor(
+        workers, target=bench_worker, args=(endpoint, count, DURATION))
+    boss.start()
+    results = [conn.recv() for _, conn in boss.processes.values()]
+    boss.stop()
+    rate = sum(polls / elapsed for polls, _, elapsed in results)
+    shares = [owned for _, owned, _ in results]
+    return rate, shares
+
+
+def main():
+    cores = os.cpu_count() or 1
+    most = int(sys.argv[1]) if len(sys.argv) > 1 else max(cores, 2)
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    logging.getLogger('homework').setLevel(logging.WARNING)
+    stubs = [start_stub_process(reuse_port=True)]
+    port = stubs[0][1].rsplit(':', 1)[1]
+    stubs += [start_stub_process(port=int(port), reuse_port=True)
+              for _ in range(min(cores, most) - 1)]
+    endpoint = stubs[0][1] + API_PATH
+    print(f'ядер: {cores}, подписок: {count}')
+    print('воркеров | опросов/с | ускорение | подписок на воркер')
+    baseline = None
+    for workers in range(1, most + 1):
+        rate, shares = run_case(workers, endpoint, count)
+        baseline = baseline or rate
+        print(f'{workers:>8} | {rate:>9.0f} | {rate / baseline:>9.2f} | '
+              f'{min(shares)}..{max(shares)}')
+    for process, _ in stubs:
+        process.terminate()
+
+
+if __name__ == '__main__':
+    main()
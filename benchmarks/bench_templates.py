@@ -0,0 +1,42 @@
+"""Стоимость рендера одного уведомления: прежняя f-строка и render().
+
+Обычное уведомление render() склеивает из готовых кусков без кэша;
+каждый вариант прогоняется несколько раз и берётся лучший результат,
+чтобы шум машины не решал исход сравнения.
+Запуск: python -m benchmarks.bench_templates [домашек] [циклов]
+"""
+import sys
+import time
+
+import homework
+import templates
+
+
+def legacy(name, status, locale):
+    verdict = homework.HOMEWORK_STATUSES[status]
+    return f'Изменился статус проверки работы "{name}". {verdict}'
+
+
+def measure(render, work, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for name, status, locale in work:
+            render(name, status, locale)
+        best = min(best, time.perf_counter() - started)
+    return best / len(work) * 1e9
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    cycles = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    statuses = templates.STATUSES
+    work = [(f'user{number}__project.zip', statuses[number % 3],
+             ('ru', 'en')[number % 2]) for number in range(count)] * cycles
+    print(f'домашек: {count}, циклов опроса: {cycles}')
+    print(f'f-строка:  {measure(legacy, work):6.0f} нс/сообщение')
+    print(f'render():  {measure(templates.render, work):6.0f} нс/сообщение')
+
+
+if __name__ == '__main__':
+    main()
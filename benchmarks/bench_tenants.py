@@ -0,0 +1,50 @@
+"""Память на подписку и скорость опроса для мультитенантного движка.
+
+Запуск: python -m benchmarks.bench_tenants [число подписок]
+"""
+import sys
+import time
+import tracemalloc
+
+import homework
+import tenants
+from benchmarks.stub_server import start_stub
+
+
+class NullBot:
+    """Бот, который никуда не отправляет сообщения."""
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        return None
+
+
+def build_registry(count):
+    registry = tenants.Registry()
+    for number in range(count):
+        registry.subscribe(f'token-{number:08d}', 100000 + number)
+    return registry
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    registry = build_registry(count)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    used = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    print(f'подписок: {count}')
+    print(f'память на подписку: {used / count:.0f} байт')
+
+    server, url = start_stub()
+    homework.ENDPOINT = url
+    started = time.perf_counter()
+    polled = tenants.poll_all(NullBot(), registry)
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+    print(f'опросов: {polled} за {elapsed:.2f} с '
+          f'({polled / elapsed:.0f} опросов/с)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Сколько стоят заголовки из хранилища токенов по сравнению с открытыми.
+
+Кладёт в хранилище N токенов, затем меряет на запрос: сборку заголовков
+из открытого токена, первый запрос по id (расшифровка) и повторный
+(кэш). В конце — время ротации мастер-ключа для всех токенов.
+
+Запуск: python -m benchmarks.bench_vault [токенов]
+"""
+import base64
+import os
+import sys
+import tempfile
+import time
+
+import homework
+import vault
+
+ROUNDS = 10
+
+
+def per_call(function, items, rounds=1):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for item in items:
+            function(item)
+    return (time.perf_counter() - started) / (len(items) * rounds)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    keys = [(name, os.urandom(32)) for name in ('old', 'new')]
+    text = ','.join(f'{name}:{base64.urlsafe_b64encode(key).decode()}'
+                    for name, key in keys)
+    tokens = [f'token-{number:08d}' for number in range(count)]
+    with tempfile.TemporaryDirectory() as directory:
+        store = vault.Vault(vault.Keyring(vault.parse_keys(text)[:1]),
+                            os.path.join(directory, 'state.db'),
+                            cache_size=count)
+        put = per_call(store.put, tokens)
+        sealed = [vault.token_id(token) for token in tokens]
+        plain = per_call(homework.make_headers, tokens, ROUNDS)
+        cold = per_call(store.headers, sealed)
+        warm = per_call(store.headers, sealed, ROUNDS)
+        started = time.perf_counter()
+        rotated = store.rotate(vault.Keyring(vault.parse_keys(text)[::-1]))
+        rotate = time.perf_counter() - started
+        store.close()
+    print(f'токенов: {count}')
+    print('операция                  | мкс на токен')
+    for title, seconds in (('сохранение', put),
+                           ('заголовки из токена', plain),
+                           ('заголовки, расшифровка', cold),
+                           ('заголовки из кэша', warm)):
+        print(f'{title:<25} | {seconds * 1e6:>12.2f}')
+    print(f'ротация {rotated} ключей: {rotate:.3f} с')
+
+
+if __name__ == '__main__':
+    main()
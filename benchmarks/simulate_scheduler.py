@@ -0,0 +1,112 @@
+"""Симуляция: адаптивное расписание против опроса раз в RETRY_TIME.
+
+Считает число запросов к API (в том числе во время сбоя API) и задержку
+уведомлений о смене статуса на синтетических подписках.
+
+Запуск: python -m benchmarks.simulate_scheduler [подписок] [дней]
+"""
+import random
+import statistics
+import sys
+
+import exceptions
+import homework
+import scheduler
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+class SimTenant(scheduler.PollState):
+    """Подписка с заранее известными моментами смены статусов."""
+
+    __slots__ = ('events', 'seen')
+
+    def __init__(self, events):
+        super().__init__()
+        self.events = events
+        self.seen = 0
+
+
+def make_events(rng, days):
+    """Сдачи работ: через часы берут на ревью, ещё через час — вердикт."""
+    events = []
+    if rng.random() < 0.3:
+        return events
+    for index in range(rng.randint(1, max(1, days // 3))):
+        submitted = rng.uniform(0, days * DAY)
+        reviewing = submitted + rng.expovariate(1 / (6 * HOUR))
+        verdict = reviewing + rng.expovariate(1 / HOUR)
+        name = f'hw{index}'
+        events.append((reviewing, name, 'reviewing'))
+        events.append((verdict, name, rng.choice(('approved', 'rejected'))))
+    events.sort()
+    return events
+
+
+def simulate(events_per_tenant, delay_fn, days, outages, seed):
+    """Прогоняем расписание и собираем число запросов и задержки."""
+    rng = random.Random(seed)
+    timetable = scheduler.Timetable()
+    for events in events_per_tenant:
+        timetable.schedule(SimTenant(events),
+                           rng.uniform(0, homework.RETRY_TIME))
+    calls = outage_calls = 0
+    latencies = []
+    horizon = days * DAY
+    while True:
+        now = timetable.next_due()
+        if now is None or now > horizon:
+            break
+        for tenant in timetable.pop_due(now):
+            calls += 1
+            if any(start <= now < end for start, end in outages):
+                outage_calls += 1
+                error = exceptions.ApiNotResponse('API недоступен')
+                delay = delay_fn(tenant, (), error, rng)
+            else:
+                statuses = []
+                while (tenant.seen < len(tenant.events)
+                       and tenant.events[tenant.seen][0] <= now):
+                    moment, name, status = tenant.events[tenant.seen]
+                    latencies.append(now - moment)
+                    statuses.append((name, status))
+                    tenant.seen += 1
+                delay = delay_fn(tenant, statuses, None, rng)
+            timetable.schedule(tenant, now + delay)
+    return calls, outage_calls, latencies
+
+
+def fixed_delay(tenant, statuses, error, rng):
+    return homework.RETRY_TIME
+
+
+def adaptive_delay(tenant, statuses, error, rng):
+    return scheduler.next_delay(tenant, statuses, error,
+                                base=homework.RETRY_TIME, rng=rng)
+
+
+def report(name, calls, outage_calls, latencies):
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(f'{name:>12}: запросов {calls:8d} (во время сбоя {outage_calls:6d}), '
+          f'задержка p50 {quantiles[49] / 60:5.1f} мин, '
+          f'p90 {quantiles[89] / 60:5.1f} мин')
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 14
+    rng = random.Random(42)
+    events = [make_events(rng, days) for _ in range(count)]
+    outages = [(2 * DAY, 2 * DAY + 2 * HOUR), (9 * DAY, 9 * DAY + HOUR)]
+    print(f'подписок: {count}, дней: {days}, '
+          f'смен статуса: {sum(map(len, events))}')
+    fixed = simulate(events, fixed_delay, days, outages, seed=1)
+    adaptive = simulate(events, adaptive_delay, days, outages, seed=1)
+    report('RETRY_TIME', *fixed)
+    report('адаптивное', *adaptive)
+    print(f'сэкономлено запросов: {1 - adaptive[0] / fixed[0]:.0%}')
+
+
+if __name__ == '__main__':
+    main()
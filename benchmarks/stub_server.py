@@ -0,0 +1,260 @@
+"""Локальная заглушка API Яндекс.Домашка и Telegram Bot API.
+
+Эндпоинт статусов отвечает как Практикум: домашки, обновлённые после
+`from_date`, и `current_date`. Задержка, доля ошибок, частота смены
+статусов (`churn`) и число домашек в ответе (`page_size`) настраиваются.
+`/bot<токен>/sendMessage` принимает сообщения как Telegram и запоминает,
+через сколько после смены статуса пришло уведомление. `/stats` отдаёт
+эти задержки и счётчики.
+
+Запуск отдельно: python -m benchmarks.stub_server [порт] [churn]
+"""
+import hashlib
+import json
+import random
+import re
+import socket
+import sys
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Process, Queue
+from urllib.parse import parse_qs, urlparse
+
+API_PATH = '/api/user_api/homework_statuses/'
+TELEGRAM_PATH = re.compile(r'^/bot[^/]+/(\w+)$')
+MESSAGE_NAME = re.compile(r'"([^"]+)"')
+VERDICTS = ('approved', 'rejected')
+
+
+class StubState:
+    """Домашки по токенам и журнал доставленных уведомлений."""
+
+    def __init__(self, churn=0.0, page_size=20, seed=None, clock=time.time):
+        self.churn = churn
+        self.clock = clock
+        self.page_size = page_size
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.homeworks = {}
+        self.changed_at = {}
+        self.latencies = []
+        self.requests = self.errors = self.messages = 0
+
+    def answer(self, token, from_date):
+        """Домашки токена, изменённые после `from_date`."""
+        now = self.clock()
+        with self.lock:
+            self.requests += 1
+            homeworks = self.homeworks.setdefault(token, [])
+            if self.rng.random() < self.churn:
+                self.change(token, homeworks, now)
+            changed = [hw for hw in homeworks
+                       if hw['updated'] >= from_date][:self.page_size]
+        return {
+            'homeworks': [{
+                'id': hw['id'],
+                'homework_name': hw['homework_name'],
+                'status': hw['status'],
+                'reviewer_comment': '',
+                'lesson_name': 'Спринт',
+                'date_updated': time.strftime(
+                    '%Y-%m-%dT%H:%M:%SZ', time.gmtime(hw['updated'])),
+            } for hw in changed],
+            'current_date': int(now),
+        }
+
+    def change(self, token, homeworks, now):
+        """Берём работу на ревью или выносим вердикт по ней."""
+        reviewing = [hw for hw in homeworks if hw['status'] == 'reviewing']
+        if reviewing:
+            hw = reviewing[0]
+            hw['status'] = self.rng.choice(VERDICTS)
+        else:
+            hw = {
+                'id': len(homeworks) + 1,
+                'homework_name': f'{token}-{len(homeworks) + 1}',
+                'status': 'reviewing',
+            }
+            homeworks.append(hw)
+        hw['updated'] = int(now)
+        self.changed_at[hw['homework_name']] = now
+
+    def receive(self, text):
+        """Учитываем сообщение и задержку от смены статуса до него."""
+        now = self.clock()
+        with self.lock:
+            self.messages += 1
+            for name in MESSAGE_NAME.findall(text or ''):
+                changed_at = self.changed_at.pop(name, None)
+                if changed_at is not None:
+                    self.latencies.append(now - changed_at)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'messages': self.messages,
+                'latencies': list(self.latencies),
+            }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Обработчик запросов к заглушке; настройки — атрибуты класса."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    latency = 0.0
+    error_rate = 0.0
+    etag = False
+    state = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/stats':
+            self.send_json(self.state.stats())
+            return
+        if not url.path.startswith(API_PATH):
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and self.state.rng.random() < self.error_rate:
+            with self.state.lock:
+                self.state.errors += 1
+            self.send_json({}, HTTPStatus.SERVICE_UNAVAILABLE)
+            return
+        query = parse_qs(url.query)
+        from_date = int(float(query.get('from_date', ['0'])[0]))
+        token = self.headers.get('Authorization', '').replace('OAuth ', '')
+        answer = self.state.answer(token, from_date)
+        if not self.etag:
+            self.send_json(answer)
+            return
+        digest = hashlib.md5(json.dumps(answer['homeworks']).encode())
+        etag = f'"{digest.hexdigest()}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_json(answer, headers={'ETag': etag})
+
+    def do_POST(self):
+        match = TELEGRAM_PATH.match(urlparse(self.path).path)
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        if match is None or match.group(1) != 'sendMessage':
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        if self.headers.get('Content-Type', '').startswith(
+                'application/json'):
+            data = json.loads(body or b'{}')
+        else:
+            data = {key: value[0] for key, value
+                    in parse_qs(body.decode()).items()}
+        self.state.receive(data.get('text'))
+        self.send_json({'ok': True, 'result': {
+            'message_id': self.state.messages,
+            'date': int(time.time()),
+            'chat': {'id': int(data.get('chat_id', 0)), 'type': 'private'},
+            'text': data.get('text'),
+        }})
+
+    def send_json(self, data, status=HTTPStatus.OK, headers=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    """Многопоточный сервер заглушки с глубокой очередью соединений."""
+
+    daemon_threads = True
+    request_queue_size = 1024
+    reuse_port = False
+
+    def server_bind(self):
+        if self.reuse_port:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+
+class SharedPortStubServer(StubServer):
+    """Заглушка, делящая порт с другими процессами через SO_REUSEPORT."""
+
+    reuse_port = True
+
+
+def make_server(host='127.0.0.1', port=0, latency=0.0, error_rate=0.0,
+                churn=0.0, page_size=20, seed=None, reuse_port=False,
+                etag=False, clock=time.time):
+    """Создаём сервер заглушки с заданным поведением.
+
+    С `reuse_port` несколько процессов слушают один порт, и заглушка
+    не упирается в одно ядро.
+    """
+    handler = type('Handler', (StubHandler,), {
+        'latency': latency,
+        'error_rate': error_rate,
+        'etag': etag,
+        'state': StubState(churn, page_size, seed, clock),
+    })
+    server_class = SharedPortStubServer if reuse_port else StubServer
+    return server_class((host, port), handler)
+
+
+def start_stub(host='127.0.0.1', port=0, **config):
+    """Запускаем заглушку в фоновом потоке, возвращаем сервер и URL.
+
+    `latency` — искусственная задержка ответа API в секундах,
+    `error_rate` — доля ответов 503, `churn` — вероятность смены статуса
+    при каждом запросе, `page_size` — максимум домашек в ответе, `etag` —
+    отдавать ETag по списку домашек и 304 на совпавший If-None-Match,
+    `clock` — часы заглушки для `date_updated` и `current_date`.
+    """
+    server = make_server(host, port, **config)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f'http://{host}:{server.server_address[1]}{API_PATH}'
+    return server, url
+
+
+def _serve(ready, host, port, config):
+    server = make_server(host, port, **config)
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+def start_stub_process(host='127.0.0.1', port=0, **config):
+    """Запускаем заглушку в отдельном процессе, чтобы не делить с ней GIL.
+
+    Возвращаем процесс и базовый URL сервера.
+    """
+    ready = Queue()
+    process = Process(target=_serve, args=(ready, host, port, config),
+                      daemon=True)
+    process.start()
+    return process, f'http://{host}:{ready.get(timeout=10)}'
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    churn = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    server, url = start_stub(port=port, churn=churn)
+    print(f'Заглушка API слушает {url}')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
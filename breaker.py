@@ -0,0 +1,160 @@
+import logging
+import threading
+import time
+
+import config
+import exceptions
+import metrics
+
+logger = logging.getLogger('homework.breaker')
+
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 60
+ERROR_DIGEST_INTERVAL = 600
+
+CLOSED = 'closed'
+HALF_OPEN = 'half_open'
+OPEN = 'open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    """Предохранитель для одного внешнего сервиса.
+
+    После `failure_threshold` сбоев подряд размыкается: запросы не
+    уходят `reset_timeout` секунд. Затем пропускается один пробный
+    запрос: успех замыкает предохранитель, сбой снова размыкает.
+
+    Без явных `failure_threshold` и `reset_timeout` действуют
+    `BREAKER_FAILURES` и `BREAKER_RESET` из настроек.
+    """
+
+    def __init__(self, name, failure_threshold=None, reset_timeout=None,
+                 clock=time.monotonic):
+        self.name = name
+        self._threshold = failure_threshold
+        self._reset = reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+        metrics.CIRCUIT_STATE.set_function(
+            lambda: STATE_VALUES[self.state], name)
+
+    @property
+    def failure_threshold(self):
+        return self._threshold or FAILURE_THRESHOLD
+
+    @property
+    def reset_timeout(self):
+        return self._reset or RESET_TIMEOUT
+
+    def allow(self):
+        """Можно ли сейчас обращаться к сервису."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if self.clock() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = HALF_OPEN
+                self._trial = False
+            if self._trial:
+                return False
+            self._trial = True
+            return True
+
+    def check(self):
+        """Бросаем `CircuitOpen`, если обращаться к сервису нельзя."""
+        if not self.allow():
+            raise exceptions.CircuitOpen(
+                f'{self.name} недоступен, повтор через '
+                f'{self.retry_in():.0f} с')
+
+    def retry_in(self):
+        """Сколько секунд осталось до пробного запроса."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - self.clock())
+
+    def success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info('Предохранитель %s замкнут', self.name)
+            self.state = CLOSED
+            self.failures = 0
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if (self.state == HALF_OPEN
+                    or self.failures >= self.failure_threshold):
+                if self.state != OPEN:
+                    logger.warning('Предохранитель %s разомкнут после %s '
+                                   'сбоев', self.name, self.failures)
+                    metrics.CIRCUIT_OPENED.inc(self.name)
+                self.state = OPEN
+                self.opened_at = self.clock()
+
+
+def apply_config(settings):
+    global FAILURE_THRESHOLD, RESET_TIMEOUT, ERROR_DIGEST_INTERVAL
+    FAILURE_THRESHOLD = settings.breaker_failures
+    RESET_TIMEOUT = settings.breaker_reset
+    ERROR_DIGEST_INTERVAL = settings.error_digest_interval
+
+
+config.on_reload(apply_config)
+
+PRACTICUM = CircuitBreaker('API Практикума')
+TELEGRAM = CircuitBreaker('Telegram')
+
+
+class ErrorDigest:
+    """Сводка сбоев вместо сообщения на каждый сбой.
+
+    Первый сбой в окне `interval` секунд сообщается сразу, следующие
+    только считаются. Когда окно закончилось, `pending` отдаёт по ключу
+    одну сводку с числом подавленных сбоев и последним из них.
+    """
+
+    def __init__(self, interval=None, clock=time.monotonic):
+        self._interval = interval
+        self.clock = clock
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    @property
+    def interval(self):
+        return self._interval or ERROR_DIGEST_INTERVAL
+
+    def report(self, key, message):
+        """Сообщение для отправки сейчас или None, если сбой подавлен."""
+        now = self.clock()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is not None and now - window[0] < self.interval:
+                window[1] += 1
+                window[2] = message
+                return None
+            self._windows[key] = [now, 0, message]
+        return message
+
+    def pending(self):
+        """Сводки по закончившимся окнам: список (ключ, текст)."""
+        now = self.clock()
+        summaries = []
+        with self._lock:
+            for key, (started, count, last) in list(self._windows.items()):
+                if now - started < self.interval:
+                    continue
+                del self._windows[key]
+                if count:
+                    summaries.append((key, (
+                        f'За {self.interval // 60} мин сбой повторился '
+                        f'ещё {count} раз. Последний: {last}')))
+        return summaries
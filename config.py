@@ -0,0 +1,305 @@
+import logging
+import os
+import signal
+import socket
+import threading
+
+from dotenv import dotenv_values
+
+import exceptions
+import log_setup
+
+logger = logging.getLogger('homework.config')
+
+CONFIG_FILE = '.env'
+WATCH_INTERVAL = 5
+ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
+
+
+def positive(cast):
+    """Приведение типа, которое не пропускает ноль и отрицательные числа."""
+    def convert(raw):
+        value = cast(raw)
+        if value <= 0:
+            raise ValueError(raw)
+        return value
+    return convert
+
+
+def flag(raw):
+    return raw == '1'
+
+
+def level(raw):
+    value = logging.getLevelName(raw.upper())
+    if not isinstance(value, int):
+        raise ValueError(raw)
+    return raw.upper()
+
+
+OPTIONS = {
+    # атрибут: (переменная окружения, тип, значение по умолчанию)
+    'practicum_token': ('PRACTICUM_TOKEN', str, None),
+    'telegram_token': ('TELEGRAM_TOKEN', str, None),
+    'telegram_chat_id': ('TELEGRAM_CHAT_ID', str, None),
+    'endpoint': ('ENDPOINT', str, ENDPOINT),
+    'retry_time': ('RETRY_TIME', positive(int), 600),
+    'reviewing_interval': ('REVIEWING_INTERVAL', positive(int), 120),
+    'idle_after': ('IDLE_AFTER', int, 6),
+    'max_idle_interval': ('MAX_IDLE_INTERVAL', positive(int), 1200),
+    'poll_concurrency': ('POLL_CONCURRENCY', positive(int), 100),
+    'global_rate': ('TELEGRAM_GLOBAL_RATE', positive(float), 30.0),
+    'chat_rate': ('TELEGRAM_CHAT_RATE', positive(float), 1.0),
+    'subscriptions_file': ('SUBSCRIPTIONS_FILE', str, 'subscriptions.txt'),
+    'self_subscribe': ('SELF_SUBSCRIBE', flag, True),
+    'stream_responses': ('STREAM_RESPONSES', flag, False),
+    'conditional_requests': ('CONDITIONAL_REQUESTS', flag, False),
+    'workers': ('WORKERS', positive(int), os.cpu_count() or 1),
+    'sync_interval': ('SYNC_INTERVAL', positive(int), 60),
+    'lease_store': ('LEASE_STORE', str, ''),
+    'lease_ttl': ('LEASE_TTL', positive(int), 30),
+    'node_name': ('NODE_NAME', str, None),
+    'log_level': ('LOG_LEVEL', level, 'DEBUG'),
+    'webhook_url': ('NOTIFY_WEBHOOK_URL', str, ''),
+    'smtp_host': ('SMTP_HOST', str, ''),
+    'smtp_port': ('SMTP_PORT', positive(int), 25),
+    'smtp_sender': ('SMTP_FROM', str, 'homework-bot@localhost'),
+    'smtp_recipients': ('SMTP_TO', str, ''),
+    'sink_workers': ('SINK_WORKERS', positive(int), 2),
+    'sink_timeout': ('SINK_TIMEOUT', positive(float), 10.0),
+    'vault_keys': ('VAULT_KEYS', str, ''),
+    'vault_cache_size': ('VAULT_CACHE_SIZE', positive(int), 10000),
+    'vault_cache_ttl': ('VAULT_CACHE_TTL', positive(int), 3600),
+    'snapshot_file': ('SNAPSHOT_FILE', str, 'snapshot.bin'),
+    'shutdown_timeout': ('SHUTDOWN_TIMEOUT', positive(float), 20.0),
+    'state_db': ('STATE_DB', str, 'state.sqlite3'),
+    'outbox_retention': ('OUTBOX_RETENTION', positive(int), 7 * 24 * 3600),
+    'outbox_batch': ('OUTBOX_BATCH', positive(int), 1000),
+    'outbox_max_attempts': ('OUTBOX_MAX_ATTEMPTS', positive(int), 10),
+    'outbox_claim_timeout': ('OUTBOX_CLAIM_TIMEOUT', positive(int), 600),
+    'metrics_host': ('METRICS_HOST', str, '127.0.0.1'),
+    'metrics_port': ('METRICS_PORT', int, 0),
+    'log_format': ('LOG_FORMAT', str, 'text'),
+    'log_sample_every': ('LOG_SAMPLE_EVERY', positive(int), 100),
+    'default_locale': ('DEFAULT_LOCALE', str, 'ru'),
+    'show_lesson': ('SHOW_LESSON', flag, False),
+    'show_comment': ('SHOW_COMMENT', flag, False),
+    'render_cache_size': ('RENDER_CACHE_SIZE', positive(int), 4096),
+    'breaker_failures': ('BREAKER_FAILURES', positive(int), 5),
+    'breaker_reset': ('BREAKER_RESET', positive(int), 60),
+    'error_digest_interval': ('ERROR_DIGEST_INTERVAL', positive(int), 600),
+    'update_workers': ('UPDATE_WORKERS', positive(int), 8),
+    'connect_timeout': ('CONNECT_TIMEOUT', positive(float), 3.05),
+    'read_timeout': ('READ_TIMEOUT', positive(float), 10.0),
+    'http_pool_size': ('HTTP_POOL_SIZE', positive(int), 10),
+}
+
+# Эти настройки читаются один раз при старте: бот Telegram, число
+# воркеров, хранилища, сервер метрик, вывод логов, пулы потоков и
+# соединений и приёмники уведомлений на ходу не пересоздаются.
+RESTART_ONLY = frozenset({'telegram_token', 'workers', 'lease_store',
+                          'node_name', 'webhook_url', 'smtp_host',
+                          'smtp_port', 'smtp_sender', 'smtp_recipients',
+                          'sink_workers', 'state_db', 'metrics_host',
+                          'metrics_port', 'log_format', 'log_sample_every',
+                          'update_workers', 'http_pool_size'})
+
+
+class Settings:
+    """Настройки бота, собранные из окружения и файла конфигурации.
+
+    Объект не меняется после создания: перечитанная конфигурация — новый
+    объект, который целиком подменяет прежний.
+    """
+
+    __slots__ = tuple(OPTIONS)
+
+    def __init__(self, **values):
+        for name, (_, _, default) in OPTIONS.items():
+            object.__setattr__(self, name, values.pop(name, default))
+        if values:
+            raise TypeError(f'Неизвестные настройки: {", ".join(values)}')
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Настройки не меняются после создания')
+
+    @classmethod
+    def from_env(cls, environ):
+        """Настройки из словаря переменных окружения.
+
+        Пустая переменная значит значение по умолчанию. Неверное значение
+        поднимает `ConfigError` с именем переменной.
+        """
+        values = {}
+        for name, (variable, cast, _) in OPTIONS.items():
+            raw = environ.get(variable)
+            if not raw:
+                continue
+            try:
+                values[name] = cast(raw)
+            except ValueError as error:
+                raise exceptions.ConfigError(
+                    f'Неверное значение {variable}: {raw!r}') from error
+        return cls(**values)
+
+    def replace(self, **changes):
+        values = {name: getattr(self, name) for name in OPTIONS}
+        values.update(changes)
+        return Settings(**values)
+
+    def changed(self, other):
+        """Имена настроек, которые отличаются в `other`."""
+        return [name for name in OPTIONS
+                if getattr(self, name) != getattr(other, name)]
+
+    @property
+    def node(self):
+        return self.node_name or socket.gethostname()
+
+
+_settings = Settings()
+_loaded = False
+_listeners = []
+_lock = threading.RLock()
+_path = CONFIG_FILE
+_reload_requested = threading.Event()
+_watcher = None
+
+
+def current():
+    """Действующие настройки."""
+    return _settings
+
+
+def on_reload(listener):
+    """Подписываем `listener(settings)` на применение настроек.
+
+    Если настройки уже загружены, он вызывается сразу, так что модуль,
+    импортированный после старта, тоже их получит.
+    """
+    with _lock:
+        _listeners.append(listener)
+        if _loaded:
+            listener(_settings)
+
+
+def read(path=None, environ=None):
+    """Собираем настройки из окружения и файла `path`.
+
+    Значения из файла важнее окружения: иначе правка файла не подействовала
+    бы на переменную, которую процесс получил при запуске.
+    """
+    values = dict(os.environ if environ is None else environ)
+    if path and os.path.exists(path):
+        values.update((name, value)
+                      for name, value in dotenv_values(path).items()
+                      if value is not None)
+    return Settings.from_env(values)
+
+
+def apply(settings):
+    """Подменяем настройки и раздаём их подписанным модулям.
+
+    Подписчики вызываются под одной блокировкой, поэтому два
+    перечитывания не перемешают значения друг друга.
+    """
+    global _settings, _loaded
+    with _lock:
+        _settings = settings
+        _loaded = True
+        for listener in _listeners:
+            try:
+                listener(settings)
+            except Exception as error:
+                logger.error('Не удалось применить настройки: %s', error)
+
+
+def reload(path=None):
+    """Перечитываем конфигурацию и применяем изменившиеся настройки.
+
+    Если файл содержит ошибку, остаются прежние настройки. Возвращаем
+    список изменённых настроек.
+    """
+    try:
+        settings = read(path or _path)
+    except (exceptions.ConfigError, OSError) as error:
+        logger.error('Конфигурация не перечитана: %s', error)
+        return []
+    with _lock:
+        changed = _settings.changed(settings)
+        restart = sorted(RESTART_ONLY.intersection(changed))
+        if restart:
+            logger.warning('Настройки %s применятся после перезапуска',
+                           ', '.join(restart))
+            settings = settings.replace(
+                **{name: getattr(_settings, name) for name in restart})
+            changed = [name for name in changed if name not in restart]
+        if changed:
+            apply(settings)
+            logger.info('Конфигурация перечитана, изменены: %s',
+                        ', '.join(changed))
+    return changed
+
+
+def request_reload(*args):
+    """Просим поток наблюдения перечитать конфигурацию.
+
+    Годится в обработчик сигнала: сама загрузка идёт не в нём, а в потоке,
+    поэтому не прерывает на полуслове код, который держит блокировки.
+    """
+    _reload_requested.set()
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def watch(path, interval=WATCH_INTERVAL):
+    """Перечитываем конфигурацию по запросу и при изменении файла.
+
+    При `interval` 0 файл не проверяется, остаётся только SIGHUP.
+    """
+    mtime = _mtime(path)
+    while True:
+        requested = _reload_requested.wait(interval or None)
+        _reload_requested.clear()
+        modified = _mtime(path)
+        if requested or modified != mtime:
+            mtime = modified
+            reload(path)
+
+
+def setup(path=None, interval=None):
+    """Загружаем настройки при старте процесса.
+
+    Включаем логирование, применяем настройки во всех модулях и запускаем
+    поток, который перечитывает их по SIGHUP и при изменении файла
+    `CONFIG_FILE`. Ошибка в конфигурации при старте поднимает
+    `ConfigError`.
+    """
+    global _path, _watcher
+    _path = path or os.getenv('CONFIG_FILE', CONFIG_FILE)
+    if interval is None:
+        interval = int(os.getenv('CONFIG_WATCH_INTERVAL', WATCH_INTERVAL))
+    settings = read(_path)
+    log_setup.setup_logging(logging.getLogger('homework'), settings.log_level,
+                            settings.log_format,
+                            every=settings.log_sample_every)
+    apply(settings)
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGHUP, request_reload)
+    if _watcher is None:
+        _watcher = threading.Thread(target=watch, args=(_path, interval),
+                                    name='config', daemon=True)
+        _watcher.start()
+    return settings
+
+
+def _apply_log_level(settings):
+    logging.getLogger('homework').setLevel(settings.log_level)
+
+
+on_reload(_apply_log_level)
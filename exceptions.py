@@ -6,6 +6,10 @@ class ApiNotResponse(Exception):
     pass
 
 
+class ApiUnavailable(ApiNotResponse):
+    """Сбой всего API, а не одного токена: сеть, 5xx или 429."""
+
+
 class ApiStatusNotInDocs(Exception):
     pass
 
@@ -16,3 +20,11 @@ class ApiEmptyResponse(Exception):
 
 class TokenError(Exception):
     pass
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class ConfigError(Exception):
+    pass
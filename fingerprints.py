@@ -0,0 +1,113 @@
+import hashlib
+import re
+import threading
+from http import HTTPStatus
+
+import metrics
+
+CURRENT_DATE = re.compile(rb'"current_date"\s*:\s*(-?\d+)')
+
+
+class Fingerprint:
+    """Отпечаток последнего обработанного ответа API одной подписки.
+
+    `digest` считается по телу без значения `current_date`: оно меняется
+    в каждом ответе, а домашки — редко. `statuses` — пары (название,
+    статус) из этого ответа, их получает расписание, когда разбор
+    пропущен.
+    """
+
+    __slots__ = ('etag', 'last_modified', 'digest', 'current_date',
+                 'statuses')
+
+    def __init__(self, etag=None, last_modified=None, digest=None,
+                 current_date=None, statuses=()):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.digest = digest
+        self.current_date = current_date
+        self.statuses = statuses
+
+
+class Stats:
+    """Сколько циклов обошлось без разбора ответа.
+
+    `parse_seconds` — измеренное процессорное время разбора и обработки
+    в циклах без пропуска. Экономию CPU отсюда не вывести: хеш тела
+    и условные заголовки тоже стоят времени, её меряет
+    `benchmarks.bench_fingerprints` сравнением с опросом без отпечатков.
+    """
+
+    def __init__(self):
+        self.full = self.not_modified = self.unchanged = 0
+        self.full_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record_full(self, seconds):
+        with self._lock:
+            self.full += 1
+            self.full_seconds += seconds
+
+    def record_skip(self, reason):
+        with self._lock:
+            setattr(self, reason, getattr(self, reason) + 1)
+        metrics.POLLS_SKIPPED.inc(reason)
+
+    def report(self):
+        with self._lock:
+            skipped = self.not_modified + self.unchanged
+            cycles = self.full + skipped
+            return {
+                'cycles': cycles,
+                'not_modified': self.not_modified,
+                'unchanged': self.unchanged,
+                'skipped_percent': 100 * skipped / cycles if cycles else 0.0,
+                'parse_seconds': self.full_seconds,
+            }
+
+
+STATS = Stats()
+
+
+def conditional_headers(headers, fingerprint):
+    """Заголовки запроса с валидаторами прошлого ответа, если они есть."""
+    if fingerprint is None or not (fingerprint.etag
+                                   or fingerprint.last_modified):
+        return headers
+    headers = dict(headers)
+    if fingerprint.etag:
+        headers['If-None-Match'] = fingerprint.etag
+    if fingerprint.last_modified:
+        headers['If-Modified-Since'] = fingerprint.last_modified
+    return headers
+
+
+def body_digest(body):
+    """Хеш тела без `current_date` и само значение `current_date`."""
+    current_date = None
+    match = CURRENT_DATE.search(body)
+    if match is not None:
+        current_date = int(match.group(1))
+        body = body[:match.start(1)] + body[match.end(1):]
+    return hashlib.blake2b(body, digest_size=16).digest(), current_date
+
+
+def check(api_answer, previous):
+    """Сверяем ответ с отпечатком прошлого.
+
+    Возвращаем (тело, отпечаток). Тело None — домашки в ответе те же,
+    разбирать его не нужно.
+    """
+    if api_answer.status_code == HTTPStatus.NOT_MODIFIED:
+        STATS.record_skip('not_modified')
+        return None, previous
+    body = api_answer.content
+    digest, current_date = body_digest(body)
+    fingerprint = Fingerprint(api_answer.headers.get('ETag'),
+                              api_answer.headers.get('Last-Modified'),
+                              digest, current_date)
+    if previous is not None and previous.digest == digest:
+        fingerprint.statuses = previous.statuses
+        STATS.record_skip('unchanged')
+        return None, fingerprint
+    return body, fingerprint
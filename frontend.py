@@ -0,0 +1,171 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from telegram.error import TelegramError
+
+import config
+import exceptions
+import homework
+import templates
+import vault
+
+logger = logging.getLogger('homework.frontend')
+
+UPDATE_WORKERS = 8
+UPDATE_BACKLOG = 4
+LONG_POLL_TIMEOUT = 30
+ERROR_PAUSE = 5
+
+HELP = (
+    'Пришлите /start <OAuth-токен Практикума>, чтобы получать '
+    'уведомления о статусе домашки.\n'
+    '/status — проверить подписку, /stop — отписаться, '
+    '/lang <ru|en> — язык уведомлений.'
+)
+
+
+def apply_config(settings):
+    global UPDATE_WORKERS
+    UPDATE_WORKERS = settings.update_workers
+
+
+config.on_reload(apply_config)
+
+
+class UpdatePoller:
+    """Приём команд Telegram через long polling `getUpdates`.
+
+    Команды разбираются в пуле из `workers` потоков. Очередь на пул
+    ограничена, поэтому наплыв регистраций притормаживает только приём
+    обновлений, а не рассылку статусов.
+    """
+
+    def __init__(self, bot, registry, sender, store=None, workers=None):
+        workers = workers or UPDATE_WORKERS
+        self.bot = bot
+        self.registry = registry
+        self.sender = sender
+        self.store = store
+        self._executor = ThreadPoolExecutor(
+            workers, thread_name_prefix='updates')
+        self._slots = threading.BoundedSemaphore(workers * UPDATE_BACKLOG)
+        self._stopping = threading.Event()
+        self._thread = None
+        self.offset = None
+
+    def start(self):
+        """Запускаем приём обновлений в фоновом потоке."""
+        self._thread = threading.Thread(
+            target=self._run, name='updates', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Останавливаем приём и дожидаемся разбора принятых команд."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._executor.shutdown(wait=True)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                updates = self.bot.get_updates(
+                    offset=self.offset, timeout=LONG_POLL_TIMEOUT,
+                    allowed_updates=['message'])
+            except TelegramError as error:
+                logger.error('Не удалось получить обновления: %s', error)
+                self._stopping.wait(ERROR_PAUSE)
+                continue
+            for update in updates:
+                self.submit(update)
+
+    def submit(self, update):
+        """Отдаём обновление в пул, ожидая свободного места в очереди."""
+        self.offset = update.update_id + 1
+        self._slots.acquire()
+        future = self._executor.submit(self.handle, update)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def handle(self, update):
+        """Разбираем команду из сообщения."""
+        message = update.message
+        if message is None or not message.text:
+            return
+        command, *args = message.text.split()
+        chat_id = message.chat_id
+        try:
+            if command == '/start' and args:
+                self.hide_token(message)
+                reply = self.subscribe(chat_id, args[0])
+            elif command == '/stop':
+                reply = self.unsubscribe(chat_id)
+            elif command == '/status':
+                reply = self.status(chat_id)
+            elif command == '/lang' and args:
+                reply = self.set_locale(chat_id, args[0])
+            else:
+                reply = HELP
+        except Exception as error:
+            logger.error('Сбой при разборе команды %s: %s', command, error,
+                         extra={'chat_id': chat_id})
+            reply = 'Не удалось выполнить команду, попробуйте позже.'
+        self.sender.send_message(chat_id=chat_id, text=reply)
+
+    def subscribe(self, chat_id, token):
+        """Проверяем токен запросом к API и оформляем подписку."""
+        try:
+            homework.check_response(homework.request_api(
+                None, homework.make_headers(token)))
+        except exceptions.ApiNotResponse:
+            return 'Практикум не принял токен, проверьте его и повторите.'
+        token = vault.seal(token)
+        tenant = self.registry.subscribe(token, chat_id)
+        if self.store is not None:
+            self.store.save_subscription(token, chat_id)
+            tenant.locale = self.store.get_locale(chat_id, tenant.locale)
+        logger.info('Новая подписка', extra={'chat_id': chat_id})
+        return 'Готово! Пришлю сообщение, когда изменится статус домашки.'
+
+    def unsubscribe(self, chat_id):
+        """Удаляем все подписки чата."""
+        tenants = self.registry.find_by_chat(chat_id)
+        for tenant in tenants:
+            self.registry.unsubscribe(tenant.token)
+            if self.store is not None:
+                self.store.delete_subscription(tenant.token)
+        if not tenants:
+            return 'Подписки не было.'
+        return 'Подписка отменена.'
+
+    def status(self, chat_id):
+        """Сообщаем, есть ли у чата подписка."""
+        if self.registry.find_by_chat(chat_id):
+            return 'Подписка активна.'
+        return 'Подписки нет. ' + HELP
+
+    def set_locale(self, chat_id, code):
+        """Меняем язык уведомлений о статусах для чата."""
+        locale = templates.normalize_locale(code)
+        if locale is None:
+            return 'Доступные языки: ' + ', '.join(templates.CATALOG) + '.'
+        for tenant in self.registry.find_by_chat(chat_id):
+            tenant.locale = locale
+        if self.store is not None:
+            self.store.set_locale(chat_id, locale)
+        return f'Язык уведомлений: {locale}.'
+
+    def hide_token(self, message):
+        """Удаляем сообщение с токеном из истории чата.
+
+        Удаляем до проверки токена: неверный токен или сбой проверки
+        не должны оставлять его в чате.
+        """
+        try:
+            self.bot.delete_message(chat_id=message.chat_id,
+                                    message_id=message.message_id)
+        except TelegramError as error:
+            logger.warning('Не удалось удалить сообщение с токеном: %s',
+                           error, extra={'chat_id': message.chat_id})
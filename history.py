@@ -0,0 +1,195 @@
+import bisect
+import sys
+import time
+from array import array
+from datetime import datetime, timezone
+
+import send_queue
+import state
+import templates
+
+REVIEWING = 'reviewing'
+VERDICTS = frozenset(templates.STATUSES) - {REVIEWING}
+STATUS_CODES = {status: code for code, status in enumerate(templates.STATUSES)}
+SHARES = (0.5, 0.9, 0.99)
+
+
+def parse_time(value, default=None):
+    """Момент из `date_updated` API в секундах Unix.
+
+    Число возвращается как есть, строку ISO 8601 переводим сами;
+    непонятное значение заменяем на `default`.
+    """
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return default
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def cohort_of(timestamp):
+    """Когорта проверки — месяц, в котором работа ушла на ревью."""
+    return time.strftime('%Y-%m', time.gmtime(timestamp))
+
+
+class Names:
+    """Строки, заменённые номерами: в колонках журнала лежат только числа."""
+
+    __slots__ = ('ids', 'names')
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def id(self, name):
+        number = self.ids.get(name)
+        if number is None:
+            number = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return number
+
+
+def summarize(durations, shares=SHARES):
+    """Число проверок и перцентили отсортированных длительностей."""
+    summary = {'count': len(durations)}
+    for share in shares:
+        summary[f'p{share * 100:g}'] = send_queue.percentile(durations, share)
+    return summary
+
+
+class History:
+    """Журнал смен статусов в колонках `array` и время проверки по нему.
+
+    Каждое событие — четыре числа в параллельных массивах: чат, домашка,
+    статус и момент. Проверка — путь от `reviewing` до вердикта в одном
+    чате. Её длительность при добавлении вердикта вставляется в
+    отсортированные массивы своей домашки и когорты, так что перцентили
+    по ним — обращение по индексу. Завершённые проверки лежат по времени
+    окончания, и выборка окна находит свои границы двоичным поиском.
+    """
+
+    def __init__(self):
+        self.chats = Names()
+        self.homeworks = Names()
+        self.cohorts = Names()
+        self.chat = array('L')
+        self.homework = array('L')
+        self.status = array('B')
+        self.at = array('q')
+        self.ended = array('q')
+        self.duration = array('q')
+        self.by_homework = {}
+        self.by_cohort = {}
+        self._open = {}
+        self._events = {}
+        self.last_id = 0
+
+    def __len__(self):
+        return len(self.at)
+
+    def append(self, chat_id, name, status, at):
+        """Добавляем событие и закрываем проверку, если это вердикт."""
+        chat = self.chats.id(str(chat_id))
+        homework = self.homeworks.id(name)
+        key = (chat, homework)
+        self._events.setdefault(key, array('L')).append(len(self.at))
+        self.chat.append(chat)
+        self.homework.append(homework)
+        self.status.append(STATUS_CODES[status])
+        self.at.append(at)
+        if status == REVIEWING:
+            self._open.setdefault(key, at)
+        elif status in VERDICTS and key in self._open:
+            started = self._open.pop(key)
+            self._close(homework, started, at)
+
+    def _close(self, homework, started, ended):
+        duration = max(0, ended - started)
+        cohort = self.cohorts.id(cohort_of(started))
+        for groups, group in ((self.by_homework, homework),
+                              (self.by_cohort, cohort)):
+            durations = groups.setdefault(group, array('q'))
+            durations.insert(bisect.bisect(durations, duration), duration)
+        index = bisect.bisect(self.ended, ended)
+        self.ended.insert(index, ended)
+        self.duration.insert(index, duration)
+
+    def load(self, store, batch=100000):
+        """Догружаем из хранилища записи, появившиеся с прошлого раза."""
+        while True:
+            rows = store.events(self.last_id, batch)
+            for _, chat_id, name, status, at in rows:
+                self.append(chat_id, name, status, at)
+            if rows:
+                self.last_id = rows[-1][0]
+            if len(rows) < batch:
+                return self
+
+    def timeline(self, chat_id, name):
+        """Смены статуса одной домашки: список (статус, момент)."""
+        chat = self.chats.ids.get(str(chat_id))
+        homework = self.homeworks.ids.get(name)
+        positions = self._events.get((chat, homework), ())
+        return [(templates.STATUSES[self.status[index]], self.at[index])
+                for index in positions]
+
+    def in_review(self):
+        """Сколько работ сейчас ждут вердикта."""
+        return len(self._open)
+
+    def turnaround(self, name=None, cohort=None, shares=SHARES):
+        """Перцентили времени проверки домашки или когорты в секундах."""
+        if name is not None:
+            groups, names = self.by_homework, self.homeworks
+            key = name
+        else:
+            groups, names = self.by_cohort, self.cohorts
+            key = cohort
+        return summarize(groups.get(names.ids.get(key), ()), shares)
+
+    def per_homework(self, shares=SHARES):
+        return {self.homeworks.names[homework]: summarize(durations, shares)
+                for homework, durations in self.by_homework.items()}
+
+    def per_cohort(self, shares=SHARES):
+        return {self.cohorts.names[cohort]: summarize(durations, shares)
+                for cohort, durations in sorted(self.by_cohort.items())}
+
+    def window(self, start, end, shares=SHARES):
+        """Перцентили проверок, закончившихся в [start, end)."""
+        first = bisect.bisect_left(self.ended, start)
+        last = bisect.bisect_left(self.ended, end)
+        return summarize(sorted(self.duration[first:last]), shares)
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return '-'
+    return f'{seconds / 3600:.1f} ч'
+
+
+def main():
+    """Печатаем время проверки по домашкам и когортам.
+
+    Запуск: python history.py [база состояния]
+    """
+    store = state.StateStore(sys.argv[1] if len(sys.argv) > 1
+                             else state.STATE_DB)
+    history = History().load(store)
+    print(f'событий: {len(history)}, ждут вердикта: {history.in_review()}')
+    for title, groups in (('домашка', history.per_homework()),
+                          ('когорта', history.per_cohort())):
+        print(f'{title:<24} | проверок | медиана | p90    | p99')
+        for name, summary in groups.items():
+            print(f'{name:<24} | {summary["count"]:>8} | '
+                  f'{format_duration(summary["p50"]):>7} | '
+                  f'{format_duration(summary["p90"]):>6} | '
+                  f'{format_duration(summary["p99"])}')
+
+
+if __name__ == '__main__':
+    main()
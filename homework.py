@@ -1,37 +1,39 @@
 import logging
-import os
-import sys
+import threading
 import time
 from http import HTTPStatus
-from logging import StreamHandler, Formatter
 
 import requests
 import telegram
-from dotenv import load_dotenv
 
+import breaker
+import config
 import exceptions
+import fingerprints
+import history
+import http_pool
+import json_stream
+import metrics
+import notifiers
+import outbox
+import scheduler
+import send_queue
+import snapshot
+import state
+import templates
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
-handler = StreamHandler(stream=sys.stdout)
-handler.setFormatter(
-    Formatter(fmt='[%(asctime)s - %(name)s - %(levelname)s - %(message)s]'))
-logger.addHandler(handler)
+logger = logging.getLogger('homework')
 
-load_dotenv()
-PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
-TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
-TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+# Значения подставляет config.setup() при старте и после перечитывания.
+PRACTICUM_TOKEN = None
+TELEGRAM_TOKEN = None
+TELEGRAM_CHAT_ID = None
 
 RETRY_TIME = 600
-ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
+ENDPOINT = config.ENDPOINT
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
 
-HOMEWORK_STATUSES = {
-    'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
-    'reviewing': 'Работа взята на проверку ревьюером.',
-    'rejected': 'Работа проверена: у ревьюера есть замечания.'
-}
+HOMEWORK_STATUSES = templates.CATALOG['ru']['verdicts']
 
 
 def send_message_decorator(func):
@@ -48,34 +50,135 @@ def send_message_decorator(func):
     return wrapper
 
 
+def send_to_chat(bot, chat_id, message):
+    """Отправляем сообщение в указанный чат через Telegram API."""
+    try:
+        bot.send_message(chat_id=chat_id, text=message)
+        logger.info('Cообщение %s успешно отправлено.', message,
+                    extra={'chat_id': chat_id})
+    except exceptions.SendError as error:
+        logger.error('Не удалось отправить сообщение:%s. Ошибка: %s',
+                     message, error, extra={'chat_id': chat_id})
+
+
 @send_message_decorator
 def send_message(bot, message):
     """Отправляем сообщение через Telegram API."""
-    try:
-        bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=message)
-        logger.info(f'Cообщение {message} успешно отправлено.')
-    except exceptions.SendError as error:
-        logger.error(f'Не удалось отправить сообщение:'
-                     f'{message}. Ошибка: {error}')
+    send_to_chat(bot, TELEGRAM_CHAT_ID, message)
 
 
-def get_api_answer(current_timestamp):
-    """Делаем запрос к эндпоинту API Яндекс.Домашка."""
+def make_headers(token):
+    """Собираем заголовки авторизации для токена Практикума."""
+    return {'Authorization': f'OAuth {token}'}
+
+
+def apply_config(settings):
+    """Подставляем токены, адрес API и базовый интервал опроса."""
+    global PRACTICUM_TOKEN, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID
+    global RETRY_TIME, ENDPOINT, HEADERS
+    PRACTICUM_TOKEN = settings.practicum_token
+    TELEGRAM_TOKEN = settings.telegram_token
+    TELEGRAM_CHAT_ID = settings.telegram_chat_id
+    RETRY_TIME = settings.retry_time
+    ENDPOINT = settings.endpoint
+    HEADERS = make_headers(PRACTICUM_TOKEN)
+
+
+config.on_reload(apply_config)
+
+
+def is_outage(status_code):
+    """Сбой всего API — только 5xx и 429.
+
+    Ответ 401 на чужой токен значит, что API работает.
+    """
+    return (status_code >= HTTPStatus.INTERNAL_SERVER_ERROR
+            or status_code == HTTPStatus.TOO_MANY_REQUESTS)
+
+
+def record_api_status(status_code):
+    """Учитываем ответ API в предохранителе."""
+    if is_outage(status_code):
+        breaker.PRACTICUM.failure()
+    else:
+        breaker.PRACTICUM.success()
+
+
+def status_error(status_code):
+    """Исключение для ответа API с неожиданным кодом."""
+    message = 'Ошибка при запросе к API.'
+    if is_outage(status_code):
+        return exceptions.ApiUnavailable(message)
+    return exceptions.ApiNotResponse(message)
+
+
+def send_request(current_timestamp, headers, session=requests, **kwargs):
+    """Делаем запрос к API Яндекс.Домашка с заголовками подписчика.
+
+    `session` — сессия из `http_pool.make_session()` с пулом соединений,
+    по умолчанию запрос идёт без сессии через `requests.get`.
+    """
     timestamp = current_timestamp or int(time.time())
     params = {'from_date': timestamp}
+    breaker.PRACTICUM.check()
+    started = time.perf_counter()
     try:
-        api_answer = requests.get(ENDPOINT,
-                                  headers=HEADERS,
-                                  params=params)
-    except exceptions.ApiNotResponse:
-        raise exceptions.ApiNotResponse('Ошибка при запросе к API.')
-    if api_answer.status_code != HTTPStatus.OK:
-        message = 'Ошибка при запросе к API.'
-        raise exceptions.ApiNotResponse(message)
+        api_answer = session.get(ENDPOINT,
+                                 headers=headers,
+                                 params=params,
+                                 timeout=http_pool.TIMEOUT,
+                                 **kwargs)
+    except requests.RequestException as error:
+        breaker.PRACTICUM.failure()
+        raise exceptions.ApiUnavailable(
+            f'Ошибка при запросе к API: {error}')
+    finally:
+        metrics.API_LATENCY.observe(time.perf_counter() - started)
+    record_api_status(api_answer.status_code)
+    if api_answer.status_code not in (HTTPStatus.OK,
+                                      HTTPStatus.NOT_MODIFIED):
+        raise status_error(api_answer.status_code)
     if api_answer is None:
         message = 'Пустой ответ от API.'
         raise exceptions.ApiNotResponse(message)
-    return api_answer.json()
+    return api_answer
+
+
+def request_api(current_timestamp, headers, session=requests):
+    """Запрашиваем статусы домашек и разбираем ответ целиком."""
+    return send_request(current_timestamp, headers, session).json()
+
+
+def request_api_stream(current_timestamp, headers, session=requests):
+    """Запрашиваем статусы домашек с разбором ответа по мере чтения.
+
+    Возвращаем `json_stream.HomeworkStream`: итерация по нему отдаёт
+    проверенные домашки по одной, не загружая весь ответ в память.
+    """
+    api_answer = send_request(current_timestamp, headers, session,
+                              stream=True)
+    return json_stream.HomeworkStream(
+        api_answer.iter_content(json_stream.CHUNK_SIZE))
+
+
+def fetch_api_if_changed(current_timestamp, headers, session=requests,
+                         fingerprint=None):
+    """Запрашиваем статусы и сверяем ответ с отпечатком прошлого.
+
+    С отпечатком запрос идёт с If-None-Match или If-Modified-Since, если
+    API их выдавал. Возвращаем (тело, отпечаток); тело None, если API
+    ответил 304 или домашки те же, что в прошлый раз, — тогда ответ не
+    нужно ни разбирать, ни проверять.
+    """
+    api_answer = send_request(
+        current_timestamp,
+        fingerprints.conditional_headers(headers, fingerprint), session)
+    return fingerprints.check(api_answer, fingerprint)
+
+
+def get_api_answer(current_timestamp):
+    """Делаем запрос к эндпоинту API Яндекс.Домашка."""
+    return request_api(current_timestamp, HEADERS)
 
 
 def check_response(response):
@@ -96,6 +199,18 @@ def check_response(response):
     return result
 
 
+def get_cursor(response, current_timestamp):
+    """Берём `from_date` следующего запроса из `current_date` ответа API.
+
+    Курсор двигает сервер, а не локальные часы: так не теряются
+    и не дублируются статусы при расхождении времени или долгом запросе.
+    """
+    current_date = response.get('current_date')
+    if isinstance(current_date, int) and current_date > 0:
+        return current_date
+    return current_timestamp
+
+
 def parse_status(homework):
     """Извлекаем статус домашки и возвращаем читабельную строку."""
     if 'homework_name' not in homework:
@@ -110,8 +225,30 @@ def parse_status(homework):
         message = (f'Получен незадокументированный'
                    f' статус работы:{homework_status}')
         raise exceptions.ApiStatusNotInDocs(message)
-    verdict = HOMEWORK_STATUSES[homework_status]
-    return f'Изменился статус проверки работы "{homework_name}". {verdict}'
+    return templates.render(homework_name, homework_status,
+                            lesson=homework.get('lesson_name'),
+                            comment=homework.get('reviewer_comment'))
+
+
+def enqueue_status(store, chat_id, name, status, message, updated=None):
+    """Кладём уведомление в outbox, если статус сменился с прошлого раза.
+
+    Новый статус и уведомление о нём сохраняются вместе при `flush()`,
+    отправляет их `outbox.deliver`. Возвращаем сообщение или None для
+    повтора.
+    """
+    if not store.is_transition(chat_id, name, status):
+        metrics.MESSAGES.inc('suppressed')
+        return None
+    detected_at = int(time.time())
+    store.record(chat_id, name, status, detected_at)
+    store.log_event(chat_id, name, status,
+                    history.parse_time(updated, detected_at))
+    store.enqueue(outbox.outbox_key(chat_id, name, status,
+                                    updated or detected_at),
+                  chat_id, message)
+    metrics.TRANSITIONS.inc(status)
+    return message
 
 
 def check_tokens():
@@ -133,27 +270,55 @@ def check_tokens():
 
 def main():
     """Основная логика работы бота."""
+    config.setup()
     if not check_tokens():
         raise exceptions.TokenError('Проблема с токенами!')
-    bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    current_timestamp = int(time.time())
-    while True:
+    metrics.start_server()
+    sender = send_queue.SendQueue(telegram.Bot(token=TELEGRAM_TOKEN)).start()
+    config.on_reload(sender.apply_config)
+    bot = notifiers.build(sender)
+    session = http_pool.make_session(pool_size=1)
+    store = state.StateStore()
+    current_timestamp = store.get_cursor(
+        PRACTICUM_TOKEN, int(time.time()), TELEGRAM_CHAT_ID)
+    poll_state = scheduler.PollState()
+    stop = snapshot.stop_on_signals(threading.Event())
+    stop.wait(snapshot.resume(PRACTICUM_TOKEN, poll_state))
+    digest = breaker.ErrorDigest()
+    while not stop.is_set():
+        for _, summary in digest.pending():
+            send_message(bot, summary)
         try:
-            response = get_api_answer(current_timestamp)
+            response = request_api(current_timestamp, HEADERS, session)
             homework = check_response(response)
             if homework:
                 for hw in homework:
-                    message = parse_status(hw)
-                    send_message(bot, message)
+                    enqueue_status(store, TELEGRAM_CHAT_ID,
+                                   hw['homework_name'], hw['status'],
+                                   parse_status(hw), hw.get('date_updated'))
             else:
-                logger.debug('Нет новых статусов')
-            current_timestamp = int(time.time())
-            time.sleep(RETRY_TIME)
+                logger.debug('Нет новых статусов',
+                             extra={'chat_id': TELEGRAM_CHAT_ID})
+            current_timestamp = get_cursor(response, current_timestamp)
+            store.set_cursor(PRACTICUM_TOKEN, current_timestamp)
+            store.flush()
+            outbox.deliver(bot, store)
+            statuses = [(hw['homework_name'], hw['status'])
+                        for hw in homework]
+            delay = scheduler.next_delay(poll_state, statuses,
+                                         base=RETRY_TIME)
         except Exception as error:
             message = f'Сбой в работе программы: {error}'
             logger.error(message)
-            send_message(bot, message)
-            time.sleep(RETRY_TIME)
+            metrics.ERRORS.inc(type(error).__name__)
+            if digest.report(TELEGRAM_CHAT_ID, message):
+                send_message(bot, message)
+            delay = scheduler.next_delay(poll_state, error=error,
+                                         base=RETRY_TIME)
+        poll_state.due = time.time() + delay
+        stop.wait(delay)
+    snapshot.save([(PRACTICUM_TOKEN, poll_state)])
+    snapshot.drain(bot, sender, store)
 
 
 if __name__ == '__main__':
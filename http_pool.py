@@ -0,0 +1,54 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10.0
+TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+POOL_SIZE = 10
+
+
+def apply_config(settings):
+    global CONNECT_TIMEOUT, READ_TIMEOUT, TIMEOUT, POOL_SIZE
+    CONNECT_TIMEOUT = settings.connect_timeout
+    READ_TIMEOUT = settings.read_timeout
+    TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+    POOL_SIZE = settings.http_pool_size
+
+
+config.on_reload(apply_config)
+
+
+def make_session(pool_size=None):
+    """Создаём сессию с пулом keep-alive соединений.
+
+    `pool_size` — сколько соединений к одному хосту держим открытыми;
+    для многопоточного опроса он должен быть не меньше числа потоков.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=pool_size or POOL_SIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def connection_stats(session):
+    """Считаем открытые соединения и запросы по пулам сессии.
+
+    `reused` — сколько запросов обошлись без нового TCP/TLS рукопожатия.
+    """
+    connections = requests_sent = 0
+    for adapter in set(session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            connections += pool.num_connections
+            requests_sent += pool.num_requests
+    return {
+        'connections': connections,
+        'requests': requests_sent,
+        'reused': requests_sent - connections,
+    }
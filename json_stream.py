@@ -0,0 +1,138 @@
+import codecs
+import json
+
+import exceptions
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = ' \t\n\r'
+
+_decoder = json.JSONDecoder()
+
+
+class HomeworkStream:
+    """Разбор ответа API по частям: домашки отдаются по одной.
+
+    Из ответа целиком в памяти держится только текущая домашка и
+    непрочитанный хвост последнего куска. Остальные ключи верхнего
+    уровня (`current_date`) становятся доступны в `fields`, когда
+    итерация дошла до конца ответа.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+        self.fields = {}
+
+    @property
+    def current_date(self):
+        """`current_date` из ответа; доступен после итерации."""
+        return self.fields.get('current_date')
+
+    def __iter__(self):
+        if not self._skip_ws():
+            raise exceptions.ApiEmptyResponse('Получен пустой ответ от API')
+        if self._buf[self._pos] != '{':
+            raise TypeError('Объект не типа dict')
+        self._pos += 1
+        found = False
+        while True:
+            self._skip_ws()
+            if self._peek() == '}':
+                self._pos += 1
+                break
+            key = self._value()
+            self._expect(':')
+            self._skip_ws()
+            if key == 'homeworks':
+                found = True
+                yield from self._homeworks()
+            else:
+                self.fields[key] = self._value()
+            self._skip_ws()
+            if self._peek() == ',':
+                self._pos += 1
+        if not found:
+            raise KeyError('В полученном от API результате нет ключа '
+                           'homeworks')
+
+    def _homeworks(self):
+        if self._peek() != '[':
+            self.fields['homeworks'] = self._value()
+            raise TypeError('homeworks извлечен из API не в виде списка')
+        self._pos += 1
+        while True:
+            self._skip_ws()
+            char = self._peek()
+            if char == ']':
+                self._pos += 1
+                return
+            if char == ',':
+                self._pos += 1
+                continue
+            item = self._value()
+            if not isinstance(item, dict):
+                raise TypeError('Домашка извлечена из API не в виде dict')
+            yield item
+
+    def _read(self):
+        """Дочитываем следующий кусок, отбрасывая разобранное начало."""
+        if self._eof:
+            return False
+        self._buf = self._buf[self._pos:]
+        self._pos = 0
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._eof = True
+            self._buf += self._text.decode(b'', final=True)
+        else:
+            self._buf += self._text.decode(chunk)
+        return True
+
+    def _skip_ws(self):
+        """Пропускаем пробелы; False, если ответ закончился."""
+        while True:
+            while (self._pos < len(self._buf)
+                   and self._buf[self._pos] in WHITESPACE):
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return True
+            if not self._read():
+                return False
+
+    def _peek(self):
+        if not self._skip_ws():
+            raise json.JSONDecodeError('Неожиданный конец ответа',
+                                       self._buf, self._pos)
+        return self._buf[self._pos]
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise json.JSONDecodeError(f'Ожидался символ {char!r}',
+                                       self._buf, self._pos)
+        self._pos += 1
+
+    def _value(self):
+        """Разбираем одно значение, дочитывая куски, пока оно не полное.
+
+        Значение, упёршееся в конец буфера, разбирается повторно после
+        следующего куска: иначе число `12` из `123` сочлось бы целым.
+        """
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._read():
+                    raise
+                continue
+            if end == len(self._buf) and self._read():
+                continue
+            self._pos = end
+            return value
+
+
+def iter_homeworks(chunks):
+    """Домашки из ответа API, разбираемые по мере чтения кусков."""
+    return iter(HomeworkStream(chunks))
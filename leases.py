@@ -0,0 +1,371 @@
+import functools
+import hashlib
+import logging
+import socket
+import sqlite3
+import threading
+import time
+
+import config
+import ring
+import tenants
+
+logger = logging.getLogger('homework.leases')
+
+LEASE_STORE = ''
+LEASE_TTL = 30
+NODE_NAME = socket.gethostname()
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,
+    owner TEXT,
+    token INTEGER NOT NULL,
+    expires REAL NOT NULL,
+    cursor INTEGER
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS nodes (
+    node TEXT PRIMARY KEY,
+    expires REAL NOT NULL
+) WITHOUT ROWID;
+'''
+
+
+def apply_config(settings):
+    global LEASE_STORE, LEASE_TTL, NODE_NAME
+    LEASE_STORE = settings.lease_store
+    LEASE_TTL = settings.lease_ttl
+    NODE_NAME = settings.node
+
+
+config.on_reload(apply_config)
+
+
+class Lease:
+    """Аренда подписки: узел-владелец и его токен ограждения.
+
+    Токен растёт с каждым захватом аренды, поэтому хранилище отличает
+    текущего владельца от узла, который проспал истечение аренды.
+    `deadline` — момент по локальным часам, после которого узел, не
+    сумевший продлить аренду, перестаёт опрашивать подписку.
+    """
+
+    __slots__ = ('key', 'owner', 'token', 'cursor', 'deadline')
+
+    def __init__(self, key, owner, token, cursor=None):
+        self.key = key
+        self.owner = owner
+        self.token = token
+        self.cursor = cursor
+        self.deadline = None
+
+    def __repr__(self):
+        return f'Lease({self.key!r}, {self.owner!r}, token={self.token})'
+
+
+def lease_key(token):
+    """Ключ аренды: хеш токена, чтобы сам токен не попал в хранилище."""
+    return 'lease:' + hashlib.sha256(token.encode()).hexdigest()[:32]
+
+
+class SqliteLeaseStore:
+    """Аренды в SQLite: для одного хоста и локальной проверки.
+
+    Захват идёт в транзакции `BEGIN IMMEDIATE`, так что узлы в разных
+    процессах не захватят одну аренду одновременно. Ожидание блокировки
+    короче трети `LEASE_TTL`, чтобы зависший пульс не пережил аренду.
+    """
+
+    def __init__(self, path, clock=time.time, timeout=None):
+        self.clock = clock
+        self._conn = sqlite3.connect(path, timeout=timeout or LEASE_TTL / 3,
+                                     isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def acquire(self, key, owner, ttl):
+        """Захватываем свободную или истёкшую аренду; None, если занята."""
+        now = self.clock()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute(
+                    'SELECT owner, token, expires, cursor FROM leases '
+                    'WHERE key = ?', (key,)).fetchone()
+                if row is not None and row[0] is not None and row[2] > now:
+                    self._conn.execute('ROLLBACK')
+                    return None
+                token = (row[1] if row else 0) + 1
+                cursor = row[3] if row else None
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO leases '
+                    '(key, owner, token, expires, cursor) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (key, owner, token, now + ttl, cursor))
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        return Lease(key, owner, token, cursor)
+
+    def renew(self, lease, ttl, cursor=None):
+        """Продлеваем аренду и сохраняем курсор, если токен ещё наш."""
+        with self._lock:
+            updated = self._conn.execute(
+                'UPDATE leases SET expires = ?, '
+                'cursor = COALESCE(?, cursor) '
+                'WHERE key = ? AND token = ? AND owner = ?',
+                (self.clock() + ttl, cursor, lease.key, lease.token,
+                 lease.owner))
+        return updated.rowcount == 1
+
+    def release(self, lease, cursor=None):
+        """Отдаём аренду, оставляя курсор следующему владельцу."""
+        with self._lock:
+            self._conn.execute(
+                'UPDATE leases SET owner = NULL, expires = 0, '
+                'cursor = COALESCE(?, cursor) '
+                'WHERE key = ? AND token = ?',
+                (cursor, lease.key, lease.token))
+
+    def heartbeat(self, node, ttl):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO nodes (node, expires) VALUES (?, ?)',
+                (node, self.clock() + ttl))
+
+    def live_nodes(self):
+        with self._lock:
+            return [node for node, in self._conn.execute(
+                'SELECT node FROM nodes WHERE expires > ? ORDER BY node',
+                (self.clock(),))]
+
+    def leave(self, node):
+        with self._lock:
+            self._conn.execute('DELETE FROM nodes WHERE node = ?', (node,))
+
+    def close(self):
+        self._conn.close()
+
+
+ACQUIRE_SCRIPT = '''
+if redis.call('EXISTS', KEYS[1]) == 1 then return false end
+local token = redis.call('INCR', KEYS[2])
+redis.call('SET', KEYS[1], ARGV[1] .. ':' .. token, 'PX', ARGV[2])
+return {token, redis.call('GET', KEYS[3])}
+'''
+
+RENEW_SCRIPT = '''
+if redis.call('GET', KEYS[2]) ~= ARGV[1] then return 0 end
+if ARGV[4] ~= '' then redis.call('SET', KEYS[3], ARGV[4]) end
+if ARGV[3] == '0' then
+    redis.call('DEL', KEYS[1])
+else
+    redis.call('SET', KEYS[1], ARGV[2] .. ':' .. ARGV[1], 'PX', ARGV[3])
+end
+return 1
+'''
+
+
+class RedisLeaseStore:
+    """Аренды в Redis или совместимом хранилище для нескольких хостов.
+
+    `client` — клиент с интерфейсом redis-py. Аренда — ключ с PX-сроком,
+    токен ограждения — отдельный счётчик INCR, курсор хранится рядом.
+    Проверка токена и запись идут одним Lua-скриптом.
+    """
+
+    nodes_key = 'homework:nodes'
+
+    def __init__(self, client):
+        self.client = client
+        self._acquire = client.register_script(ACQUIRE_SCRIPT)
+        self._renew = client.register_script(RENEW_SCRIPT)
+
+    @staticmethod
+    def _keys(key):
+        return [f'homework:{key}', f'homework:{key}:fence',
+                f'homework:{key}:cursor']
+
+    def acquire(self, key, owner, ttl):
+        result = self._acquire(keys=self._keys(key),
+                               args=[owner, int(ttl * 1000)])
+        if not result:
+            return None
+        token, cursor = result
+        return Lease(key, owner, int(token),
+                     int(cursor) if cursor is not None else None)
+
+    def renew(self, lease, ttl, cursor=None):
+        return bool(self._renew(keys=self._keys(lease.key), args=[
+            lease.token, lease.owner, int(ttl * 1000),
+            '' if cursor is None else cursor]))
+
+    def release(self, lease, cursor=None):
+        self._renew(keys=self._keys(lease.key), args=[
+            lease.token, lease.owner, 0, '' if cursor is None else cursor])
+
+    def heartbeat(self, node, ttl):
+        self.client.zadd(self.nodes_key, {node: time.time() + ttl})
+
+    def live_nodes(self):
+        now = time.time()
+        self.client.zremrangebyscore(self.nodes_key, '-inf', now)
+        return sorted(
+            node.decode() if isinstance(node, bytes) else node
+            for node in self.client.zrangebyscore(
+                self.nodes_key, now, '+inf'))
+
+    def leave(self, node):
+        self.client.zrem(self.nodes_key, node)
+
+    def close(self):
+        self.client.close()
+
+
+def open_store(url=None):
+    """Открываем хранилище аренд по адресу `redis://...` или пути SQLite.
+
+    Клиент redis-py нужен только для Redis и ставится отдельно.
+    """
+    url = url or LEASE_STORE
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        import redis
+        return RedisLeaseStore(redis.Redis.from_url(url))
+    return SqliteLeaseStore(url.replace('sqlite:///', '', 1))
+
+
+class Coordinator:
+    """Подписки узла, закреплённые за ним арендами в общем хранилище.
+
+    Узлы отмечаются в хранилище пульсом и делят подписки кольцом из
+    живых узлов. Узел берёт аренды своей доли, продлевает их каждые
+    `ttl / 3` секунд вместе с курсором и отдаёт подписки, ушедшие
+    другому узлу. Если продлить аренду не удалось, подписка перестаёт
+    опрашиваться раньше, чем аренда истечёт в хранилище, а новый
+    владелец продолжает с курсора прежнего: уведомления не дублируются.
+    Подписки реестра проверяют токен ограждения и срок аренды перед
+    опросом, перед записью статуса и перед отправкой из outbox.
+    """
+
+    def __init__(self, leases, node=None, store=None, load_all=None,
+                 ttl=None, clock=time.monotonic):
+        self.leases = leases
+        self.node = node or NODE_NAME
+        self.store = store
+        self.load_all = load_all or (
+            lambda: tenants.load_subscriptions(tenants.SUBSCRIPTIONS_FILE,
+                                               store=store))
+        self.ttl = ttl or LEASE_TTL
+        self.clock = clock
+        self.registry = tenants.Registry(leased=True)
+        self.held = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def tick(self):
+        """Пульс: продлеваем, отдаём и захватываем аренды.
+
+        Возвращаем число подписок узла.
+        """
+        now = self.clock()
+        with self._lock:
+            self._expire(now)
+            try:
+                self.leases.heartbeat(self.node, self.ttl)
+                hash_ring = ring.HashRing(self.leases.live_nodes())
+                everyone = self.load_all()
+                self._renew(hash_ring, everyone, now)
+                self._acquire(hash_ring, everyone, now)
+            except Exception as error:
+                logger.error('Хранилище аренд недоступно: %s', error)
+                self._expire(self.clock())
+            return len(self.registry)
+
+    def _renew(self, hash_ring, everyone, now):
+        for token, lease in list(self.held.items()):
+            tenant = self.registry.get(token)
+            cursor = tenant.timestamp if tenant is not None else None
+            if (token not in everyone
+                    or hash_ring.node_for(token) != self.node):
+                self.leases.release(lease, cursor)
+                self._drop(token)
+            elif self.leases.renew(lease, self.ttl, cursor):
+                lease.deadline = now + self.ttl / 2
+            else:
+                logger.warning('Аренду перехватил другой узел',
+                               extra={'chat_id': getattr(tenant, 'chat_id',
+                                                         None)})
+                self._drop(token)
+
+    def _acquire(self, hash_ring, everyone, now):
+        for tenant in everyone:
+            if (tenant.token in self.held
+                    or hash_ring.node_for(tenant.token) != self.node):
+                continue
+            lease = self.leases.acquire(lease_key(tenant.token), self.node,
+                                        self.ttl)
+            if lease is None:
+                continue
+            lease.deadline = now + self.ttl / 2
+            self.held[tenant.token] = lease
+            cursor = lease.cursor or tenant.timestamp
+            locale = tenant.locale
+            if self.store is not None:
+                self.store.load_chat(tenant.chat_id, tenant.token)
+                cursor = lease.cursor or self.store.get_cursor(
+                    tenant.token, tenant.timestamp, tenant.chat_id)
+                locale = self.store.get_locale(tenant.chat_id, locale)
+            owned = self.registry.subscribe(tenant.token, tenant.chat_id,
+                                            cursor)
+            owned.locale = locale
+            owned.guard = functools.partial(self.owns, tenant.token,
+                                            lease.token)
+
+    def _expire(self, now):
+        """Бросаем подписки, аренду которых не продлили к сроку."""
+        for token, lease in list(self.held.items()):
+            if lease.deadline <= now:
+                self._drop(token)
+
+    def _drop(self, token):
+        del self.held[token]
+        self.registry.unsubscribe(token)
+
+    def owns(self, token, fence):
+        """Действует ли ещё аренда подписки с токеном ограждения `fence`.
+
+        Проверяется без блокировки пульса: зависший в хранилище пульс
+        не задерживает опрос, а истёкший срок виден сразу.
+        """
+        lease = self.held.get(token)
+        return (lease is not None and lease.token == fence
+                and lease.deadline > self.clock())
+
+    def run(self):
+        while not self._stopping.is_set():
+            self.tick()
+            self._stopping.wait(self.ttl / 3)
+
+    def start(self):
+        """Берём первые аренды и продлеваем их в фоновом потоке."""
+        self.tick()
+        self._thread = threading.Thread(target=self.run, name='leases',
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Отдаём все аренды с курсорами и уходим из кольца."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            for token, lease in list(self.held.items()):
+                tenant = self.registry.get(token)
+                self.leases.release(lease, tenant and tenant.timestamp)
+                self._drop(token)
+            self.leases.leave(self.node)
@@ -0,0 +1,109 @@
+import atexit
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+# Значения по умолчанию; при запуске их передаёт config.setup().
+LOG_FORMAT = 'text'
+SAMPLE_EVERY = 100
+SAMPLED_MESSAGES = frozenset({'Нет новых статусов'})
+CONTEXT_FIELDS = ('chat_id',)
+
+TEXT_FORMAT = ('[%(asctime)s - %(name)s - %(levelname)s - '
+               '%(message)s%(context)s]')
+
+
+class TextFormatter(logging.Formatter):
+    """Прежний текстовый формат, дополненный полями контекста."""
+
+    def format(self, record):
+        record.context = ''.join(
+            f' ({field}={getattr(record, field)})' for field in CONTEXT_FIELDS
+            if getattr(record, field, None) is not None)
+        return super().format(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """Пишем запись одной JSON-строкой вместе с полями контекста."""
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SampleFilter(logging.Filter):
+    """Пропускаем только каждую `every`-ю запись из частых повторов.
+
+    Повторы считаются отдельно для каждого чата, поэтому первая запись
+    по любой подписке всё равно попадёт в лог.
+    """
+
+    def __init__(self, messages=SAMPLED_MESSAGES, every=SAMPLE_EVERY):
+        super().__init__()
+        self.messages = messages
+        self.every = every
+        self._counts = {}
+
+    def filter(self, record):
+        if record.msg not in self.messages:
+            return True
+        key = (record.msg, getattr(record, 'chat_id', None))
+        count = self._counts.get(key, 0)
+        self._counts[key] = count + 1
+        return count % self.every == 0
+
+
+class ContextQueueHandler(QueueHandler):
+    """QueueHandler, который не форматирует запись в потоке программы.
+
+    Стандартный `prepare()` склеивает сообщение сразу; здесь запись
+    уходит в очередь как есть, а форматирует её поток слушателя.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def setup_logging(logger, level='DEBUG', fmt=LOG_FORMAT, stream=None,
+                  every=SAMPLE_EVERY):
+    """Настраиваем логгер: запись в очередь, вывод в отдельном потоке.
+
+    Возвращаем запущенный `QueueListener`; повторный вызов для уже
+    настроенного логгера ничего не меняет.
+    """
+    for handler in logger.handlers:
+        if isinstance(handler, ContextQueueHandler):
+            return handler.listener
+    output = logging.StreamHandler(stream or sys.stdout)
+    if fmt == 'json':
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(TextFormatter(fmt=TEXT_FORMAT))
+    records = queue.SimpleQueue()
+    handler = ContextQueueHandler(records)
+    handler.addFilter(SampleFilter(every=every))
+    handler.listener = QueueListener(records, output)
+    handler.listener.start()
+    atexit.register(stop_logging, handler.listener)
+    logger.setLevel(level)
+    logger.addHandler(handler)
+    return handler.listener
+
+
+def stop_logging(listener):
+    """Дописываем очередь записей и останавливаем поток вывода."""
+    if listener._thread is not None:
+        listener.stop()
@@ -0,0 +1,210 @@
+import bisect
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+
+METRICS_HOST = '127.0.0.1'
+METRICS_PORT = 0
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+ENABLED = False
+REGISTRY = []
+
+
+class Metric:
+    """Общая часть метрик: имя, описание, метки и значения по меткам.
+
+    Пока сбор выключен (`ENABLED`), методы изменения сразу возвращаются,
+    поэтому инструментированный код почти ничего не теряет.
+    """
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _labels(self, labels):
+        return ','.join(f'{name}="{value}"' for name, value
+                        in zip(self.labelnames, labels))
+
+    def samples(self):
+        """Строки выдачи в текстовом формате Prometheus."""
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            text = self._labels(labels)
+            yield f'{self.name}{{{text}}} {value}' if text else (
+                f'{self.name} {value}')
+
+
+class Counter(Metric):
+    """Монотонный счётчик."""
+
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        """Увеличиваем счётчик для набора меток."""
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    """Текущее значение; может вычисляться функцией при каждом запросе."""
+
+    kind = 'gauge'
+
+    def set(self, value, *labels):
+        """Запоминаем значение для набора меток."""
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = value
+
+    def set_function(self, func, *labels):
+        """Значение будет браться из `func()` при выдаче метрик."""
+        with self._lock:
+            self._values[labels] = func
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            if callable(value):
+                value = value()
+            text = self._labels(labels)
+            yield f'{self.name}{{{text}}} {value}' if text else (
+                f'{self.name} {value}')
+
+
+class Histogram(Metric):
+    """Распределение значений по корзинам с суммой и количеством."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        """Учитываем одно наблюдение."""
+        if not ENABLED:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                counts = self._values[labels] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(counts))
+                     for labels, counts in self._values.items()]
+        for labels, counts in items:
+            text = self._labels(labels)
+            prefix = f'{text},' if text else ''
+            total = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                total += count
+                yield f'{self.name}_bucket{{{prefix}le="{bound}"}} {total}'
+            suffix = f'{{{text}}}' if text else ''
+            yield f'{self.name}_count{suffix} {total}'
+            yield f'{self.name}_sum{suffix} {counts[-1]}'
+
+
+API_LATENCY = Histogram(
+    'homework_api_request_seconds', 'Время запроса к API Практикума')
+TELEGRAM_LATENCY = Histogram(
+    'homework_telegram_send_seconds', 'Время отправки сообщения в Telegram')
+ERRORS = Counter(
+    'homework_errors_total', 'Сбои опроса по классу исключения', ('error',))
+TRANSITIONS = Counter(
+    'homework_status_transitions_total', 'Смены статуса домашки',
+    ('status',))
+MESSAGES = Counter(
+    'homework_messages_total', 'Сообщения о статусе: отправлены, '
+    'отброшены как повтор или отложены после всех попыток', ('outcome',))
+SCHEDULER_LAG = Gauge(
+    'homework_scheduler_lag_seconds', 'Насколько опрос отстал от расписания')
+SINK_DELIVERIES = Counter(
+    'homework_sink_deliveries_total', 'Доставка в приёмники уведомлений: '
+    'отправлено, сбой или отброшено при переполнении', ('sink', 'outcome'))
+SINK_LATENCY = Histogram(
+    'homework_sink_send_seconds', 'Время доставки в приёмник уведомлений',
+    ('sink',))
+QUEUE_DEPTH = Gauge(
+    'homework_send_queue_depth', 'Сообщения в очереди на отправку')
+POLLS_SKIPPED = Counter(
+    'homework_polls_skipped_total', 'Опросы без разбора ответа: 304 или '
+    'те же домашки', ('reason',))
+CIRCUIT_STATE = Gauge(
+    'homework_circuit_state', 'Состояние предохранителя: 0 — закрыт, '
+    '1 — пробный запрос, 2 — разомкнут', ('endpoint',))
+CIRCUIT_OPENED = Counter(
+    'homework_circuit_opened_total', 'Сколько раз размыкался предохранитель',
+    ('endpoint',))
+
+
+def render():
+    """Собираем все метрики в текстовом формате Prometheus."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Отдаёт метрики по GET /metrics."""
+
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        body = render().encode()
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def apply_config(settings):
+    global METRICS_HOST, METRICS_PORT
+    METRICS_HOST = settings.metrics_host
+    METRICS_PORT = settings.metrics_port
+
+
+config.on_reload(apply_config)
+
+
+def start_server(port=None, host=None):
+    """Включаем сбор метрик и отдаём их по HTTP в фоновом потоке.
+
+    Порт 0 в `METRICS_PORT` значит, что метрики выключены.
+    """
+    global ENABLED
+    port = port or METRICS_PORT
+    if not port:
+        return None
+    ENABLED = True
+    server = ThreadingHTTPServer((host or METRICS_HOST, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics',
+                     daemon=True).start()
+    return server
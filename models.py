@@ -0,0 +1,80 @@
+import enum
+
+import exceptions
+import templates
+
+HomeworkStatus = enum.Enum('HomeworkStatus', {
+    status.upper(): status for status in templates.STATUSES})
+HomeworkStatus.__doc__ = 'Документированные статусы проверки домашки.'
+
+STATUSES = {status.value: status for status in HomeworkStatus}
+
+
+class Homework:
+    """Домашка из ответа API: только нужные поля, без исходного словаря."""
+
+    __slots__ = ('name', 'status', 'date_updated', 'lesson_name',
+                 'reviewer_comment')
+
+    def __init__(self, name, status, date_updated=None, lesson_name=None,
+                 reviewer_comment=None):
+        self.name = name
+        self.status = status
+        self.date_updated = date_updated
+        self.lesson_name = lesson_name
+        self.reviewer_comment = reviewer_comment
+
+    def __repr__(self):
+        return f'Homework({self.name!r}, {self.status.value!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, Homework):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field)
+                   for field in self.__slots__)
+
+    @property
+    def message(self):
+        """Текст уведомления, как у `homework.parse_status`."""
+        return self.render()
+
+    def render(self, locale=None):
+        """Текст уведомления на языке чата."""
+        return templates.render(self.name, self.status.value, locale,
+                                self.lesson_name, self.reviewer_comment)
+
+
+def make_homework(item):
+    """Проверяем одну домашку из ответа API и собираем запись."""
+    try:
+        name = item['homework_name']
+        raw_status = item['status']
+    except KeyError as error:
+        raise KeyError(f'Отсутствует ключ {error}') from None
+    except TypeError:
+        raise TypeError('Домашка извлечена из API не в виде dict') from None
+    status = STATUSES.get(raw_status)
+    if status is None:
+        raise exceptions.ApiStatusNotInDocs(
+            f'Получен незадокументированный статус работы:{raw_status}')
+    return Homework(name, status, item.get('date_updated'),
+                    item.get('lesson_name'), item.get('reviewer_comment'))
+
+
+def parse_homeworks(response):
+    """Проверяем ответ API за один проход и собираем записи домашек.
+
+    Ошибки те же, что у `check_response` и `parse_status`.
+    """
+    if response is None:
+        raise exceptions.ApiEmptyResponse('Получен пустой ответ от API')
+    if not isinstance(response, dict):
+        raise TypeError('Объект не типа dict')
+    try:
+        items = response['homeworks']
+    except KeyError:
+        raise KeyError('В полученном от API результате нет ключа '
+                       'homeworks') from None
+    if not isinstance(items, list):
+        raise TypeError('homeworks извлечен из API не в виде списка')
+    return [make_homework(item) for item in items]
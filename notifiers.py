@@ -0,0 +1,193 @@
+import logging
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+
+import config
+import exceptions
+import http_pool
+import metrics
+import send_queue
+
+logger = logging.getLogger('homework.notifiers')
+
+WEBHOOK_URL = ''
+SMTP_HOST = ''
+SMTP_PORT = 25
+SMTP_SENDER = 'homework-bot@localhost'
+SMTP_RECIPIENTS = ()
+SINK_WORKERS = 2
+SINK_TIMEOUT = 10.0
+SINK_BACKLOG = 1000
+
+
+def apply_config(settings):
+    global WEBHOOK_URL, SMTP_HOST, SMTP_PORT, SMTP_SENDER, SMTP_RECIPIENTS
+    global SINK_WORKERS, SINK_TIMEOUT
+    WEBHOOK_URL = settings.webhook_url
+    SMTP_HOST = settings.smtp_host
+    SMTP_PORT = settings.smtp_port
+    SMTP_SENDER = settings.smtp_sender
+    SMTP_RECIPIENTS = tuple(address.strip() for address
+                            in settings.smtp_recipients.split(',')
+                            if address.strip())
+    SINK_WORKERS = settings.sink_workers
+    SINK_TIMEOUT = settings.sink_timeout
+
+
+config.on_reload(apply_config)
+
+
+class WebhookNotifier:
+    """Уведомление POST-запросом с JSON `{"chat_id": ..., "text": ...}`."""
+
+    name = 'webhook'
+
+    def __init__(self, url, session=None, timeout=None):
+        self.url = url
+        self.session = session or http_pool.make_session()
+        self.timeout = timeout
+
+    def send(self, chat_id, text):
+        response = self.session.post(
+            self.url, json={'chat_id': chat_id, 'text': text},
+            timeout=self.timeout or SINK_TIMEOUT)
+        if not 200 <= response.status_code < 300:
+            raise exceptions.SendError(
+                f'Webhook ответил {response.status_code}')
+
+
+class SmtpNotifier:
+    """Уведомление письмом через SMTP-сервер, соединение на письмо."""
+
+    name = 'smtp'
+
+    def __init__(self, host, port, sender, recipients, timeout=None):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = tuple(recipients)
+        self.timeout = timeout
+
+    def send(self, chat_id, text):
+        message = EmailMessage()
+        message['From'] = self.sender
+        message['To'] = ', '.join(self.recipients)
+        message['Subject'] = f'Статус домашки, чат {chat_id}'
+        message.set_content(text)
+        with smtplib.SMTP(self.host, self.port,
+                          timeout=self.timeout or SINK_TIMEOUT) as smtp:
+            smtp.send_message(message)
+
+
+class Sink:
+    """Приёмник уведомлений со своим пулом потоков.
+
+    Медленный или упавший приёмник задерживает только свою очередь.
+    Очередь ограничена `backlog` сообщениями: лишние отбрасываются
+    и считаются в метрике, а не копятся в памяти.
+    """
+
+    def __init__(self, notifier, workers=None, backlog=SINK_BACKLOG):
+        self.notifier = notifier
+        self.name = notifier.name
+        self._executor = ThreadPoolExecutor(
+            workers or SINK_WORKERS, thread_name_prefix=f'sink-{self.name}')
+        self._slots = threading.BoundedSemaphore(backlog)
+
+    def submit(self, chat_id, text, callback=None):
+        """Ставим доставку в очередь приёмника, не дожидаясь её."""
+        if not self._slots.acquire(blocking=False):
+            metrics.SINK_DELIVERIES.inc(self.name, 'dropped')
+            logger.warning('Очередь приёмника %s переполнена', self.name,
+                           extra={'chat_id': chat_id})
+            if callback is not None:
+                callback(False)
+            return None
+        future = self._executor.submit(self.deliver, chat_id, text, callback)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def deliver(self, chat_id, text, callback=None):
+        started = time.perf_counter()
+        try:
+            self.notifier.send(chat_id, text)
+        except Exception as error:
+            delivered = False
+            metrics.SINK_DELIVERIES.inc(self.name, 'failed')
+            logger.error('Приёмник %s не принял сообщение: %s', self.name,
+                         error, extra={'chat_id': chat_id})
+        else:
+            delivered = True
+            metrics.SINK_DELIVERIES.inc(self.name, 'sent')
+        finally:
+            metrics.SINK_LATENCY.observe(time.perf_counter() - started,
+                                         self.name)
+        if callback is not None:
+            callback(delivered)
+        return delivered
+
+    def stop(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+class FanOut:
+    """Рассылка одного уведомления в Telegram и дополнительные приёмники.
+
+    Повторяет интерфейс `bot.send_message`, поэтому подставляется вместо
+    бота или очереди отправки. Telegram остаётся основным каналом: его
+    ответ решает, доставлено ли уведомление из outbox. Остальные
+    приёмники получают копию параллельно и на доставку не влияют.
+    Уведомления из outbox `outbox.deliver` ставит в приёмники сам, по
+    записи на приёмник, а через `send_message` идут остальные сообщения.
+    """
+
+    def __init__(self, primary, sinks):
+        self.primary = primary
+        self.sinks = list(sinks)
+
+    def send_message(self, chat_id=None, text=None, callback=None,
+                     **kwargs):
+        for sink in self.sinks:
+            sink.submit(chat_id, text)
+        if isinstance(self.primary, send_queue.SendQueue):
+            self.primary.send_message(chat_id=chat_id, text=text,
+                                      callback=callback, **kwargs)
+            return
+        try:
+            self.primary.send_message(chat_id=chat_id, text=text, **kwargs)
+        except Exception:
+            if callback is None:
+                raise
+            callback(False)
+            return
+        if callback is not None:
+            callback(True)
+
+    def stop(self, wait=True):
+        for sink in self.sinks:
+            sink.stop(wait)
+
+
+def configured_sinks():
+    """Приёмники, заданные в настройках: webhook и почта."""
+    sinks = []
+    if WEBHOOK_URL:
+        sinks.append(Sink(WebhookNotifier(
+            WEBHOOK_URL, http_pool.make_session(SINK_WORKERS))))
+    if SMTP_HOST and SMTP_RECIPIENTS:
+        sinks.append(Sink(SmtpNotifier(SMTP_HOST, SMTP_PORT, SMTP_SENDER,
+                                       SMTP_RECIPIENTS)))
+    return sinks
+
+
+def build(primary):
+    """Бот с рассылкой в приёмники из настроек или сам бот без них."""
+    sinks = configured_sinks()
+    if not sinks:
+        return primary
+    logger.info('Уведомления дублируются в: %s',
+                ', '.join(sink.name for sink in sinks))
+    return FanOut(primary, sinks)
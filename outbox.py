@@ -0,0 +1,105 @@
+import functools
+import logging
+
+import config
+import metrics
+import notifiers
+import send_queue
+
+logger = logging.getLogger('homework.outbox')
+
+OUTBOX_BATCH = 1000
+OUTBOX_MAX_ATTEMPTS = 10
+
+
+def apply_config(settings):
+    global OUTBOX_BATCH, OUTBOX_MAX_ATTEMPTS
+    OUTBOX_BATCH = settings.outbox_batch
+    OUTBOX_MAX_ATTEMPTS = settings.outbox_max_attempts
+
+
+config.on_reload(apply_config)
+
+
+def outbox_key(chat_id, homework_name, status, updated):
+    """Ключ идемпотентности уведомления о смене статуса."""
+    return f'{chat_id}:{homework_name}:{status}:{updated}'
+
+
+def deliver(bot, store, limit=None, chats=None):
+    """Отправляем недоставленные уведомления из outbox хранилища.
+
+    Доставка отмечается сразу после ответа Telegram. Упавшая отправка
+    остаётся в outbox и повторяется при следующем вызове, в том числе
+    после перезапуска, но не больше `OUTBOX_MAX_ATTEMPTS` раз: потом
+    оно откладывается в мёртвые письма (`store.dead_letters()`). Повтор
+    доставленного возможен, только если процесс умер между ответом
+    Telegram и отметкой о доставке. С набором `chats`
+    уведомления в другие чаты не отправляются и остаются в outbox:
+    так узел, потерявший аренду подписки, не пишет в её чат.
+
+    С `notifiers.FanOut` каждое уведомление один раз ставится и в его
+    приёмники, а доставка в каждый из них идёт по своей записи и со
+    своими повторами, независимо от ответа Telegram.
+    """
+    sinks = []
+    if isinstance(bot, notifiers.FanOut):
+        bot, sinks = bot.primary, bot.sinks
+    entries = store.take_undelivered(limit or OUTBOX_BATCH)
+    owned = []
+    for entry_id, chat_id, text in entries:
+        if chats is not None and chat_id not in chats:
+            store.release(entry_id)
+            continue
+        owned.append((entry_id, chat_id, text))
+    if sinks:
+        store.queue_for_sinks([entry[0] for entry in owned],
+                              [sink.name for sink in sinks])
+    for entry_id, chat_id, text in owned:
+        done = functools.partial(_done, store, entry_id, chat_id)
+        if isinstance(bot, send_queue.SendQueue):
+            bot.send_message(chat_id=chat_id, text=text, callback=done)
+            continue
+        try:
+            bot.send_message(chat_id=chat_id, text=text)
+        except Exception as error:
+            logger.error('Не удалось отправить сообщение:%s. Ошибка: %s',
+                         text, error, extra={'chat_id': chat_id})
+            done(False)
+            continue
+        done(True)
+    for sink in sinks:
+        deliver_to_sink(sink, store, limit)
+    return len(entries)
+
+
+def deliver_to_sink(sink, store, limit=None):
+    """Отдаём приёмнику уведомления, которые он ещё не получил."""
+    entries = store.take_for_sink(sink.name, limit or OUTBOX_BATCH)
+    for entry_id, chat_id, text in entries:
+        sink.submit(chat_id, text, functools.partial(
+            _sink_done, store, sink.name, entry_id, chat_id))
+    return len(entries)
+
+
+def _sink_done(store, sink, entry_id, chat_id, delivered):
+    if delivered:
+        store.mark_sink_delivered(entry_id, sink)
+    elif store.mark_sink_failed(entry_id, sink, OUTBOX_MAX_ATTEMPTS):
+        logger.error('Приёмник %s не принял сообщение из outbox %s за %s '
+                     'попыток', sink, entry_id, OUTBOX_MAX_ATTEMPTS,
+                     extra={'chat_id': chat_id})
+
+
+def _done(store, entry_id, chat_id, delivered):
+    if not delivered:
+        if store.mark_failed(entry_id, OUTBOX_MAX_ATTEMPTS):
+            metrics.MESSAGES.inc('dead')
+            logger.error('Сообщение из outbox %s не доставлено за %s '
+                         'попыток и отложено', entry_id,
+                         OUTBOX_MAX_ATTEMPTS, extra={'chat_id': chat_id})
+        return
+    store.mark_delivered(entry_id)
+    metrics.MESSAGES.inc('sent')
+    logger.info('Сообщение из outbox %s доставлено.', entry_id,
+                extra={'chat_id': chat_id})
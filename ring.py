@@ -0,0 +1,50 @@
+import bisect
+import hashlib
+
+RING_REPLICAS = 100
+
+
+def ring_hash(key):
+    """Хеш ключа на кольце, одинаковый во всех процессах."""
+    digest = hashlib.md5(str(key).encode()).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+class HashRing:
+    """Консистентное хеширование токенов по воркерам.
+
+    Каждый воркер занимает `replicas` точек на кольце, токен достаётся
+    первому воркеру по часовой стрелке от своего хеша. Когда воркер
+    уходит или добавляется, переезжает только его доля подписок.
+    """
+
+    def __init__(self, nodes=(), replicas=RING_REPLICAS):
+        self.replicas = replicas
+        self._points = []
+        self._nodes = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        for replica in range(self.replicas):
+            point = ring_hash(f'{node}#{replica}')
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._nodes.insert(index, node)
+
+    def remove(self, node):
+        kept = [(point, owner) for point, owner
+                in zip(self._points, self._nodes) if owner != node]
+        self._points = [point for point, _ in kept]
+        self._nodes = [owner for _, owner in kept]
+
+    @property
+    def nodes(self):
+        return set(self._nodes)
+
+    def node_for(self, key):
+        """Воркер, которому принадлежит ключ; None для пустого кольца."""
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, ring_hash(key))
+        return self._nodes[index % len(self._nodes)]
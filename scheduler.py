@@ -0,0 +1,119 @@
+import heapq
+import itertools
+import random
+
+import config
+import exceptions
+
+REVIEWING_INTERVAL = 120
+IDLE_AFTER = 6
+IDLE_FACTOR = 1.5
+MAX_IDLE_INTERVAL = 1200
+ERROR_INTERVAL = 120
+MAX_ERROR_INTERVAL = 3600
+JITTER = 0.1
+
+
+def apply_config(settings):
+    global REVIEWING_INTERVAL, IDLE_AFTER, MAX_IDLE_INTERVAL
+    REVIEWING_INTERVAL = settings.reviewing_interval
+    IDLE_AFTER = settings.idle_after
+    MAX_IDLE_INTERVAL = settings.max_idle_interval
+
+
+config.on_reload(apply_config)
+
+
+class PollState:
+    """Сведения об опросах, по которым выбирается следующий интервал.
+
+    `in_review` — названия домашек, которые сейчас на ревью: API
+    присылает только изменения, поэтому вердикт по одной работе не
+    должен сбрасывать частый опрос из-за другой.
+    """
+
+    __slots__ = ('due', 'failures', 'idle_polls', 'reviewing', 'in_review')
+
+    def __init__(self):
+        self.due = 0.0
+        self.failures = 0
+        self.idle_polls = 0
+        self.reviewing = False
+        self.in_review = set()
+
+
+def next_delay(poll_state, statuses=(), error=None, base=600, rng=random):
+    """Считаем паузу до следующего опроса.
+
+    `statuses` — пары (название домашки, статус) из последнего ответа
+    API по порядку. Флаг ревью пересчитывается только по ответу со
+    статусами, так что флаг, восстановленный из снимка, доживает до
+    первого изменения.
+
+    Пока работа на ревью, опрашиваем чаще; после `IDLE_AFTER` пустых
+    ответов подряд интервал растёт до `MAX_IDLE_INTERVAL`. Если API
+    не отвечает, интервал удваивается с каждой ошибкой (с джиттером,
+    чтобы подписки не ломились в API одновременно).
+    """
+    if error is not None:
+        if not isinstance(error, exceptions.ApiNotResponse):
+            return base
+        poll_state.failures += 1
+        delay = min(MAX_ERROR_INTERVAL,
+                    ERROR_INTERVAL * 2 ** (poll_state.failures - 1))
+        return rng.uniform(delay / 2, delay)
+    poll_state.failures = 0
+    for name, status in statuses:
+        if status == 'reviewing':
+            poll_state.in_review.add(name)
+        else:
+            poll_state.in_review.discard(name)
+    if statuses:
+        poll_state.reviewing = bool(poll_state.in_review)
+        poll_state.idle_polls = 0
+    else:
+        poll_state.idle_polls += 1
+    if poll_state.reviewing:
+        delay = REVIEWING_INTERVAL
+    else:
+        idle = max(0, poll_state.idle_polls - IDLE_AFTER)
+        delay = min(MAX_IDLE_INTERVAL, base * IDLE_FACTOR ** idle)
+    return delay * rng.uniform(1 - JITTER, 1 + JITTER)
+
+
+class Timetable:
+    """Очередь опросов на куче: ближайший срок находится за O(1).
+
+    Перенос опроса не ищет старую запись в куче: она остаётся и
+    пропускается при извлечении, потому что не совпадает с `due`.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule(self, poll_state, due):
+        """Ставим опрос на момент `due`, заменяя прежний срок."""
+        poll_state.due = due
+        heapq.heappush(self._heap, (due, next(self._counter), poll_state))
+
+    def next_due(self):
+        """Возвращаем ближайший срок опроса или None, если опросов нет."""
+        while self._heap:
+            due, _, poll_state = self._heap[0]
+            if due == poll_state.due:
+                return due
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, now):
+        """Извлекаем все опросы, срок которых наступил."""
+        ready = []
+        while self._heap and self._heap[0][0] <= now:
+            due, _, poll_state = heapq.heappop(self._heap)
+            if due == poll_state.due:
+                ready.append(poll_state)
+        return ready
@@ -0,0 +1,285 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+
+from telegram.error import NetworkError, RetryAfter, TelegramError
+
+import breaker
+import config
+import metrics
+
+logger = logging.getLogger('homework.send_queue')
+
+GLOBAL_RATE = 30.0
+CHAT_RATE = 1.0
+MAX_ATTEMPTS = 5
+MESSAGE_LIMIT = 4096
+LATENCY_WINDOW = 1000
+
+
+def apply_config(settings):
+    global GLOBAL_RATE, CHAT_RATE
+    GLOBAL_RATE = settings.global_rate
+    CHAT_RATE = settings.chat_rate
+
+
+config.on_reload(apply_config)
+
+
+class TokenBucket:
+    """Ведро токенов: не больше `rate` событий в секунду в среднем."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity=1, now=0.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now):
+        """Берём токен; если его нет, возвращаем, сколько ждать."""
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class SendQueue:
+    """Очередь исходящих сообщений Telegram с отдельным потоком отправки.
+
+    Повторяет интерфейс `bot.send_message`, поэтому подставляется вместо
+    бота: опрос API только кладёт сообщение в очередь и не ждёт Telegram.
+    Учитываются общий лимит бота и лимит на чат, при 429 отправка в чат
+    откладывается на `retry_after`, а накопившиеся для одного чата
+    сообщения склеиваются в одно. `share` — доля общего лимита бота,
+    если очередей у бота несколько.
+    """
+
+    def __init__(self, bot, global_rate=None, chat_rate=None,
+                 clock=time.monotonic, share=1.0):
+        self.bot = bot
+        self.clock = clock
+        self.share = share
+        if global_rate is None:
+            global_rate = GLOBAL_RATE * share
+        self.chat_rate = CHAT_RATE if chat_rate is None else chat_rate
+        self._global = TokenBucket(global_rate, now=clock())
+        self._chat_buckets = {}
+        self._not_before = {}
+        self._pending = defaultdict(deque)
+        self._ready = []
+        self._scheduled = set()
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self.sent = self.coalesced = self.retried = self.failed = 0
+
+    def send_message(self, chat_id=None, text=None, callback=None,
+                     **kwargs):
+        """Ставим сообщение в очередь на отправку.
+
+        `callback(delivered)` вызывается из потока отправки, когда
+        сообщение доставлено или попытки исчерпаны.
+        """
+        with self._cond:
+            self._pending[chat_id].append((text, self.clock(), 0, callback))
+            self._wake(chat_id, self.clock())
+
+    def _wake(self, chat_id, ready_at):
+        if chat_id in self._scheduled:
+            return
+        self._scheduled.add(chat_id)
+        heapq.heappush(self._ready, (ready_at, next(self._counter), chat_id))
+        self._cond.notify()
+
+    def set_rates(self, global_rate, chat_rate):
+        """Меняем лимиты на ходу, сообщения в очереди остаются в ней."""
+        with self._cond:
+            self._global.rate = global_rate
+            self.chat_rate = chat_rate
+            for bucket in self._chat_buckets.values():
+                bucket.rate = chat_rate
+            self._cond.notify()
+
+    def apply_config(self, settings):
+        self.set_rates(settings.global_rate * self.share, settings.chat_rate)
+
+    @property
+    def depth(self):
+        """Число сообщений, ожидающих отправки."""
+        with self._cond:
+            return sum(len(queue) for queue in self._pending.values())
+
+    def stats(self):
+        """Метрики очереди: глубина, счётчики и задержка отправки."""
+        latencies = sorted(self._latencies)
+        return {
+            'depth': self.depth,
+            'sent': self.sent,
+            'coalesced': self.coalesced,
+            'retried': self.retried,
+            'failed': self.failed,
+            'latency_p50': percentile(latencies, 0.5),
+            'latency_p99': percentile(latencies, 0.99),
+        }
+
+    def start(self):
+        """Запускаем поток отправки."""
+        metrics.QUEUE_DEPTH.set_function(lambda: self.depth)
+        self._thread = threading.Thread(
+            target=self._run, name='send-queue', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Дожидаемся отправки очереди и останавливаем поток."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _next_batch(self):
+        """Ждём чат, которому уже можно писать, и забираем его сообщения."""
+        with self._cond:
+            while True:
+                if not self._ready:
+                    if self._stopping:
+                        return None, []
+                    self._cond.wait()
+                    continue
+                ready_at, _, chat_id = self._ready[0]
+                now = self.clock()
+                if ready_at > now:
+                    self._cond.wait(ready_at - now)
+                    continue
+                heapq.heappop(self._ready)
+                if not self._pending.get(chat_id):
+                    self._scheduled.discard(chat_id)
+                    continue
+                not_before = self._not_before.pop(chat_id, 0)
+                if not_before > now:
+                    self._not_before[chat_id] = not_before
+                    heapq.heappush(self._ready, (
+                        not_before, next(self._counter), chat_id))
+                    continue
+                bucket = self._chat_buckets.get(chat_id)
+                if bucket is None:
+                    bucket = TokenBucket(self.chat_rate, now=now)
+                    self._chat_buckets[chat_id] = bucket
+                wait = bucket.take(now)
+                if wait:
+                    heapq.heappush(self._ready,
+                                   (now + wait, next(self._counter), chat_id))
+                    continue
+                return chat_id, self._take_messages(chat_id)
+
+    def _take_messages(self, chat_id):
+        pending = self._pending[chat_id]
+        batch = [pending.popleft()]
+        size = len(batch[0][0])
+        while pending and size + len(pending[0][0]) + 1 <= MESSAGE_LIMIT:
+            size += len(pending[0][0]) + 1
+            batch.append(pending.popleft())
+        if pending:
+            heapq.heappush(self._ready,
+                           (self.clock(), next(self._counter), chat_id))
+        else:
+            del self._pending[chat_id]
+            self._scheduled.discard(chat_id)
+        return batch
+
+    def _requeue(self, chat_id, batch, delay, spent=1):
+        with self._cond:
+            pending = self._pending[chat_id]
+            for text, enqueued, attempts, callback in reversed(batch):
+                pending.appendleft(
+                    (text, enqueued, attempts + spent, callback))
+            ready_at = self.clock() + delay
+            self._not_before[chat_id] = ready_at
+            self._wake(chat_id, ready_at)
+
+    def _run(self):
+        while True:
+            chat_id, batch = self._next_batch()
+            if chat_id is None:
+                return
+            wait = self._global.take(self.clock())
+            while wait:
+                time.sleep(wait)
+                wait = self._global.take(self.clock())
+            try:
+                self._send(chat_id, batch)
+            except Exception as error:
+                self.failed += len(batch)
+                logger.error('Сбой в потоке отправки: %s', error,
+                             extra={'chat_id': chat_id})
+                self._done(batch, False)
+
+    def _send(self, chat_id, batch):
+        if not breaker.TELEGRAM.allow():
+            self._requeue(chat_id, batch,
+                          max(breaker.TELEGRAM.retry_in(), 1.0), spent=0)
+            return
+        text = '\n'.join(message[0] for message in batch)
+        started = time.perf_counter()
+        try:
+            self.bot.send_message(chat_id=chat_id, text=text)
+        except RetryAfter as error:
+            logger.warning('Telegram просит подождать %s с перед отправкой',
+                           error.retry_after, extra={'chat_id': chat_id})
+            breaker.TELEGRAM.success()
+            self.retried += 1
+            self._requeue(chat_id, batch, error.retry_after)
+            return
+        except TelegramError as error:
+            if isinstance(error, NetworkError):
+                breaker.TELEGRAM.failure()
+            else:
+                breaker.TELEGRAM.success()
+            attempts = batch[0][2] + 1
+            if attempts < MAX_ATTEMPTS:
+                self.retried += 1
+                self._requeue(chat_id, batch, 2 ** attempts)
+                return
+            self.failed += len(batch)
+            logger.error('Не удалось отправить сообщение:%s. Ошибка: %s',
+                         text, error, extra={'chat_id': chat_id})
+            self._done(batch, False)
+            return
+        finally:
+            metrics.TELEGRAM_LATENCY.observe(time.perf_counter() - started)
+        breaker.TELEGRAM.success()
+        now = self.clock()
+        self.sent += 1
+        self.coalesced += len(batch) - 1
+        for _, enqueued, _, _ in batch:
+            self._latencies.append(now - enqueued)
+        logger.debug('Отправлено сообщений: %s', len(batch),
+                     extra={'chat_id': chat_id})
+        self._done(batch, True)
+
+    def _done(self, batch, delivered):
+        for _, _, _, callback in batch:
+            if callback is None:
+                continue
+            try:
+                callback(delivered)
+            except Exception as error:
+                logger.error('Сбой в обработчике отправки: %s', error)
+
+
+def percentile(values, share):
+    """Перцентиль отсортированного списка, None для пустого."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * share))]
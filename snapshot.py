@@ -0,0 +1,203 @@
+import bisect
+import hashlib
+import logging
+import mmap
+import os
+import signal
+import struct
+import threading
+import time
+from array import array
+
+import config
+import notifiers
+
+logger = logging.getLogger('homework.snapshot')
+
+SNAPSHOT_FILE = 'snapshot.bin'
+SHUTDOWN_TIMEOUT = 20.0
+
+MAGIC = b'HWSS'
+VERSION = 1
+# Заголовок: метка, версия, число подписок, момент записи. Дальше идут
+# отсортированные ключи подписок (`Q`) и записи в том же порядке.
+HEADER = struct.Struct('=4sIQd')
+RECORD = struct.Struct('=dIIB')
+KEY_SIZE = array('Q').itemsize
+
+
+def apply_config(settings):
+    global SNAPSHOT_FILE, SHUTDOWN_TIMEOUT
+    SNAPSHOT_FILE = settings.snapshot_file
+    SHUTDOWN_TIMEOUT = settings.shutdown_timeout
+
+
+config.on_reload(apply_config)
+
+
+def tenant_key(token):
+    """Ключ подписки в снимке: 8 байт хэша токена или его id."""
+    return int.from_bytes(
+        hashlib.blake2b(token.encode(), digest_size=8).digest(), 'little')
+
+
+def save(entries, path=None):
+    """Записываем состояние расписания подписок в снимок.
+
+    `entries` — пары (токен, `scheduler.PollState`). Файл пишется рядом
+    и подменяет старый целиком, так что прерванная запись его не портит.
+    Возвращаем число записанных подписок. Пустой `SNAPSHOT_FILE`
+    отключает снимок.
+    """
+    path = path or SNAPSHOT_FILE
+    if not path:
+        return 0
+    rows = sorted((tenant_key(token), poll_state.due, poll_state.failures,
+                   poll_state.idle_polls, poll_state.reviewing)
+                  for token, poll_state in entries)
+    keys = array('Q', (row[0] for row in rows))
+    temporary = f'{path}.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(rows), time.time()))
+        file.write(keys.tobytes())
+        file.write(b''.join(RECORD.pack(*row[1:]) for row in rows))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+    return len(rows)
+
+
+class Snapshot:
+    """Снимок, отображённый в память: при загрузке ничего не разбирается.
+
+    Ключи лежат отсортированной колонкой, поэтому запись подписки
+    находится двоичным поиском прямо по файлу, а распаковывается только
+    она сама.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, count, self.saved_at = HEADER.unpack_from(
+                self._map)
+            self._records = HEADER.size + count * KEY_SIZE
+            if (magic != MAGIC or version != VERSION or len(self._map)
+                    != self._records + count * RECORD.size):
+                raise ValueError(f'Файл {path} — не снимок этой версии')
+        except (ValueError, struct.error):
+            self._map.close()
+            raise
+        self.keys = memoryview(self._map)[HEADER.size:self._records].cast(
+            'Q')
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get(self, token):
+        """Запись подписки: (срок, сбои, пустые ответы, ревью) или None."""
+        key = tenant_key(token)
+        index = bisect.bisect_left(self.keys, key)
+        if index == len(self.keys) or self.keys[index] != key:
+            return None
+        return RECORD.unpack_from(self._map,
+                                  self._records + index * RECORD.size)
+
+    def recall(self, token, poll_state):
+        """Возвращаем подписке состояние из снимка и её срок опроса."""
+        record = self.get(token)
+        if record is None:
+            return None
+        due, poll_state.failures, poll_state.idle_polls, reviewing = record
+        poll_state.reviewing = bool(reviewing)
+        return due
+
+    def close(self):
+        self.keys.release()
+        self._map.close()
+
+
+def load(path=None):
+    """Открываем снимок или возвращаем None, если его нет или он испорчен."""
+    path = path or SNAPSHOT_FILE
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return Snapshot(path)
+    except (OSError, ValueError, struct.error) as error:
+        logger.warning('Снимок не загружен, старт с нуля: %s', error)
+        return None
+
+
+def resume(token, poll_state, path=None):
+    """Состояние одной подписки из снимка и пауза до её опроса в секундах.
+
+    Без снимка или записи в нём опрос начинается сразу.
+    """
+    snapshot = load(path)
+    if snapshot is None:
+        return 0.0
+    with snapshot:
+        due = snapshot.recall(token, poll_state)
+    return 0.0 if due is None else max(0.0, due - time.time())
+
+
+def restore(registry, timetable, now, path=None):
+    """Ставим новые подписки реестра в расписание по снимку.
+
+    Подписка из снимка продолжает со своим сроком и счётчиками, так что
+    после перезапуска опросы не сбиваются в одну волну. Остальные
+    опрашиваются сразу. Возвращаем число восстановленных подписок.
+    """
+    snapshot = load(path)
+    restored = 0
+    for tenant in registry.take_new():
+        due = None
+        if snapshot is not None:
+            due = snapshot.recall(tenant.token, tenant)
+        if due is not None:
+            restored += 1
+        timetable.schedule(tenant, now if due is None else due)
+    if snapshot is not None:
+        logger.info('Из снимка восстановлено подписок: %s', restored)
+        snapshot.close()
+    return restored
+
+
+def stop_on_signals(*events):
+    """По SIGTERM и SIGINT выставляем `events`, а не прерываем процесс.
+
+    Первое событие — флаг остановки, остальные будят циклы, которые
+    ждут на них. Обработчик только выставляет события, как
+    `config.request_reload`. Ставится он только из главного потока.
+    """
+    def handle(signum, frame):
+        for event in events:
+            event.set()
+
+    if threading.current_thread() is threading.main_thread():
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, handle)
+    return events[0]
+
+
+def drain(bot, sender, store=None, timeout=None):
+    """Досылаем очередь сообщений и закрываем хранилище.
+
+    Что не ушло за `timeout` секунд, остаётся в outbox и отправится
+    после перезапуска.
+    """
+    logger.info('Завершаем работу, досылаем сообщения')
+    sender.stop(timeout or SHUTDOWN_TIMEOUT)
+    if isinstance(bot, notifiers.FanOut):
+        bot.stop()
+    if store is not None:
+        store.close()
+    logger.info('Работа завершена, в очереди осталось сообщений: %s',
+                sender.depth)
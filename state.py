@@ -0,0 +1,470 @@
+import hashlib
+import sqlite3
+import threading
+import time
+
+import config
+
+STATE_DB = 'state.sqlite3'
+OUTBOX_RETENTION = 7 * 24 * 3600
+OUTBOX_CLAIM_TIMEOUT = 600
+TOKEN_PREFIX = 'vault:'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS homeworks (
+    chat_id TEXT NOT NULL,
+    homework_name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    sent_at INTEGER,
+    PRIMARY KEY (chat_id, homework_name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS token_cursors (
+    token_id TEXT PRIMARY KEY,
+    from_date INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS subscriptions (
+    token TEXT PRIMARY KEY,
+    chat_id TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS locales (
+    chat_id TEXT PRIMARY KEY,
+    locale TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    chat_id TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    delivered_at INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    failed_at INTEGER,
+    claimed_by TEXT,
+    claimed_at INTEGER
+);
+CREATE TABLE IF NOT EXISTS sink_deliveries (
+    entry_id INTEGER NOT NULL,
+    sink TEXT NOT NULL,
+    delivered_at INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    failed_at INTEGER,
+    claimed_by TEXT,
+    claimed_at INTEGER,
+    PRIMARY KEY (entry_id, sink)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    chat_id TEXT NOT NULL,
+    homework_name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS backfill_progress (
+    token_id TEXT PRIMARY KEY,
+    since INTEGER NOT NULL,
+    until INTEGER NOT NULL,
+    done INTEGER NOT NULL
+) WITHOUT ROWID;
+'''
+# Колонки, появившиеся после первой версии схемы: в старой базе они
+# добавляются при открытии, индекс outbox пересоздаётся под них.
+MIGRATIONS = (
+    ('outbox', 'attempts',
+     'ALTER TABLE outbox ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0'),
+    ('outbox', 'failed_at', 'ALTER TABLE outbox ADD COLUMN failed_at INTEGER'),
+    ('outbox', 'claimed_by', 'ALTER TABLE outbox ADD COLUMN claimed_by TEXT'),
+    ('outbox', 'claimed_at',
+     'ALTER TABLE outbox ADD COLUMN claimed_at INTEGER'),
+)
+INDEXES = '''
+DROP INDEX IF EXISTS outbox_undelivered;
+CREATE INDEX IF NOT EXISTS outbox_pending
+    ON outbox (id) WHERE delivered_at IS NULL AND failed_at IS NULL;
+'''
+
+
+def apply_config(settings):
+    global STATE_DB, OUTBOX_RETENTION, OUTBOX_CLAIM_TIMEOUT
+    STATE_DB = settings.state_db
+    OUTBOX_RETENTION = settings.outbox_retention
+    OUTBOX_CLAIM_TIMEOUT = settings.outbox_claim_timeout
+
+
+config.on_reload(apply_config)
+
+
+def token_id(token):
+    """Постоянный id токена: по нему подписка живёт в реестре и кольце.
+
+    Id уже спрятанного токена возвращается как есть, поэтому курсор
+    подписки не теряется, когда токены переезжают в хранилище.
+    """
+    if token.startswith(TOKEN_PREFIX):
+        return token
+    return TOKEN_PREFIX + hashlib.sha256(token.encode()).hexdigest()[:32]
+
+
+class StateStore:
+    """Последние статусы домашек и курсоры подписок в SQLite.
+
+    Статусы целиком держатся в словаре, поэтому проверка перехода — один
+    поиск по ключу. Изменения копятся в памяти и пишутся одной
+    транзакцией в `flush()` раз за цикл опроса.
+
+    Базу могут открыть несколько процессов. Уведомления outbox каждый
+    из них забирает на себя под своим именем `owner`, поэтому одно
+    уведомление отправляет только один процесс. Перезапущенный процесс
+    с тем же именем сразу забирает свои неотправленные уведомления
+    назад, чужие освобождаются через `OUTBOX_CLAIM_TIMEOUT` секунд.
+    """
+
+    def __init__(self, path=None, owner='main'):
+        self.owner = owner
+        self._conn = sqlite3.connect(path or STATE_DB,
+                                     check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._lock = threading.Lock()
+        self._statuses = {
+            (chat_id, name): status for chat_id, name, status
+            in self._conn.execute(
+                'SELECT chat_id, homework_name, status FROM homeworks')
+        }
+        self._cursors = dict(self._conn.execute(
+            'SELECT token_id, from_date FROM token_cursors'))
+        self._chat_cursors = {}
+        if self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'cursors'"
+        ).fetchone():
+            self._chat_cursors = dict(self._conn.execute(
+                'SELECT chat_id, from_date FROM cursors'))
+        self._locales = dict(
+            self._conn.execute('SELECT chat_id, locale FROM locales'))
+        self._pending_statuses = {}
+        self._pending_cursors = {}
+        self._pending_outbox = []
+        self._pending_history = []
+        self._pending_backfill = {}
+        with self._conn:
+            self._conn.execute(
+                'DELETE FROM outbox WHERE delivered_at < ? OR failed_at < ?',
+                (int(time.time()) - OUTBOX_RETENTION,) * 2)
+            self._conn.execute(
+                'DELETE FROM sink_deliveries '
+                'WHERE entry_id NOT IN (SELECT id FROM outbox)')
+            for table in ('outbox', 'sink_deliveries'):
+                self._conn.execute(
+                    f'UPDATE {table} SET claimed_by = NULL '
+                    'WHERE claimed_by = ? AND delivered_at IS NULL',
+                    (owner,))
+
+    def _migrate(self):
+        with self._conn:
+            for table, column, statement in MIGRATIONS:
+                columns = {row[1] for row in self._conn.execute(
+                    f'PRAGMA table_info({table})')}
+                if column not in columns:
+                    self._conn.execute(statement)
+        self._conn.executescript(INDEXES)
+
+    def __len__(self):
+        return len(self._statuses)
+
+    def is_transition(self, chat_id, homework_name, status):
+        """Проверяем, отличается ли статус от последнего известного."""
+        return self._statuses.get((str(chat_id), homework_name)) != status
+
+    def get_status(self, chat_id, homework_name):
+        """Последний известный статус домашки или None."""
+        return self._statuses.get((str(chat_id), homework_name))
+
+    def record(self, chat_id, homework_name, status, sent_at=None):
+        """Запоминаем новый статус домашки до следующего `flush()`."""
+        key = (str(chat_id), homework_name)
+        with self._lock:
+            self._statuses[key] = status
+            self._pending_statuses[key] = (status, sent_at)
+
+    def log_event(self, chat_id, homework_name, status, at):
+        """Дописываем смену статуса в журнал истории до `flush()`."""
+        with self._lock:
+            self._pending_history.append(
+                (str(chat_id), homework_name, status, at))
+
+    def events(self, after=0, limit=None):
+        """Записи журнала истории с id больше `after` по порядку.
+
+        Возвращаем кортежи (id, chat_id, homework_name, status, at).
+        """
+        with self._lock:
+            return self._conn.execute(
+                'SELECT id, chat_id, homework_name, status, at FROM history '
+                'WHERE id > ? ORDER BY id LIMIT ?',
+                (after, -1 if limit is None else limit)).fetchall()
+
+    def mark_backfilled(self, token, since, until, done):
+        """Запоминаем, до какого момента догружена подписка, до `flush()`.
+
+        Отметка пишется той же транзакцией, что и статусы до `done`.
+        """
+        with self._lock:
+            self._pending_backfill[token_id(token)] = (since, until, done)
+
+    def backfill_progress(self, token):
+        """Догрузка подписки: (since, until, done) или None."""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT since, until, done FROM backfill_progress '
+                'WHERE token_id = ?', (token_id(token),)).fetchone()
+
+    def load_chat(self, chat_id, token=None):
+        """Перечитываем статусы и язык чата и курсор подписки с диска.
+
+        Нужно, когда подписка переходит от другого процесса: её записи
+        в памяти этого процесса могли устареть.
+        """
+        chat_id = str(chat_id)
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT homework_name, status FROM homeworks '
+                'WHERE chat_id = ?', (chat_id,)).fetchall()
+            cursor = None
+            if token is not None:
+                cursor = self._conn.execute(
+                    'SELECT from_date FROM token_cursors '
+                    'WHERE token_id = ?', (token_id(token),)).fetchone()
+            locale = self._conn.execute(
+                'SELECT locale FROM locales WHERE chat_id = ?',
+                (chat_id,)).fetchone()
+            for name, status in rows:
+                self._statuses[(chat_id, name)] = status
+            if cursor is not None:
+                self._cursors[token_id(token)] = cursor[0]
+            if locale is not None:
+                self._locales[chat_id] = locale[0]
+
+    def enqueue(self, key, chat_id, text):
+        """Кладём уведомление в outbox до следующего `flush()`.
+
+        Запись о статусе и уведомление о нём попадают на диск одной
+        транзакцией. Повтор с тем же ключом идемпотентности игнорируется.
+        """
+        with self._lock:
+            self._pending_outbox.append(
+                (key, str(chat_id), text, int(time.time())))
+
+    def take_undelivered(self, limit=1000):
+        """Забираем на себя недоставленные уведомления, которые никто не шлёт.
+
+        Выбор и отметка идут одной пишущей транзакцией, поэтому два
+        процесса на одной базе не заберут одно уведомление. Возвращаем
+        список (id, chat_id, text) в порядке постановки.
+        """
+        now = int(time.time())
+        with self._lock, self._conn:
+            self._conn.execute('BEGIN IMMEDIATE')
+            rows = self._conn.execute(
+                'SELECT id, chat_id, text FROM outbox '
+                'WHERE delivered_at IS NULL AND failed_at IS NULL '
+                'AND (claimed_by IS NULL OR claimed_at < ?) '
+                'ORDER BY id LIMIT ?',
+                (now - OUTBOX_CLAIM_TIMEOUT, limit)).fetchall()
+            self._conn.executemany(
+                'UPDATE outbox SET claimed_by = ?, claimed_at = ? '
+                'WHERE id = ?', [(self.owner, now, row[0]) for row in rows])
+        return rows
+
+    def mark_delivered(self, entry_id):
+        """Отмечаем доставку сразу: после сбоя уведомление не повторится."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE outbox SET delivered_at = ? WHERE id = ?',
+                (int(time.time()), entry_id))
+
+    def release(self, entry_id):
+        """Возвращаем недоставленное уведомление в очередь outbox."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE outbox SET claimed_by = NULL WHERE id = ?',
+                (entry_id,))
+
+    def mark_failed(self, entry_id, max_attempts):
+        """Считаем неудачную попытку доставки уведомления.
+
+        После `max_attempts` попыток уведомление откладывается в мёртвые
+        письма: оно остаётся в outbox, но больше не отправляется.
+        Возвращаем True, если уведомление отложено.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE outbox SET attempts = attempts + 1, '
+                'failed_at = CASE WHEN attempts + 1 >= ? THEN ? END, '
+                'claimed_by = NULL WHERE id = ?',
+                (max_attempts, int(time.time()), entry_id))
+            failed = self._conn.execute(
+                'SELECT failed_at FROM outbox WHERE id = ?',
+                (entry_id,)).fetchone()
+        return failed is not None and failed[0] is not None
+
+    def queue_for_sinks(self, entry_ids, sinks):
+        """Заводим уведомлениям записи о доставке в приёмники `sinks`.
+
+        Запись заводится один раз на уведомление и приёмник, сколько бы
+        раз уведомление ни отправлялось в Telegram.
+        """
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO sink_deliveries (entry_id, sink) '
+                'VALUES (?, ?)',
+                [(entry_id, sink) for entry_id in entry_ids
+                 for sink in sinks])
+
+    def take_for_sink(self, sink, limit=1000):
+        """Забираем на себя уведомления, ещё не доставленные в приёмник.
+
+        Как `take_undelivered`, но по своей записи приёмника: доставка
+        в него не зависит от ответа Telegram.
+        """
+        now = int(time.time())
+        with self._lock, self._conn:
+            self._conn.execute('BEGIN IMMEDIATE')
+            rows = self._conn.execute(
+                'SELECT d.entry_id, o.chat_id, o.text FROM sink_deliveries d '
+                'JOIN outbox o ON o.id = d.entry_id WHERE d.sink = ? '
+                'AND d.delivered_at IS NULL AND d.failed_at IS NULL '
+                'AND (d.claimed_by IS NULL OR d.claimed_at < ?) '
+                'ORDER BY d.entry_id LIMIT ?',
+                (sink, now - OUTBOX_CLAIM_TIMEOUT, limit)).fetchall()
+            self._conn.executemany(
+                'UPDATE sink_deliveries SET claimed_by = ?, claimed_at = ? '
+                'WHERE entry_id = ? AND sink = ?',
+                [(self.owner, now, row[0], sink) for row in rows])
+        return rows
+
+    def mark_sink_delivered(self, entry_id, sink):
+        """Отмечаем доставку уведомления в приёмник."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE sink_deliveries SET delivered_at = ? '
+                'WHERE entry_id = ? AND sink = ?',
+                (int(time.time()), entry_id, sink))
+
+    def mark_sink_failed(self, entry_id, sink, max_attempts):
+        """Считаем неудачную попытку доставки в приёмник.
+
+        Как `mark_failed`: после `max_attempts` попыток приёмник больше
+        не получает это уведомление. Возвращаем True, если отложено.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE sink_deliveries SET attempts = attempts + 1, '
+                'failed_at = CASE WHEN attempts + 1 >= ? THEN ? END, '
+                'claimed_by = NULL WHERE entry_id = ? AND sink = ?',
+                (max_attempts, int(time.time()), entry_id, sink))
+            failed = self._conn.execute(
+                'SELECT failed_at FROM sink_deliveries '
+                'WHERE entry_id = ? AND sink = ?',
+                (entry_id, sink)).fetchone()
+        return failed is not None and failed[0] is not None
+
+    def dead_letters(self):
+        """Отложенные уведомления: список (id, chat_id, text, попытки)."""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT id, chat_id, text, attempts FROM outbox '
+                'WHERE failed_at IS NOT NULL ORDER BY id').fetchall()
+
+    def get_cursor(self, token, default=None, chat_id=None):
+        """Возвращаем сохранённый `from_date` подписки.
+
+        Курсор хранится по id токена, поэтому у подписок одного чата он
+        свой. Курсор чата из прежней схемы отдаётся по `chat_id`, пока
+        подписка не сохранит собственный.
+        """
+        cursor = self._cursors.get(token_id(token))
+        if cursor is None and chat_id is not None:
+            cursor = self._chat_cursors.get(str(chat_id))
+        return default if cursor is None else cursor
+
+    def set_cursor(self, token, from_date):
+        """Запоминаем `from_date` подписки до следующего `flush()`."""
+        key = token_id(token)
+        if self._cursors.get(key) == from_date:
+            return
+        with self._lock:
+            self._cursors[key] = from_date
+            self._pending_cursors[key] = from_date
+
+    def get_locale(self, chat_id, default=None):
+        """Возвращаем язык уведомлений чата."""
+        return self._locales.get(str(chat_id), default)
+
+    def set_locale(self, chat_id, locale):
+        """Сохраняем язык чата сразу: он меняется только командой."""
+        chat_id = str(chat_id)
+        with self._lock, self._conn:
+            self._locales[chat_id] = locale
+            self._conn.execute(
+                'INSERT OR REPLACE INTO locales (chat_id, locale) '
+                'VALUES (?, ?)', (chat_id, locale))
+
+    def subscriptions(self):
+        """Возвращаем сохранённые подписки: пары (токен, chat_id)."""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT token, chat_id FROM subscriptions').fetchall()
+
+    def save_subscription(self, token, chat_id):
+        """Сохраняем подписку сразу, не дожидаясь конца цикла."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO subscriptions (token, chat_id) '
+                'VALUES (?, ?)', (token, str(chat_id)))
+
+    def delete_subscription(self, token):
+        """Удаляем подписку."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                'DELETE FROM subscriptions WHERE token = ?', (token,))
+
+    def flush(self):
+        """Пишем накопленные изменения одной транзакцией."""
+        with self._lock:
+            statuses, self._pending_statuses = self._pending_statuses, {}
+            cursors, self._pending_cursors = self._pending_cursors, {}
+            outbox, self._pending_outbox = self._pending_outbox, []
+            history, self._pending_history = self._pending_history, []
+            backfill, self._pending_backfill = self._pending_backfill, {}
+            if not (statuses or cursors or outbox or history or backfill):
+                return 0
+            with self._conn:
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO homeworks '
+                    '(chat_id, homework_name, status, sent_at) '
+                    'VALUES (?, ?, ?, ?)',
+                    [(chat_id, name, status, sent_at) for (chat_id, name),
+                     (status, sent_at) in statuses.items()])
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO token_cursors '
+                    '(token_id, from_date) VALUES (?, ?)', cursors.items())
+                self._conn.executemany(
+                    'INSERT OR IGNORE INTO outbox '
+                    '(key, chat_id, text, created_at) VALUES (?, ?, ?, ?)',
+                    outbox)
+                self._conn.executemany(
+                    'INSERT INTO history (chat_id, homework_name, status, at) '
+                    'VALUES (?, ?, ?, ?)', history)
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO backfill_progress '
+                    '(token_id, since, until, done) VALUES (?, ?, ?, ?)',
+                    [(key, *progress) for key, progress
+                     in backfill.items()])
+        return (len(statuses) + len(cursors) + len(outbox) + len(history)
+                + len(backfill))
+
+    def close(self):
+        """Сбрасываем изменения и закрываем базу."""
+        self.flush()
+        self._conn.close()
@@ -0,0 +1,346 @@
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+from multiprocessing.connection import wait
+
+import telegram
+
+import config
+import exceptions
+import frontend
+import homework
+import http_pool
+import leases
+import metrics
+import notifiers
+import ring
+import send_queue
+import snapshot
+import state
+import tenants
+import vault
+
+logger = logging.getLogger('homework.supervisor')
+
+WORKERS = os.cpu_count() or 1
+SYNC_INTERVAL = 60
+RESTART_DELAY = 5
+CHECK_INTERVAL = 1.0
+
+# Воркеры запускаются заново, а не форком: у форка остались бы чужие
+# потоки и логи ушли бы в очередь, которую в дочернем процессе никто
+# не читает.
+_context = multiprocessing.get_context('spawn')
+
+
+def apply_config(settings):
+    global WORKERS, SYNC_INTERVAL
+    WORKERS = settings.workers
+    SYNC_INTERVAL = settings.sync_interval
+
+
+config.on_reload(apply_config)
+
+
+class Shard:
+    """Подписки, которые опрашивает один воркер.
+
+    `registry` содержит только подписки этого воркера и передаётся
+    в обычный цикл опроса. `sync` сверяет его с кольцом и общим списком
+    подписок: чужие удаляются, свои новые добавляются с курсором и
+    статусами, перечитанными из хранилища.
+    """
+
+    def __init__(self, name, store=None, load_all=None):
+        self.name = name
+        self.store = store
+        self.load_all = load_all or (
+            lambda: tenants.load_subscriptions(tenants.SUBSCRIPTIONS_FILE,
+                                               store=store))
+        self.ring = ring.HashRing()
+        self.registry = tenants.Registry()
+        self._lock = threading.Lock()
+
+    def owns(self, token):
+        return self.ring.node_for(token) == self.name
+
+    def sync(self, members=None):
+        """Забираем свои подписки и отдаём чужие; возвращаем их число."""
+        with self._lock:
+            if members is not None:
+                self.ring = ring.HashRing(members)
+            everyone = self.load_all()
+            for tenant in everyone:
+                if not self.owns(tenant.token):
+                    continue
+                owned = self.registry.get(tenant.token)
+                if owned is None:
+                    self.acquire(tenant)
+                else:
+                    owned.chat_id = tenant.chat_id
+            for tenant in self.registry:
+                if (tenant.token not in everyone
+                        or not self.owns(tenant.token)):
+                    self.registry.unsubscribe(tenant.token)
+            return len(self.registry)
+
+    def acquire(self, tenant):
+        timestamp, locale = None, tenant.locale
+        if self.store is not None:
+            self.store.load_chat(tenant.chat_id, tenant.token)
+            timestamp = self.store.get_cursor(tenant.token,
+                                              chat_id=tenant.chat_id)
+            locale = self.store.get_locale(tenant.chat_id, locale)
+        owned = self.registry.subscribe(tenant.token, tenant.chat_id,
+                                        timestamp)
+        owned.locale = locale
+
+    def listen(self, conn, interval=None):
+        """Принимаем состав воркеров от супервизора.
+
+        Между сообщениями раз в `interval` секунд перечитываем подписки,
+        чтобы подхватить оформленные и отменённые через бота.
+        """
+        while True:
+            members = None
+            if conn.poll(interval or SYNC_INTERVAL):
+                try:
+                    members = conn.recv()
+                except EOFError:
+                    logger.critical('Супервизор завершился, воркер %s '
+                                    'останавливается', self.name)
+                    os._exit(1)
+            try:
+                owned = self.sync(members)
+            except Exception as error:
+                logger.error('Воркер %s не смог сверить подписки: %s',
+                             self.name, error)
+                continue
+            if members is not None:
+                logger.info('Воркер %s из %s опрашивает подписок: %s',
+                            self.name, len(members), owned)
+
+
+def watch_supervisor(conn):
+    """Завершаем воркер, если супервизор умер."""
+    while True:
+        try:
+            conn.recv()
+        except EOFError:
+            logger.critical('Супервизор завершился, воркер останавливается')
+            os._exit(1)
+
+
+def run_worker(index, conn, workers):
+    """Процесс-воркер: опрашиваем только подписки своей доли кольца.
+
+    Лимит Telegram общий на бота, поэтому делится между воркерами.
+    С `LEASE_STORE` кольцо общее для воркеров всех узлов, а подписки
+    закрепляются арендами.
+    """
+    config.setup()
+    vault.open_vault()
+    members = conn.recv()
+    if metrics.METRICS_PORT:
+        metrics.start_server(metrics.METRICS_PORT + 1 + index)
+    telegram_bot = telegram.Bot(token=homework.TELEGRAM_TOKEN)
+    sender = send_queue.SendQueue(telegram_bot, share=1 / workers).start()
+    config.on_reload(sender.apply_config)
+    bot = notifiers.build(sender)
+    session = http_pool.make_session()
+    store = state.StateStore(owner=f'{leases.NODE_NAME}/{index}')
+    if leases.LEASE_STORE:
+        coordinator = leases.Coordinator(
+            leases.open_store(), f'{leases.NODE_NAME}/{index}', store)
+        registry = coordinator.start().registry
+        threading.Thread(target=watch_supervisor, args=(conn,),
+                         name='shard', daemon=True).start()
+    else:
+        shard = Shard(index, store)
+        shard.sync(members)
+        registry = shard.registry
+        threading.Thread(target=shard.listen, args=(conn,), name='shard',
+                         daemon=True).start()
+    stop = snapshot.stop_on_signals(threading.Event(), registry.changed)
+    tenants.run_scheduled(bot, registry, session, store, stop,
+                          snapshot.SNAPSHOT_FILE
+                          and f'{snapshot.SNAPSHOT_FILE}.{index}')
+    snapshot.drain(bot, sender, store)
+
+
+class Supervisor:
+    """Запускает воркеры и раздаёт им состав кольца.
+
+    Если воркер умер, его подписки сразу расходятся по остальным,
+    а через `restart_delay` секунд воркер запускается заново и забирает
+    свою долю обратно. Воркеры добавляются и убираются `scale` или
+    сигналами SIGTTIN и SIGTTOU, а SIGHUP перечитывает конфигурацию
+    у супервизора и всех воркеров.
+    """
+
+    def __init__(self, workers=None, target=run_worker, args=(),
+                 restart_delay=RESTART_DELAY):
+        self.size = workers or WORKERS
+        self.target = target
+        self.args = args
+        self.restart_delay = restart_delay
+        self.processes = {}
+        self._restarts = {}
+        self._wanted = None
+
+    @property
+    def members(self):
+        return sorted(self.processes)
+
+    def spawn(self, index):
+        parent, child = _context.Pipe()
+        process = _context.Process(
+            target=self.target, args=(index, child, self.size, *self.args),
+            name=f'worker-{index}', daemon=True)
+        process.start()
+        child.close()
+        self.processes[index] = (process, parent)
+        logger.info('Запущен воркер %s, pid %s', index, process.pid)
+
+    def broadcast(self):
+        """Рассылаем воркерам текущий состав кольца."""
+        members = self.members
+        for process, conn in self.processes.values():
+            try:
+                conn.send(members)
+            except OSError:
+                logger.warning('Воркер %s не принял состав кольца',
+                               process.name)
+
+    def start(self):
+        for index in range(self.size):
+            self.spawn(index)
+        self.broadcast()
+        return self
+
+    def scale(self, workers):
+        """Меняем число воркеров и перебалансируем подписки."""
+        workers = max(1, workers)
+        self.size = workers
+        for index in sorted(self.processes):
+            if index >= workers:
+                process, conn = self.processes.pop(index)
+                process.terminate()
+                process.join()
+                conn.close()
+        self._restarts.clear()
+        for index in range(workers):
+            if index not in self.processes:
+                self.spawn(index)
+        logger.info('Воркеров: %s', workers)
+        self.broadcast()
+
+    def check(self, timeout=None):
+        """Ждём смерти воркера или срока перезапуска и перебалансируем.
+
+        Возвращаем True, если состав кольца изменился.
+        """
+        if self._restarts:
+            restart_in = max(0.0, min(self._restarts.values())
+                             - time.monotonic())
+            timeout = restart_in if timeout is None else min(timeout,
+                                                             restart_in)
+        sentinels = {process.sentinel: index
+                     for index, (process, _) in self.processes.items()}
+        if sentinels:
+            ready = wait(list(sentinels), timeout)
+        else:
+            time.sleep(timeout or 0)
+            ready = []
+        for sentinel in ready:
+            index = sentinels[sentinel]
+            process, conn = self.processes.pop(index)
+            process.join()
+            conn.close()
+            logger.error('Воркер %s завершился с кодом %s, его подписки '
+                         'переходят к остальным', index, process.exitcode)
+            self._restarts[index] = time.monotonic() + self.restart_delay
+        now = time.monotonic()
+        restarted = [index for index, at in self._restarts.items()
+                     if at <= now]
+        for index in restarted:
+            del self._restarts[index]
+            self.spawn(index)
+        changed = bool(ready or restarted)
+        if changed:
+            self.broadcast()
+        return changed
+
+    def run(self, registry=None):
+        """Следим за воркерами, пока супервизор не остановят.
+
+        `registry` — реестр приёма команд: о новой подписке воркеры
+        узнают сразу, а не через `SYNC_INTERVAL`.
+        """
+        signal.signal(signal.SIGTTIN, lambda *_: self._want(1))
+        signal.signal(signal.SIGTTOU, lambda *_: self._want(-1))
+        signal.signal(signal.SIGHUP, lambda *_: self.hangup())
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        try:
+            while True:
+                self.check(CHECK_INTERVAL)
+                if self._wanted is not None:
+                    wanted, self._wanted = self._wanted, None
+                    self.scale(wanted)
+                if registry is not None and registry.changed.is_set():
+                    registry.take_new()
+                    self.broadcast()
+        finally:
+            self.stop()
+
+    def hangup(self):
+        """Перечитываем конфигурацию и просим о том же воркеры."""
+        config.request_reload()
+        for process, _ in list(self.processes.values()):
+            if process.pid is not None:
+                os.kill(process.pid, signal.SIGHUP)
+
+    def _want(self, delta):
+        self._wanted = (self._wanted or self.size) + delta
+
+    def stop(self, timeout=None):
+        """Останавливаем все воркеры.
+
+        По SIGTERM воркер досылает очередь и пишет снимок, поэтому ждём
+        его до `SHUTDOWN_TIMEOUT` секунд.
+        """
+        for process, _ in self.processes.values():
+            process.terminate()
+        for process, conn in self.processes.values():
+            process.join(timeout or snapshot.SHUTDOWN_TIMEOUT)
+            conn.close()
+        self.processes.clear()
+
+
+def main():
+    """Опрашиваем подписки несколькими процессами."""
+    config.setup()
+    if not homework.TELEGRAM_TOKEN:
+        raise exceptions.TokenError('Проблема с токеном API Telegram!')
+    vault.open_vault()
+    supervisor = Supervisor().start()
+    metrics.start_server()
+    registry = None
+    if tenants.SELF_SUBSCRIBE:
+        store = state.StateStore()
+        registry = tenants.load_subscriptions(tenants.SUBSCRIPTIONS_FILE,
+                                              store=store)
+        telegram_bot = telegram.Bot(token=homework.TELEGRAM_TOKEN)
+        sender = send_queue.SendQueue(telegram_bot).start()
+        config.on_reload(sender.apply_config)
+        frontend.UpdatePoller(telegram_bot, registry, sender, store).start()
+    logger.info('Запущено воркеров: %s', supervisor.size)
+    supervisor.run(registry)
+
+
+if __name__ == '__main__':
+    main()
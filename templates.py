@@ -0,0 +1,141 @@
+import functools
+
+import config
+import exceptions
+
+DEFAULT_LOCALE = 'ru'
+SHOW_LESSON = False
+SHOW_COMMENT = False
+RENDER_CACHE_SIZE = 4096
+
+CATALOG = {
+    'ru': {
+        'status': 'Изменился статус проверки работы "{name}". {verdict}',
+        'lesson': ' Урок: {lesson}.',
+        'comment': '\nКомментарий ревьюера: {comment}',
+        'verdicts': {
+            'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
+            'reviewing': 'Работа взята на проверку ревьюером.',
+            'rejected': 'Работа проверена: у ревьюера есть замечания.',
+        },
+    },
+    'en': {
+        'status': 'Homework "{name}" has a new review status. {verdict}',
+        'lesson': ' Lesson: {lesson}.',
+        'comment': '\nReviewer comment: {comment}',
+        'verdicts': {
+            'approved': 'Reviewed: the reviewer liked everything. Hooray!',
+            'reviewing': 'The reviewer has taken the homework for review.',
+            'rejected': 'Reviewed: the reviewer has some remarks.',
+        },
+    },
+}
+
+STATUSES = tuple(CATALOG['ru']['verdicts'])
+
+
+class Template:
+    """Шаблон уведомления для пары (язык, статус), собранный заранее.
+
+    Вердикт подставляется один раз при сборке: на рендер остаётся
+    склейка готовых кусков с названием домашки.
+    """
+
+    __slots__ = ('head', 'tail', 'lesson', 'comment')
+
+    def __init__(self, texts, status):
+        marker = '\0'
+        text = texts['status'].format(
+            name=marker, verdict=texts['verdicts'][status])
+        self.head, self.tail = text.split(marker)
+        self.lesson = texts['lesson'].format
+        self.comment = texts['comment'].format
+
+    def render(self, name, lesson=None, comment=None):
+        if not lesson and not comment:
+            return self.head + name + self.tail
+        parts = [self.head, name, self.tail]
+        if lesson:
+            parts.append(self.lesson(lesson=lesson))
+        if comment:
+            parts.append(self.comment(comment=comment))
+        return ''.join(parts)
+
+
+def compile_templates(catalog=CATALOG):
+    """Собираем шаблоны всех языков и статусов каталога."""
+    return {
+        (locale, status): Template(texts, status)
+        for locale, texts in catalog.items()
+        for status in texts['verdicts']
+    }
+
+
+TEMPLATES = compile_templates()
+PARTS = {locale: {status: (template.head, template.tail)
+                  for (code, status), template in TEMPLATES.items()
+                  if code == locale}
+         for locale in CATALOG}
+
+
+def normalize_locale(locale):
+    """Код языка из каталога или None, если такого языка нет."""
+    if not locale:
+        return None
+    locale = locale.lower().split('-')[0].split('_')[0]
+    return locale if locale in CATALOG else None
+
+
+@functools.lru_cache(maxsize=RENDER_CACHE_SIZE)
+def _render(name, status, locale, lesson, comment):
+    template = TEMPLATES.get((locale, status))
+    if template is None:
+        template = TEMPLATES.get((DEFAULT_LOCALE, status))
+    if template is None:
+        template = TEMPLATES.get(('ru', status))
+    if template is None:
+        raise exceptions.ApiStatusNotInDocs(
+            f'Получен незадокументированный статус работы:{status}')
+    return template.render(name, lesson, comment)
+
+
+def render(name, status, locale=None, lesson=None, comment=None):
+    """Текст уведомления о статусе домашки на языке чата.
+
+    Урок и комментарий ревьюера добавляются, только если это включено
+    в `SHOW_LESSON` и `SHOW_COMMENT`. Обычное уведомление без них — одна
+    склейка готовых кусков, как прежняя f-строка; через кэш идут только
+    тексты с уроком или комментарием и языки не из каталога.
+    """
+    if lesson and SHOW_LESSON or comment and SHOW_COMMENT:
+        return _render(name, status, locale or DEFAULT_LOCALE,
+                       lesson if SHOW_LESSON else None,
+                       comment if SHOW_COMMENT else None)
+    try:
+        head, tail = PARTS[locale or DEFAULT_LOCALE][status]
+    except KeyError:
+        return _render(name, status, locale or DEFAULT_LOCALE, None, None)
+    return f'{head}{name}{tail}'
+
+
+def apply_config(settings):
+    """Новые настройки вывода; при смене размера кэш создаётся заново."""
+    global DEFAULT_LOCALE, SHOW_LESSON, SHOW_COMMENT, RENDER_CACHE_SIZE
+    global _render
+    DEFAULT_LOCALE = settings.default_locale
+    SHOW_LESSON = settings.show_lesson
+    SHOW_COMMENT = settings.show_comment
+    if settings.render_cache_size != RENDER_CACHE_SIZE:
+        RENDER_CACHE_SIZE = settings.render_cache_size
+        _render = functools.lru_cache(maxsize=RENDER_CACHE_SIZE)(
+            _render.__wrapped__)
+    else:
+        _render.cache_clear()
+
+
+config.on_reload(apply_config)
+
+
+def cache_info():
+    """Статистика кэша рендера."""
+    return _render.cache_info()
@@ -0,0 +1,458 @@
+import json
+import logging
+import os
+import threading
+import time
+
+import requests
+import telegram
+
+import breaker
+import config
+import exceptions
+import fingerprints
+import frontend
+import homework
+import http_pool
+import metrics
+import models
+import notifiers
+import outbox
+import scheduler
+import send_queue
+import snapshot
+import state
+import templates
+import vault
+
+logger = logging.getLogger('homework.tenants')
+
+SUBSCRIPTIONS_FILE = 'subscriptions.txt'
+SELF_SUBSCRIBE = True
+STREAM_RESPONSES = False
+CONDITIONAL_REQUESTS = False
+
+ERROR_DIGEST = breaker.ErrorDigest()
+OUTAGE_DIGEST = breaker.ErrorDigest()
+OUTAGE_ERRORS = (exceptions.CircuitOpen, exceptions.ApiUnavailable)
+
+
+def apply_config(settings):
+    global SUBSCRIPTIONS_FILE, SELF_SUBSCRIBE, STREAM_RESPONSES
+    global CONDITIONAL_REQUESTS
+    SUBSCRIPTIONS_FILE = settings.subscriptions_file
+    SELF_SUBSCRIBE = settings.self_subscribe
+    STREAM_RESPONSES = settings.stream_responses
+    CONDITIONAL_REQUESTS = settings.conditional_requests
+
+
+config.on_reload(apply_config)
+
+
+class Tenant(scheduler.PollState):
+    """Состояние одной подписки: токен Практикума и чат Telegram.
+
+    Вместо токена может быть его id в хранилище `vault`: тогда заголовки
+    берутся из кэша хранилища, а сам токен в памяти не лежит.
+    `guard` — проверка аренды подписки у узлов с общим хранилищем аренд.
+    """
+
+    __slots__ = ('token', 'chat_id', '_headers', 'timestamp', 'last_message',
+                 'locale', 'fingerprint', 'guard')
+
+    def __init__(self, token, chat_id, timestamp=None, locale=None):
+        super().__init__()
+        self.token = token
+        self.chat_id = chat_id
+        self._headers = (None if vault.is_sealed(token)
+                         else homework.make_headers(token))
+        self.timestamp = timestamp or int(time.time())
+        self.last_message = ''
+        self.locale = locale
+        self.fingerprint = None
+        self.guard = None
+
+    @property
+    def headers(self):
+        return self._headers or vault.headers_for(self.token)
+
+    def owned(self):
+        """Можно ли опрашивать подписку и уведомлять о ней."""
+        return self.guard is None or self.guard()
+
+    def __repr__(self):
+        return f'Tenant(chat_id={self.chat_id!r})'
+
+
+class Registry:
+    """Реестр подписок: токен Практикума -> состояние подписчика.
+
+    Подписки могут добавляться из других потоков (команды в Telegram),
+    о новой подписке цикл опроса узнаёт по событию `changed`. В реестре
+    с арендами (`leased`) уведомления outbox отправляются только в чаты
+    подписок, аренда которых ещё действует.
+    """
+
+    def __init__(self, leased=False):
+        self.leased = leased
+        self._tenants = {}
+        self._new = []
+        self._lock = threading.Lock()
+        self.changed = threading.Event()
+
+    def subscribe(self, token, chat_id, timestamp=None):
+        """Добавляем подписку или обновляем чат у существующей."""
+        with self._lock:
+            tenant = self._tenants.get(token)
+            if tenant is None:
+                tenant = Tenant(token, chat_id, timestamp)
+                self._tenants[token] = tenant
+                self._new.append(tenant)
+                self.changed.set()
+            else:
+                tenant.chat_id = chat_id
+        return tenant
+
+    def unsubscribe(self, token):
+        """Удаляем подписку, если она была."""
+        with self._lock:
+            return self._tenants.pop(token, None)
+
+    def get(self, token):
+        """Возвращаем подписку по токену."""
+        return self._tenants.get(token)
+
+    def holds(self, tenant):
+        """Проверяем, что подписка всё ещё в реестре именно этим объектом.
+
+        После отписки и повторной подписки по тому же токену старый объект
+        может оставаться в расписании, опрашивать его уже нельзя. Так же
+        нельзя опрашивать подписку, аренда которой истекла.
+        """
+        return self._tenants.get(tenant.token) is tenant and tenant.owned()
+
+    def owned_chats(self):
+        """Чаты, в которые можно слать уведомления; None — в любые."""
+        if not self.leased:
+            return None
+        return {str(tenant.chat_id) for tenant in self if tenant.owned()}
+
+    def find_by_chat(self, chat_id):
+        """Ищем подписки чата перебором: нужно только для команд."""
+        return [tenant for tenant in self
+                if str(tenant.chat_id) == str(chat_id)]
+
+    def take_new(self):
+        """Забираем подписки, добавленные с прошлого вызова."""
+        with self._lock:
+            new, self._new = self._new, []
+            self.changed.clear()
+        return new
+
+    def __contains__(self, token):
+        return token in self._tenants
+
+    def __len__(self):
+        return len(self._tenants)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._tenants.values()))
+
+
+def load_subscriptions(path, registry=None, store=None):
+    """Читаем подписки из файла: по строке `<токен> <chat_id> [язык]`.
+
+    Токен и чат из env, если они заданы, тоже становятся подпиской,
+    чтобы старая конфигурация на одного студента продолжала работать.
+    Подписки, оформленные командой /start, берутся из хранилища.
+    С открытым хранилищем токенов все токены попадают в реестр его id,
+    а открытые токены из базы подписок заменяются на id.
+    """
+    if registry is None:
+        registry = Registry()
+    if homework.PRACTICUM_TOKEN and homework.TELEGRAM_CHAT_ID:
+        registry.subscribe(vault.seal(homework.PRACTICUM_TOKEN),
+                           homework.TELEGRAM_CHAT_ID)
+    if store is not None:
+        for token, chat_id in store.subscriptions():
+            sealed = vault.seal(token)
+            if sealed != token:
+                store.save_subscription(sealed, chat_id)
+                store.delete_subscription(token)
+            registry.subscribe(sealed, chat_id)
+    if not os.path.exists(path):
+        return registry
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            token, chat_id, *locale = line.split()
+            tenant = registry.subscribe(vault.seal(token), chat_id)
+            if locale:
+                tenant.locale = templates.normalize_locale(locale[0])
+    return registry
+
+
+def restore_cursors(registry, store):
+    """Продолжаем опрос подписок с сохранённых курсоров и языков."""
+    for tenant in registry:
+        tenant.timestamp = store.get_cursor(
+            tenant.token, tenant.timestamp, tenant.chat_id)
+        tenant.locale = store.get_locale(tenant.chat_id, tenant.locale)
+
+
+def reload_subscriptions(registry, store=None):
+    """Добавляем подписки, появившиеся в списке после перечитывания.
+
+    Новые подписки продолжают опрос с курсора из хранилища, а цикл опроса
+    узнаёт о них по `registry.changed`.
+    """
+    known = {tenant.token for tenant in registry}
+    load_subscriptions(SUBSCRIPTIONS_FILE, registry, store)
+    added = [tenant for tenant in registry if tenant.token not in known]
+    for tenant in added:
+        if store is not None:
+            tenant.timestamp = store.get_cursor(
+                tenant.token, tenant.timestamp, tenant.chat_id)
+            tenant.locale = store.get_locale(tenant.chat_id, tenant.locale)
+    if added:
+        logger.info('Добавлено подписок: %s', len(added))
+    return added
+
+
+def save_state(registry, store, bot=None):
+    """Сохраняем курсоры и новые статусы после цикла опроса.
+
+    С ботом сразу отправляем уведомления, сохранённые в outbox.
+    """
+    for tenant in registry:
+        store.set_cursor(tenant.token, tenant.timestamp)
+    store.flush()
+    if bot is not None:
+        outbox.deliver(bot, store, chats=registry.owned_chats())
+
+
+def notify(bot, tenant, message):
+    """Отправляем сообщение подписчику, отсекая повтор последнего."""
+    if message == tenant.last_message:
+        metrics.MESSAGES.inc('suppressed')
+        return
+    tenant.last_message = message
+    homework.send_to_chat(bot, tenant.chat_id, message)
+
+
+def notify_status(bot, tenant, record, store=None):
+    """Уведомляем о статусе домашки, только если он действительно сменился.
+
+    С хранилищем уведомление идёт через outbox, без него отправляется
+    сразу, а повторы отсекаются по последнему сообщению подписчика.
+    """
+    if not tenant.owned():
+        logger.warning('Аренда подписки истекла, статус не сохранён',
+                       extra={'chat_id': tenant.chat_id})
+        return
+    message = record.render(tenant.locale)
+    if store is None:
+        notify(bot, tenant, message)
+        return
+    message = homework.enqueue_status(store, tenant.chat_id, record.name,
+                                      record.status.value, message,
+                                      record.date_updated)
+    if message is not None:
+        tenant.last_message = message
+
+
+def apply_response(bot, tenant, response, store=None):
+    """Разбираем ответ API для подписки и рассылаем новые статусы.
+
+    Возвращаем пары (название, статус) из ответа — по ним подбирается
+    расписание.
+    """
+    records = models.parse_homeworks(response)
+    for record in records:
+        notify_status(bot, tenant, record, store)
+    if not records:
+        logger.debug('Нет новых статусов', extra={'chat_id': tenant.chat_id})
+    tenant.timestamp = homework.get_cursor(response, tenant.timestamp)
+    return [(record.name, record.status.value) for record in records]
+
+
+def apply_stream(bot, tenant, stream, store=None):
+    """Рассылаем статусы из потокового ответа API."""
+    statuses = []
+    for item in stream:
+        record = models.make_homework(item)
+        notify_status(bot, tenant, record, store)
+        statuses.append((record.name, record.status.value))
+    if not statuses:
+        logger.debug('Нет новых статусов', extra={'chat_id': tenant.chat_id})
+    tenant.timestamp = homework.get_cursor(stream.fields, tenant.timestamp)
+    return statuses
+
+
+def report_error(bot, tenant, error):
+    """Логируем сбой опроса подписки и сообщаем о нём в её чат.
+
+    Повторные сбои в окне `ERROR_DIGEST_INTERVAL` не шлются по одному,
+    а собираются в сводку для `report_digest`. Сбой всего API касается
+    всех подписок сразу, поэтому о нём узнаёт только оператор.
+    """
+    message = f'Сбой в работе программы: {error}'
+    logger.error(message, extra={'chat_id': tenant.chat_id})
+    metrics.ERRORS.inc(type(error).__name__)
+    if isinstance(error, OUTAGE_ERRORS):
+        report_outage(bot, error)
+    elif ERROR_DIGEST.report(tenant.chat_id, message):
+        notify(bot, tenant, message)
+
+
+def report_outage(bot, error):
+    """Сообщаем о сбое API в чат оператора `TELEGRAM_CHAT_ID`.
+
+    Сбои копятся в сводку по адресу API, а не по чатам: при отказе API
+    уходит одно сообщение за окно, а не по сообщению каждому подписчику.
+    """
+    message = f'API {homework.ENDPOINT} недоступно: {error}'
+    if (OUTAGE_DIGEST.report(homework.ENDPOINT, message)
+            and homework.TELEGRAM_CHAT_ID):
+        homework.send_to_chat(bot, homework.TELEGRAM_CHAT_ID, message)
+
+
+def report_digest(bot):
+    """Рассылаем сводки подавленных сбоев по закончившимся окнам."""
+    for chat_id, summary in ERROR_DIGEST.pending():
+        homework.send_to_chat(bot, chat_id, summary)
+    for endpoint, summary in OUTAGE_DIGEST.pending():
+        if homework.TELEGRAM_CHAT_ID:
+            homework.send_to_chat(bot, homework.TELEGRAM_CHAT_ID,
+                                  f'API {endpoint}. {summary}')
+
+
+def poll_tenant(bot, tenant, session=requests, store=None):
+    """Опрашиваем API для одной подписки и рассылаем новые статусы."""
+    if CONDITIONAL_REQUESTS:
+        return poll_if_changed(bot, tenant, session, store)
+    if STREAM_RESPONSES:
+        stream = homework.request_api_stream(tenant.timestamp,
+                                             tenant.headers, session)
+        return apply_stream(bot, tenant, stream, store)
+    response = homework.request_api(tenant.timestamp, tenant.headers,
+                                    session)
+    return apply_response(bot, tenant, response, store)
+
+
+def poll_if_changed(bot, tenant, session=requests, store=None):
+    """Опрашиваем подписку, пропуская разбор неизменившегося ответа.
+
+    Отпечаток ответа запоминается только после успешной обработки,
+    иначе сбой посреди рассылки скрыл бы статусы при следующем опросе.
+    """
+    body, fingerprint = homework.fetch_api_if_changed(
+        tenant.timestamp, tenant.headers, session, tenant.fingerprint)
+    if body is None:
+        tenant.timestamp = homework.get_cursor(
+            {'current_date': fingerprint.current_date}, tenant.timestamp)
+        tenant.fingerprint = fingerprint
+        return list(fingerprint.statuses)
+    started = time.process_time()
+    statuses = apply_response(bot, tenant, json.loads(body), store)
+    fingerprints.STATS.record_full(time.process_time() - started)
+    fingerprint.statuses = statuses
+    tenant.fingerprint = fingerprint
+    return statuses
+
+
+def poll_scheduled(bot, tenant, session=requests, store=None):
+    """Опрашиваем подписку и возвращаем паузу до её следующего опроса."""
+    try:
+        statuses = poll_tenant(bot, tenant, session, store)
+    except Exception as error:
+        report_error(bot, tenant, error)
+        return scheduler.next_delay(tenant, error=error,
+                                    base=homework.RETRY_TIME)
+    return scheduler.next_delay(tenant, statuses, base=homework.RETRY_TIME)
+
+
+def schedule_new(registry, timetable, now):
+    """Ставим в расписание подписки, которых в нём ещё нет."""
+    for tenant in registry.take_new():
+        timetable.schedule(tenant, now)
+
+
+def run_scheduled(bot, registry, session=requests, store=None, stop=None,
+                  snapshot_path=None):
+    """Опрашиваем подписки по адаптивному расписанию до события `stop`.
+
+    Расписание начинается со снимка прошлого запуска. После `stop`
+    начатый опрос доводится до конца, новые не начинаются, состояние
+    сохраняется, а расписание записывается в снимок.
+    """
+    stop = stop or threading.Event()
+    timetable = scheduler.Timetable()
+    snapshot.restore(registry, timetable, time.time(), snapshot_path)
+    while not stop.is_set():
+        now = time.time()
+        schedule_new(registry, timetable, now)
+        due = timetable.pop_due(now)
+        if due:
+            metrics.SCHEDULER_LAG.set(now - due[0].due)
+        for tenant in due:
+            if stop.is_set():
+                break
+            if not registry.holds(tenant):
+                continue
+            delay = poll_scheduled(bot, tenant, session, store)
+            timetable.schedule(tenant, time.time() + delay)
+        if store is not None:
+            save_state(registry, store, bot)
+        report_digest(bot)
+        next_due = timetable.next_due() or now + homework.RETRY_TIME
+        registry.changed.wait(max(0.0, next_due - time.time()))
+    saved = snapshot.save(((tenant.token, tenant) for tenant in registry),
+                          snapshot_path)
+    logger.info('Расписание подписок сохранено в снимок: %s', saved)
+
+
+def poll_all(bot, registry, session=requests, store=None):
+    """Один цикл опроса по всем подпискам реестра."""
+    polled = 0
+    for tenant in registry:
+        try:
+            poll_tenant(bot, tenant, session, store)
+        except Exception as error:
+            report_error(bot, tenant, error)
+        polled += 1
+    if store is not None:
+        store.flush()
+        outbox.deliver(bot, store)
+    return polled
+
+
+def main():
+    """Опрашиваем все подписки из одного процесса."""
+    config.setup()
+    if not homework.TELEGRAM_TOKEN:
+        raise exceptions.TokenError('Проблема с токеном API Telegram!')
+    metrics.start_server()
+    vault.open_vault()
+    telegram_bot = telegram.Bot(token=homework.TELEGRAM_TOKEN)
+    sender = send_queue.SendQueue(telegram_bot).start()
+    config.on_reload(sender.apply_config)
+    bot = notifiers.build(sender)
+    session = http_pool.make_session()
+    store = state.StateStore()
+    registry = load_subscriptions(SUBSCRIPTIONS_FILE, store=store)
+    restore_cursors(registry, store)
+    logger.info('Загружено подписок: %s', len(registry))
+    config.on_reload(lambda _: reload_subscriptions(registry, store))
+    stop = snapshot.stop_on_signals(threading.Event(), registry.changed)
+    if SELF_SUBSCRIBE:
+        frontend.UpdatePoller(telegram_bot, registry, sender, store).start()
+    run_scheduled(bot, registry, session, store, stop)
+    snapshot.drain(bot, sender, store)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+import asyncio
+import threading
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+import exceptions
+from utils import RecordingBot
+
+
+async def fetch_from_app(handler, timestamp=1000198000):
+    import async_api
+    import homework
+
+    app = web.Application()
+    app.router.add_get('/api/user_api/homework_statuses/', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    endpoint = homework.ENDPOINT
+    homework.ENDPOINT = (
+        f'http://127.0.0.1:{port}/api/user_api/homework_statuses/'
+    )
+    try:
+        async with aiohttp.ClientSession() as session:
+            return await async_api.async_get_api_answer(
+                session, timestamp, homework.make_headers('token'))
+    finally:
+        homework.ENDPOINT = endpoint
+        await runner.cleanup()
+
+
+class SlowApi:
+    """Медленный эндпоинт, считающий одновременные запросы."""
+
+    def __init__(self, delay=0.05, expected=None):
+        self.delay = delay
+        self.expected = expected
+        self.in_flight = self.peak = self.served = 0
+        self.done = threading.Event()
+
+    async def handler(self, request):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        self.served += 1
+        if self.served == self.expected:
+            self.done.set()
+        return web.json_response({'homeworks': [], 'current_date': 1})
+
+
+async def poll_slow_api(monkeypatch, api, poll):
+    import breaker
+    import homework
+
+    app = web.Application()
+    app.router.add_get('/api/user_api/homework_statuses/', api.handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    monkeypatch.setattr(
+        homework, 'ENDPOINT',
+        f'http://127.0.0.1:{port}/api/user_api/homework_statuses/')
+    monkeypatch.setattr(breaker, 'PRACTICUM',
+                        breaker.CircuitBreaker('practicum-test'))
+    try:
+        async with aiohttp.ClientSession() as session:
+            return await poll(session)
+    finally:
+        await runner.cleanup()
+
+
+class TestAsyncApi:
+
+    def test_concurrency_stays_within_limit(self, monkeypatch, tmp_path):
+        import async_api
+        import tenants
+
+        registry = tenants.Registry()
+        for number in range(20):
+            registry.subscribe(f'token-{number}', number)
+        api = SlowApi()
+        assert asyncio.run(poll_slow_api(
+            monkeypatch, api, lambda session: async_api.async_poll_all(
+                session, RecordingBot(), registry, concurrency=3))) == 20
+        assert api.served == 20 and api.peak == 3, (
+            'async_poll_all должен держать не больше concurrency запросов '
+            'одновременно и доходить до предела'
+        )
+
+        stop = threading.Event()
+        api = SlowApi(expected=20)
+
+        def stop_after_round():
+            api.done.wait(30)
+            stop.set()
+            registry.changed.set()
+
+        threading.Thread(target=stop_after_round, daemon=True).start()
+        asyncio.run(poll_slow_api(
+            monkeypatch, api, lambda session: async_api.async_run_scheduled(
+                session, RecordingBot(), registry, concurrency=4, stop=stop,
+                snapshot_path=str(tmp_path / 'snapshot.bin'))))
+        assert api.served == 20 and api.peak == 4, (
+            'async_run_scheduled должен держать не больше concurrency '
+            'запросов одновременно'
+        )
+
+    def test_async_get_api_answer(self):
+        seen = {}
+
+        async def handler(request):
+            seen['from_date'] = request.query['from_date']
+            seen['auth'] = request.headers['Authorization']
+            return web.json_response(
+                {'homeworks': [], 'current_date': 1000198000})
+
+        result = asyncio.run(fetch_from_app(handler))
+        assert result == {'homeworks': [], 'current_date': 1000198000}
+        assert seen == {'from_date': '1000198000', 'auth': 'OAuth token'}, (
+            'Проверьте, что асинхронный запрос передаёт from_date и токен'
+        )
+
+    def test_async_get_api_answer_not_ok(self):
+        async def handler(request):
+            return web.json_response({}, status=500)
+
+        with pytest.raises(exceptions.ApiNotResponse):
+            asyncio.run(fetch_from_app(handler))
+
+    def test_async_get_api_answer_empty(self):
+        async def handler(request):
+            return web.Response(text='null')
+
+        with pytest.raises(exceptions.ApiEmptyResponse):
+            asyncio.run(fetch_from_app(handler))
@@ -0,0 +1,124 @@
+import threading
+
+import pytest
+import requests
+from utils import MockResponse
+
+DAY = 86400
+SINCE = 1640995200
+
+HOMEWORKS = [
+    {'homework_name': 'hw1', 'status': 'approved',
+     'date_updated': '2022-01-05T10:00:00Z'},
+    {'homework_name': 'hw2', 'status': 'rejected',
+     'date_updated': '2022-01-15T10:00:00Z'},
+    {'homework_name': 'hw3', 'status': 'reviewing',
+     'date_updated': '2022-01-25T10:00:00Z'},
+    {'homework_name': 'hw4', 'status': 'approved'},
+]
+
+
+class RangeSession:
+    """API, отдающее домашки начиная с from_date, и сбой на одном из них."""
+
+    def __init__(self, broken=None):
+        import history
+
+        self.broken = broken
+        self.calls = []
+        self.updated = [history.parse_time(item.get('date_updated'), 0)
+                        for item in HOMEWORKS]
+        self._lock = threading.Lock()
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        from_date = params['from_date']
+        with self._lock:
+            self.calls.append(from_date)
+        if from_date == self.broken:
+            raise requests.ConnectionError('обрыв')
+        return MockResponse([
+            item for item, updated in zip(HOMEWORKS, self.updated)
+            if not updated or updated >= from_date],
+            current_date=SINCE + 30 * DAY)
+
+
+class TestBackfill:
+
+    def test_seeds_without_messages_and_resumes(self, tmp_path,
+                                                monkeypatch):
+        import backfill
+        import breaker
+        import state
+        import tenants
+
+        monkeypatch.setattr(breaker, 'PRACTICUM',
+                            breaker.CircuitBreaker('practicum-test'))
+        store = state.StateStore(str(tmp_path / 'state.sqlite3'))
+        store.record(1, 'hw2', 'approved')
+        tenant = tenants.Tenant('token', 1)
+        until = SINCE + 30 * DAY
+        session = RangeSession(broken=SINCE)
+
+        summary = backfill.backfill(tenant, store, session, since=SINCE,
+                                    until=until, step=10 * DAY)
+        assert summary == {'ranges': 3, 'skipped': 0, 'failed': 3,
+                           'seeded': 0}
+
+        original = backfill.seed
+
+        def interrupted(store, chat_id, found, seen):
+            if any(record.name == 'hw3' for record, _ in found):
+                raise KeyboardInterrupt
+            return original(store, chat_id, found, seen)
+
+        monkeypatch.setattr(backfill, 'seed', interrupted)
+        session = RangeSession()
+        with pytest.raises(KeyboardInterrupt):
+            backfill.backfill(tenant, store, session, since=SINCE,
+                              step=10 * DAY)
+        assert session.calls == [SINCE], (
+            'История должна забираться одним запросом, а не по запросу '
+            'на диапазон'
+        )
+        assert store.get_status(1, 'hw1') == 'approved'
+        assert store.get_status(1, 'hw2') == 'approved', (
+            'Догрузка не должна затирать уже известный статус'
+        )
+        assert store.get_status(1, 'hw4') == 'approved', (
+            'Домашка без даты должна попадать в первый диапазон'
+        )
+        assert store.take_undelivered() == [], (
+            'Догрузка не должна ставить уведомления в очередь'
+        )
+        store.close()
+
+        monkeypatch.setattr(backfill, 'seed', original)
+        store = state.StateStore(str(tmp_path / 'state.sqlite3'))
+        session = RangeSession()
+        summary = backfill.backfill(tenant, store, session, since=SINCE,
+                                    step=10 * DAY)
+        assert session.calls == [SINCE + 20 * DAY], (
+            'После перезапуска история забирается с последней '
+            'контрольной точки'
+        )
+        assert summary == {'ranges': 1, 'skipped': 2, 'failed': 0,
+                           'seeded': 1}
+        assert store.backfill_progress('token') == (SINCE, until, until), (
+            'Продолжение должно идти до границы, выбранной при первом '
+            'запуске'
+        )
+        assert store.get_cursor('token') == until
+        assert backfill.backfill(tenant, store, session,
+                                 step=10 * DAY) == {
+            'ranges': 0, 'skipped': 3, 'failed': 0, 'seeded': 0}
+        assert len(session.calls) == 1, 'Догруженная подписка не опрашивается'
+        store.close()
+
+    def test_split_ranges(self):
+        import backfill
+
+        assert backfill.split_ranges(0, 25, 10) == [(0, 10), (10, 20),
+                                                    (20, 25)]
+        assert backfill.split_found(
+            [('a', 3), ('b', None), ('c', 24), ('d', 10)], 0, 25, 10) == [
+            [('a', 3), ('b', None)], [('d', 10)], [('c', 24)]]
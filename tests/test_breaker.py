@@ -0,0 +1,111 @@
+from http import HTTPStatus
+
+import pytest
+import requests
+
+import exceptions
+from utils import FakeClock, MockResponse
+
+
+class TestBreaker:
+
+    def test_open_half_open_closed(self):
+        import breaker
+        import metrics
+
+        clock = FakeClock()
+        fuse = breaker.CircuitBreaker('test', failure_threshold=3,
+                                      reset_timeout=60, clock=clock)
+        for _ in range(3):
+            assert fuse.allow()
+            fuse.failure()
+        assert fuse.state == breaker.OPEN and not fuse.allow(), (
+            'После серии сбоев предохранитель должен размыкаться'
+        )
+        assert 'homework_circuit_state{endpoint="test"} 2' in (
+            metrics.render()
+        ), 'Состояние предохранителя должно попадать в метрики'
+        clock.now = 61
+        assert fuse.allow() and not fuse.allow(), (
+            'После паузы пропускается ровно один пробный запрос'
+        )
+        fuse.failure()
+        assert fuse.state == breaker.OPEN and fuse.retry_in() == 60
+        clock.now = 122
+        assert fuse.allow()
+        fuse.success()
+        assert fuse.state == breaker.CLOSED and fuse.allow()
+
+    def test_api_outage_stops_requests(self, monkeypatch):
+        import breaker
+        import homework
+
+        calls = []
+
+        def mock_get(url, **kwargs):
+            calls.append(url)
+            return MockResponse(http_status=HTTPStatus.BAD_GATEWAY)
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        monkeypatch.setattr(breaker, 'PRACTICUM', breaker.CircuitBreaker(
+            'practicum-test', failure_threshold=2))
+        for _ in range(2):
+            with pytest.raises(exceptions.ApiNotResponse):
+                homework.get_api_answer(0)
+        with pytest.raises(exceptions.CircuitOpen):
+            homework.get_api_answer(0)
+        assert len(calls) == 2, (
+            'При разомкнутом предохранителе запросы к API не должны уходить'
+        )
+
+    def test_unauthorized_is_not_outage(self, monkeypatch):
+        import breaker
+        import homework
+
+        monkeypatch.setattr(requests, 'get', lambda url, **kwargs:
+                            MockResponse(http_status=HTTPStatus.UNAUTHORIZED))
+        monkeypatch.setattr(breaker, 'PRACTICUM', breaker.CircuitBreaker(
+            'practicum-test', failure_threshold=1))
+        with pytest.raises(exceptions.ApiNotResponse):
+            homework.get_api_answer(0)
+        assert breaker.PRACTICUM.state == breaker.CLOSED
+
+    def test_error_digest(self):
+        import breaker
+
+        clock = FakeClock()
+        digest = breaker.ErrorDigest(interval=600, clock=clock)
+        assert digest.report(1, 'сбой 1') == 'сбой 1'
+        assert digest.report(1, 'сбой 2') is None
+        assert digest.report(1, 'сбой 3') is None
+        assert digest.report(2, 'сбой') == 'сбой', (
+            'Сбои разных чатов считаются отдельно'
+        )
+        assert digest.pending() == []
+        clock.now = 600
+        summaries = dict(digest.pending())
+        assert summaries[1].startswith('За 10 мин сбой повторился ещё 2 раз')
+        assert summaries[1].endswith('сбой 3') and 2 not in summaries
+        assert digest.report(1, 'сбой 4') == 'сбой 4'
+
+    def test_send_queue_waits_for_telegram(self, monkeypatch):
+        import breaker
+        import send_queue
+
+        sent = []
+
+        class Bot:
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                sent.append(text)
+
+        fuse = breaker.CircuitBreaker('telegram-test', failure_threshold=1,
+                                      reset_timeout=0.2)
+        fuse.failure()
+        monkeypatch.setattr(breaker, 'TELEGRAM', fuse)
+        queue = send_queue.SendQueue(Bot(), global_rate=1000, chat_rate=1000)
+        queue.send_message(chat_id=1, text='статус')
+        queue.start()
+        queue.stop(timeout=5)
+        assert sent == ['статус'] and fuse.state == breaker.CLOSED, (
+            'Сообщение должно дождаться замыкания предохранителя'
+        )
@@ -0,0 +1,133 @@
+import pytest
+
+import exceptions
+
+
+class TestConfig:
+
+    def test_read_env_and_file(self, tmp_path):
+        import config
+
+        path = tmp_path / '.env'
+        path.write_text('RETRY_TIME=300\nCONDITIONAL_REQUESTS=1\n')
+        settings = config.read(str(path), {'RETRY_TIME': '900',
+                                           'TELEGRAM_CHAT_ID': '42',
+                                           'IDLE_AFTER': ''})
+        assert settings.retry_time == 300, (
+            'Значение из файла должно быть важнее окружения'
+        )
+        assert settings.telegram_chat_id == '42'
+        assert settings.conditional_requests is True
+        assert settings.idle_after == 6, (
+            'Пустая переменная должна давать значение по умолчанию'
+        )
+        with pytest.raises(exceptions.ConfigError, match='RETRY_TIME'):
+            config.read(None, {'RETRY_TIME': '0'})
+        with pytest.raises(AttributeError):
+            settings.retry_time = 1
+
+    def test_reload_applies_to_modules(self, tmp_path, monkeypatch):
+        import config
+        import homework
+        import scheduler
+        import send_queue
+        import tenants
+
+        monkeypatch.setattr(config, '_settings', config.Settings())
+        monkeypatch.setattr(config, '_loaded', True)
+        monkeypatch.setattr(config, '_listeners', list(config._listeners))
+        for module in (homework, scheduler, send_queue, tenants):
+            for name in dir(module):
+                if name.isupper():
+                    monkeypatch.setattr(module, name, getattr(module, name))
+        queue = send_queue.SendQueue(object(), global_rate=10, chat_rate=1,
+                                     share=0.5)
+        queue.send_message(chat_id=1, text='в очереди')
+        config.on_reload(queue.apply_config)
+        path = tmp_path / '.env'
+        path.write_text('PRACTICUM_TOKEN=new\nRETRY_TIME=60\n'
+                        'REVIEWING_INTERVAL=30\nTELEGRAM_GLOBAL_RATE=8\n'
+                        'SUBSCRIPTIONS_FILE=other.txt\nWORKERS=64\n')
+
+        changed = config.reload(str(path))
+
+        assert 'workers' not in changed and config.current().workers != 64, (
+            'Настройки, которые читаются только при старте, не должны '
+            'меняться на ходу'
+        )
+        assert homework.RETRY_TIME == 60
+        assert homework.HEADERS == {'Authorization': 'OAuth new'}
+        assert scheduler.REVIEWING_INTERVAL == 30
+        assert tenants.SUBSCRIPTIONS_FILE == 'other.txt'
+        assert queue._global.rate == 4 and queue.depth == 1, (
+            'Очередь должна получить новые лимиты, не теряя сообщений'
+        )
+
+        path.write_text('RETRY_TIME=never\n')
+        assert config.reload(str(path)) == []
+        assert homework.RETRY_TIME == 60, (
+            'При ошибке в конфигурации должны остаться прежние настройки'
+        )
+
+    def test_reload_adds_subscriptions(self, tmp_path, monkeypatch):
+        import homework
+        import state
+        import tenants
+
+        monkeypatch.setattr(homework, 'PRACTICUM_TOKEN', None)
+        path = tmp_path / 'subscriptions.txt'
+        path.write_text('first 1\n')
+        monkeypatch.setattr(tenants, 'SUBSCRIPTIONS_FILE', str(path))
+        store = state.StateStore(str(tmp_path / 'state.sqlite3'))
+        store.set_cursor('second', 1234)
+        store.flush()
+        registry = tenants.load_subscriptions(str(path))
+        registry.take_new()
+
+        path.write_text('first 1\nsecond 2 en\n')
+        added = tenants.reload_subscriptions(registry, store)
+
+        assert [tenant.token for tenant in added] == ['second']
+        assert added[0].timestamp == 1234 and added[0].locale == 'en', (
+            'Новая подписка должна продолжить опрос с курсора из хранилища'
+        )
+        assert registry.changed.is_set()
+
+    def test_env_file_reaches_every_module(self, tmp_path, monkeypatch):
+        import breaker
+        import config
+        import http_pool
+        import metrics
+        import outbox
+        import state
+        import templates
+
+        modules = (breaker, http_pool, metrics, outbox, state, templates)
+        monkeypatch.setattr(config, '_settings', config.Settings())
+        monkeypatch.setattr(config, '_loaded', False)
+        monkeypatch.setattr(config, '_listeners',
+                            [module.apply_config for module in modules])
+        monkeypatch.setattr(templates, '_render', templates._render)
+        for module in modules:
+            for name in dir(module):
+                if name.isupper():
+                    monkeypatch.setattr(module, name, getattr(module, name))
+        path = tmp_path / '.env'
+        path.write_text('STATE_DB=other.sqlite3\nSHOW_LESSON=1\n'
+                        'BREAKER_FAILURES=2\nMETRICS_PORT=9100\n'
+                        'OUTBOX_BATCH=10\nREAD_TIMEOUT=4\n')
+
+        config.apply(config.read(str(path), {}))
+
+        assert state.STATE_DB == 'other.sqlite3', (
+            'Настройки из .env должны доходить до модулей, а не только '
+            'до переменных, прочитанных config.py'
+        )
+        assert templates.SHOW_LESSON is True
+        assert breaker.PRACTICUM.failure_threshold == 2, (
+            'Предохранитель, созданный при импорте, должен брать порог '
+            'из настроек'
+        )
+        assert metrics.METRICS_PORT == 9100
+        assert outbox.OUTBOX_BATCH == 10
+        assert http_pool.TIMEOUT == (3.05, 4.0)
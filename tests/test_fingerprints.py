@@ -0,0 +1,77 @@
+import pytest
+from utils import RecordingBot
+
+
+class TestFingerprints:
+
+    def test_body_digest_ignores_current_date(self):
+        import fingerprints
+
+        first = fingerprints.body_digest(
+            b'{"homeworks": [], "current_date": 1000198000}')
+        second = fingerprints.body_digest(
+            b'{"homeworks": [], "current_date": 1000198999}')
+        assert first[0] == second[0] and second[1] == 1000198999, (
+            'Отпечаток не должен зависеть от current_date'
+        )
+        changed = fingerprints.body_digest(
+            b'{"homeworks": [{}], "current_date": 1000198999}')
+        assert changed[0] != first[0]
+
+    @pytest.mark.parametrize('etag, reason', [
+        (False, 'unchanged'), (True, 'not_modified')])
+    def test_unchanged_polls_are_skipped(self, monkeypatch, etag, reason):
+        import fingerprints
+        import homework
+        import tenants
+        from benchmarks.stub_server import start_stub
+
+        stats = fingerprints.Stats()
+        monkeypatch.setattr(fingerprints, 'STATS', stats)
+        server, url = start_stub(churn=1.0, etag=etag, seed=1,
+                                 clock=lambda: 1000198000.0)
+        monkeypatch.setattr(homework, 'ENDPOINT', url)
+        tenant = tenants.Tenant('token', 1, timestamp=1)
+        bot = RecordingBot()
+        assert tenants.poll_if_changed(bot, tenant) == [
+            ('token-1', 'reviewing')]
+        server.RequestHandlerClass.state.churn = 0.0
+        for _ in range(3):
+            assert tenants.poll_if_changed(bot, tenant) == [
+                ('token-1', 'reviewing')], (
+                'Для пропущенного разбора расписание получает прошлые статусы'
+            )
+        server.shutdown()
+        report = stats.report()
+        assert report[reason] == 3 and report['skipped_percent'] == 75, (
+            'Ответы с теми же домашками не должны разбираться заново'
+        )
+        assert len(bot.sent) == 1
+
+    def test_failed_processing_is_retried(self, monkeypatch):
+        import fingerprints
+        import homework
+        import tenants
+        from benchmarks.stub_server import start_stub
+
+        monkeypatch.setattr(fingerprints, 'STATS', fingerprints.Stats())
+        server, url = start_stub(churn=1.0, seed=1,
+                                 clock=lambda: 1000198000.0)
+        monkeypatch.setattr(homework, 'ENDPOINT', url)
+        tenant = tenants.Tenant('token', 1, timestamp=1)
+        apply_response = tenants.apply_response
+
+        def broken_apply(*args, **kwargs):
+            raise ConnectionError('хранилище недоступно')
+
+        monkeypatch.setattr(tenants, 'apply_response', broken_apply)
+        with pytest.raises(ConnectionError):
+            tenants.poll_if_changed(RecordingBot(), tenant)
+        monkeypatch.setattr(tenants, 'apply_response', apply_response)
+        server.RequestHandlerClass.state.churn = 0.0
+        bot = RecordingBot()
+        tenants.poll_if_changed(bot, tenant)
+        server.shutdown()
+        assert len(bot.sent) == 1, (
+            'Ответ, обработка которого упала, должен разбираться повторно'
+        )
@@ -0,0 +1,110 @@
+from http import HTTPStatus
+from types import SimpleNamespace
+
+import requests
+from utils import MockResponse
+
+
+class MockTelegramBot:
+
+    def __init__(self):
+        self.sent = []
+        self.deleted = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        self.sent.append((chat_id, text))
+
+    def delete_message(self, chat_id=None, message_id=None, **kwargs):
+        self.deleted.append((chat_id, message_id))
+
+
+def make_update(update_id, chat_id, text):
+    message = SimpleNamespace(chat_id=chat_id, message_id=update_id,
+                              text=text)
+    return SimpleNamespace(update_id=update_id, message=message)
+
+
+def mock_get(url, headers=None, **kwargs):
+    if headers['Authorization'] == 'OAuth bad':
+        return MockResponse(http_status=HTTPStatus.UNAUTHORIZED)
+    return MockResponse()
+
+
+class TestFrontend:
+
+    def test_start_stop_commands(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(requests, 'get', mock_get)
+
+        import frontend
+        import state
+        import tenants
+
+        bot = MockTelegramBot()
+        registry = tenants.Registry()
+        store = state.StateStore(str(tmp_path / 'state.sqlite3'))
+        poller = frontend.UpdatePoller(bot, registry, bot, store, workers=2)
+        poller.submit(make_update(1, 10, '/start good')).result()
+        assert 'good' in registry and registry.get('good').chat_id == 10, (
+            'Команда /start с верным токеном должна оформлять подписку'
+        )
+        assert registry.changed.is_set(), (
+            'Цикл опроса должен узнавать о новой подписке'
+        )
+        assert bot.deleted == [(10, 1)], (
+            'Сообщение с токеном должно удаляться из чата'
+        )
+        assert store.subscriptions() == [('good', '10')]
+        assert poller.offset == 2
+
+        poller.submit(make_update(2, 11, '/start bad')).result()
+        assert 'bad' not in registry, (
+            'Токен, который не принял Практикум, не должен подписываться'
+        )
+        assert bot.deleted == [(10, 1), (11, 2)], (
+            'Сообщение с неверным токеном тоже должно удаляться'
+        )
+
+        poller.submit(make_update(3, 10, '/stop')).result()
+        assert len(registry) == 0 and store.subscriptions() == []
+        poller.stop()
+        assert [chat for chat, _ in bot.sent] == [10, 11, 10]
+
+    def test_lang_command(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(requests, 'get', mock_get)
+
+        import frontend
+        import state
+        import tenants
+
+        bot = MockTelegramBot()
+        registry = tenants.Registry()
+        store = state.StateStore(str(tmp_path / 'state.sqlite3'))
+        poller = frontend.UpdatePoller(bot, registry, bot, store, workers=1)
+        poller.submit(make_update(1, 10, '/start good')).result()
+        poller.submit(make_update(2, 10, '/lang EN')).result()
+        poller.submit(make_update(3, 10, '/lang de')).result()
+        poller.stop()
+        assert registry.get('good').locale == 'en', (
+            'Команда /lang должна менять язык уведомлений подписки'
+        )
+        assert state.StateStore(
+            str(tmp_path / 'state.sqlite3')).get_locale(10) == 'en', (
+            'Язык чата должен сохраняться в хранилище'
+        )
+        assert bot.sent[-1][1].startswith('Доступные языки')
+
+    def test_burst_is_processed_concurrently(self, monkeypatch):
+        monkeypatch.setattr(requests, 'get', mock_get)
+
+        import frontend
+        import tenants
+
+        bot = MockTelegramBot()
+        registry = tenants.Registry()
+        poller = frontend.UpdatePoller(bot, registry, bot, workers=4)
+        futures = [poller.submit(make_update(n, n, f'/start token-{n}'))
+                   for n in range(50)]
+        for future in futures:
+            future.result()
+        poller.stop()
+        assert len(registry) == 50 and len(bot.sent) == 50
@@ -0,0 +1,52 @@
+class TestHistory:
+
+    def test_turnaround_percentiles(self):
+        import history
+
+        log = history.History()
+        day = 86400
+        start = 1643673600
+        log.append(1, 'hw1', 'reviewing', start)
+        log.append(1, 'hw1', 'rejected', start + day)
+        log.append(1, 'hw1', 'reviewing', start + 2 * day)
+        log.append(1, 'hw1', 'approved', start + 5 * day)
+        log.append(2, 'hw1', 'reviewing', start)
+        log.append(2, 'hw1', 'approved', start + 2 * day)
+        log.append(2, 'hw2', 'reviewing', start + 31 * day)
+
+        summary = log.turnaround('hw1')
+        assert summary['count'] == 3, (
+            'Каждый круг проверки от reviewing до вердикта считается отдельно'
+        )
+        assert summary['p50'] == 2 * day and summary['p99'] == 3 * day
+        assert log.turnaround('hw2')['count'] == 0 and log.in_review() == 1
+        assert log.per_cohort()['2022-02']['count'] == 3
+        assert log.window(start, start + 3 * day)['count'] == 2, (
+            'В окно попадают проверки, закончившиеся внутри него'
+        )
+        assert log.timeline(1, 'hw1') == [
+            ('reviewing', start), ('rejected', start + day),
+            ('reviewing', start + 2 * day), ('approved', start + 5 * day)]
+
+    def test_transitions_logged_in_store(self, tmp_path):
+        import history
+        import homework
+        import state
+
+        store = state.StateStore(str(tmp_path / 'state.sqlite3'))
+        for status, updated in (('reviewing', '2022-02-01T10:00:00Z'),
+                                ('reviewing', '2022-02-01T10:00:00Z'),
+                                ('approved', '2022-02-02T12:30:00Z')):
+            homework.enqueue_status(store, 1, 'hw1', status, 'текст', updated)
+        store.flush()
+
+        log = history.History().load(store)
+        assert len(log) == 2, 'Повтор статуса не должен попадать в журнал'
+        assert log.turnaround('hw1')['p50'] == 26 * 3600 + 1800, (
+            'Время проверки считается по date_updated из ответа API'
+        )
+        homework.enqueue_status(store, 1, 'hw2', 'reviewing', 'текст')
+        store.flush()
+        assert len(log.load(store)) == 3, (
+            'Повторная загрузка должна дочитывать только новые записи'
+        )
@@ -0,0 +1,87 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+
+class JsonHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = json.dumps({'homeworks': [], 'current_date': 1}).encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestHttpPool:
+
+    def test_session_reuses_connection(self, monkeypatch):
+        import homework
+        import http_pool
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), JsonHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        monkeypatch.setattr(
+            homework, 'ENDPOINT',
+            f'http://127.0.0.1:{server.server_address[1]}/'
+            'api/user_api/homework_statuses/'
+        )
+        session = http_pool.make_session(pool_size=2)
+        try:
+            for _ in range(5):
+                homework.request_api(1, homework.make_headers('t'), session)
+        finally:
+            server.shutdown()
+            server.server_close()
+        stats = http_pool.connection_stats(session)
+        assert stats == {'connections': 1, 'requests': 5, 'reused': 4}, (
+            'Проверьте, что сессия переиспользует keep-alive соединение'
+        )
+
+    def test_request_api_passes_timeout(self, monkeypatch):
+        seen = {}
+
+        class Response:
+            status_code = 200
+
+            def json(self):
+                return {'homeworks': [], 'current_date': 1}
+
+        def mock_get(url, **kwargs):
+            seen.update(kwargs)
+            return Response()
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+
+        import homework
+        import http_pool
+
+        homework.get_api_answer(1)
+        assert seen['timeout'] == http_pool.TIMEOUT, (
+            'Проверьте, что запрос к API выполняется с таймаутами'
+        )
+
+    def test_request_api_network_error(self, monkeypatch):
+        def mock_get(url, **kwargs):
+            raise requests.ConnectTimeout('timeout')
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+
+        import exceptions
+        import homework
+
+        try:
+            homework.get_api_answer(1)
+        except exceptions.ApiNotResponse:
+            pass
+        else:
+            assert False, (
+                'Сетевые ошибки requests должны превращаться в ApiNotResponse'
+            )
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+import exceptions
+
+RESPONSE = {
+    'current_date': 1000198000,
+    'homeworks': [
+        {'homework_name': 'Проект «Спринт 7»', 'status': 'approved',
+         'id': 123, 'reviewer_comment': 'Всё нравится'},
+        {'homework_name': 'hw2', 'status': 'reviewing', 'id': 124},
+    ],
+    'extra': {'nested': [1, 2, 3]},
+}
+
+
+def chunked(data, size):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+class TestJsonStream:
+
+    @pytest.mark.parametrize('size', [1, 2, 7, 64, 4096])
+    def test_matches_json_loads(self, size):
+        import json_stream
+
+        body = json.dumps(RESPONSE, ensure_ascii=False, indent=1).encode()
+        stream = json_stream.HomeworkStream(chunked(body, size))
+        assert list(stream) == RESPONSE['homeworks'], (
+            'Потоковый разбор должен давать те же домашки, что json.loads'
+        )
+        assert stream.current_date == 1000198000
+        assert stream.fields['extra'] == RESPONSE['extra']
+
+    @pytest.mark.parametrize('body, error', [
+        (b'', exceptions.ApiEmptyResponse),
+        (b'[{"homeworks": []}]', TypeError),
+        (b'{"current_date": 1}', KeyError),
+        (b'{"homeworks": {"homework_name": "hw"}}', TypeError),
+        (b'{"homeworks": [1, 2]}', TypeError),
+    ])
+    def test_invalid_responses(self, body, error):
+        import json_stream
+
+        with pytest.raises(error):
+            list(json_stream.iter_homeworks(chunked(body, 3)))
+
+    def test_truncated_response(self):
+        import json_stream
+
+        body = json.dumps(RESPONSE).encode()[:-20]
+        with pytest.raises(json.JSONDecodeError):
+            list(json_stream.iter_homeworks(chunked(body, 16)))
@@ -0,0 +1,129 @@
+from utils import FakeClock
+
+
+def make_registry(count):
+    import tenants
+
+    registry = tenants.Registry()
+    for number in range(count):
+        registry.subscribe(f'token{number}', number, timestamp=1)
+    return registry
+
+
+class TestLeases:
+
+    def test_fencing_token_grows_on_takeover(self, tmp_path):
+        import leases
+
+        clock = FakeClock(1000.0)
+        store = leases.SqliteLeaseStore(str(tmp_path / 'leases.sqlite3'),
+                                        clock)
+        first = store.acquire('key', 'a', 30)
+        assert store.acquire('key', 'b', 30) is None, (
+            'Занятую аренду не должен захватить другой узел'
+        )
+        assert store.renew(first, 30, cursor=500)
+        clock.now += 31
+        second = store.acquire('key', 'b', 30)
+        assert second.token > first.token and second.cursor == 500, (
+            'Новый владелец получает больший токен и курсор прежнего'
+        )
+        assert not store.renew(first, 30, cursor=1), (
+            'Узел с устаревшим токеном не должен продлевать аренду'
+        )
+        store.release(second, cursor=700)
+        assert store.acquire('key', 'a', 30).cursor == 700
+
+    def test_nodes_split_and_fail_over(self, tmp_path):
+        import leases
+
+        clock = FakeClock(1000.0)
+        path = str(tmp_path / 'leases.sqlite3')
+        everyone = make_registry(100)
+        nodes = [
+            leases.Coordinator(leases.SqliteLeaseStore(path, clock), name,
+                               load_all=lambda: everyone, ttl=30,
+                               clock=clock)
+            for name in ('a', 'b')
+        ]
+        for _ in range(2):
+            for node in nodes:
+                node.tick()
+        owned = [set(node.held) for node in nodes]
+        assert owned[0] and owned[1] and not owned[0] & owned[1], (
+            'Узлы должны делить подписки без пересечений'
+        )
+        assert len(owned[0] | owned[1]) == 100
+        assert all(tenant.timestamp == 1 for tenant in nodes[0].registry)
+
+        for tenant in nodes[1].registry:
+            tenant.timestamp = 42
+        nodes[1].tick()
+        clock.now += 31
+        assert nodes[0].tick() == 100, (
+            'Подписки упавшего узла должны перейти к живому'
+        )
+        moved = nodes[0].registry.get(next(iter(owned[1])))
+        assert moved.timestamp == 42, (
+            'Новый владелец продолжает с курсора, сохранённого при продлении'
+        )
+        assert nodes[1].tick() == 0 and not nodes[1].held, (
+            'Проснувшийся узел не должен опрашивать перехваченные подписки'
+        )
+
+    def test_lost_store_stops_polling(self, tmp_path):
+        import leases
+
+        class BrokenStore:
+            def __getattr__(self, name):
+                raise ConnectionError('нет связи')
+
+        clock = FakeClock(1000.0)
+        store = leases.SqliteLeaseStore(str(tmp_path / 'leases.sqlite3'),
+                                        clock)
+        everyone = make_registry(3)
+        node = leases.Coordinator(store, 'a', load_all=lambda: everyone,
+                                  ttl=30, clock=clock)
+        assert node.tick() == 3
+        node.leases = BrokenStore()
+        clock.now += 10
+        assert node.tick() == 3
+        clock.now += 6
+        assert node.tick() == 0, (
+            'Без продления узел должен бросить подписки до истечения аренды'
+        )
+
+    def test_stalled_renewal_fences_polling(self, tmp_path):
+        import leases
+        import models
+        import state
+        import tenants
+
+        clock = FakeClock(1000.0)
+        store = leases.SqliteLeaseStore(str(tmp_path / 'leases.sqlite3'),
+                                        clock)
+        everyone = make_registry(2)
+        node = leases.Coordinator(store, 'a', load_all=lambda: everyone,
+                                  ttl=30, clock=clock)
+        node.tick()
+        tenant = node.registry.get('token0')
+        assert node.registry.holds(tenant)
+        assert node.registry.owned_chats() == {'0', '1'}
+
+        clock.now += 16
+        assert not node.registry.holds(tenant), (
+            'Подписку с истёкшим сроком аренды нельзя опрашивать, даже '
+            'если пульс ещё не отработал'
+        )
+        assert node.registry.owned_chats() == set(), (
+            'В чаты подписок с истёкшей арендой нельзя слать уведомления'
+        )
+        statuses = state.StateStore(str(tmp_path / 'state.sqlite3'))
+        record = models.make_homework({'homework_name': 'hw',
+                                       'status': 'approved'})
+        tenants.notify_status(None, tenant, record, statuses)
+        statuses.flush()
+        assert statuses.get_status(0, 'hw') is None, (
+            'Узел без аренды не должен записывать статус и уведомление'
+        )
+        statuses.close()
@@ -0,0 +1,43 @@
+import io
+import json
+import logging
+
+
+class TestLogSetup:
+
+    def test_json_output_with_context(self):
+        import log_setup
+
+        stream = io.StringIO()
+        logger = logging.getLogger('test.log_setup.json')
+        logger.propagate = False
+        listener = log_setup.setup_logging(
+            logger, level='INFO', fmt='json', stream=stream)
+        assert log_setup.setup_logging(logger) is listener, (
+            'Повторная настройка логгера не должна добавлять обработчики'
+        )
+        logger.info('Сообщение %s отправлено.', 'hw1', extra={'chat_id': 7})
+        logger.debug('Отладка не должна попадать в лог')
+        log_setup.stop_logging(listener)
+        lines = stream.getvalue().splitlines()
+        assert len(lines) == 1
+        record = json.loads(lines[0])
+        assert record['message'] == 'Сообщение hw1 отправлено.'
+        assert record['chat_id'] == 7 and record['level'] == 'INFO'
+
+    def test_repeated_messages_are_sampled(self):
+        import log_setup
+
+        sample = log_setup.SampleFilter(every=10)
+
+        def passed(chat_id, message='Нет новых статусов'):
+            record = logging.LogRecord(
+                'test', logging.DEBUG, __file__, 1, message, None, None)
+            record.chat_id = chat_id
+            return sample.filter(record)
+
+        assert sum(passed(1) for _ in range(30)) == 3, (
+            'Из повторов должна проходить каждая десятая запись'
+        )
+        assert passed(2), 'Первая запись по другому чату должна проходить'
+        assert all(passed(1, 'Другое сообщение') for _ in range(5))
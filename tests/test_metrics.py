@@ -0,0 +1,51 @@
+import socket
+import urllib.request
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class TestMetrics:
+
+    def test_disabled_metrics_do_nothing(self, monkeypatch):
+        import metrics
+
+        monkeypatch.setattr(metrics, 'ENABLED', False)
+        counter = metrics.Counter('test_disabled_total', 'Тест', ('error',))
+        counter.inc('KeyError')
+        assert list(counter.samples()) == [], (
+            'Выключенные метрики не должны ничего накапливать'
+        )
+        metrics.REGISTRY.remove(counter)
+
+    def test_render_and_endpoint(self, monkeypatch):
+        import metrics
+
+        monkeypatch.setattr(metrics, 'ENABLED', True)
+        histogram = metrics.Histogram(
+            'test_latency_seconds', 'Тест', buckets=(0.1, 1))
+        counter = metrics.Counter('test_errors_total', 'Тест', ('error',))
+        try:
+            for value in (0.05, 0.5, 5):
+                histogram.observe(value)
+            counter.inc('ApiNotResponse')
+            counter.inc('ApiNotResponse')
+            server = metrics.start_server(port=free_port())
+            url = f'http://127.0.0.1:{server.server_address[1]}/metrics'
+            with urllib.request.urlopen(url) as answer:
+                text = answer.read().decode()
+            server.shutdown()
+        finally:
+            metrics.REGISTRY.remove(histogram)
+            metrics.REGISTRY.remove(counter)
+        assert 'test_latency_seconds_bucket{le="0.1"} 1' in text
+        assert 'test_latency_seconds_bucket{le="1"} 2' in text
+        assert 'test_latency_seconds_bucket{le="+Inf"} 3' in text
+        assert 'test_latency_seconds_count 3' in text
+        assert 'test_errors_total{error="ApiNotResponse"} 2' in text, (
+            'Счётчик ошибок должен вести значения по классу исключения'
+        )
+        assert '# TYPE homework_api_request_seconds histogram' in text
@@ -0,0 +1,47 @@
+import pytest
+
+import exceptions
+
+
+class TestModels:
+
+    def test_records_match_parse_status(self):
+        import homework
+        import models
+
+        response = {
+            'homeworks': [
+                {'homework_name': 'hw1', 'status': 'approved',
+                 'lesson_name': 'Итоговый проект'},
+                {'homework_name': 'hw2', 'status': 'reviewing'},
+            ],
+            'current_date': 1000198000,
+        }
+        records = models.parse_homeworks(response)
+        assert [record.status for record in records] == [
+            models.HomeworkStatus.APPROVED, models.HomeworkStatus.REVIEWING]
+        assert records[0].lesson_name == 'Итоговый проект'
+        for record, hw in zip(records, response['homeworks']):
+            assert record.message == homework.parse_status(hw), (
+                'Текст уведомления записи должен совпадать с parse_status'
+            )
+        assert not hasattr(records[0], '__dict__'), (
+            'Запись домашки должна быть компактной (__slots__)'
+        )
+
+    @pytest.mark.parametrize('response, error', [
+        (None, exceptions.ApiEmptyResponse),
+        ([{'homeworks': []}], TypeError),
+        ({'current_date': 1}, KeyError),
+        ({'homeworks': {'homework_name': 'hw'}}, TypeError),
+        ({'homeworks': ['hw']}, TypeError),
+        ({'homeworks': [{'status': 'approved'}]}, KeyError),
+        ({'homeworks': [{'homework_name': 'hw'}]}, KeyError),
+        ({'homeworks': [{'homework_name': 'hw', 'status': 'unknown'}]},
+         exceptions.ApiStatusNotInDocs),
+    ])
+    def test_validation_errors(self, response, error):
+        import models
+
+        with pytest.raises(error):
+            models.parse_homeworks(response)
@@ -0,0 +1,203 @@
+import json
+import socketserver
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils import RecordingBot
+
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+    """Минимальный SMTP-сервер: принимает письма и складывает их в список."""
+
+    def handle(self):
+        self.wfile.write(b'220 localhost\r\n')
+        data = None
+        for line in self.rfile:
+            if data is not None:
+                if line.rstrip(b'\r\n') == b'.':
+                    self.server.messages.append(b''.join(data).decode())
+                    data = None
+                    self.wfile.write(b'250 OK\r\n')
+                else:
+                    data.append(line)
+                continue
+            command = line.strip().upper()
+            if command == b'DATA':
+                data = []
+                self.wfile.write(b'354 End data with <CR><LF>.<CR><LF>\r\n')
+            elif command == b'QUIT':
+                self.wfile.write(b'221 Bye\r\n')
+                return
+            else:
+                self.wfile.write(b'250 OK\r\n')
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        time.sleep(self.server.delay)
+        self.server.received.append(json.loads(body))
+        self.send_response(self.server.status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def start_smtp():
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), SmtpHandler)
+    server.daemon_threads = True
+    server.messages = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_webhook(delay=0.0, status=HTTPStatus.OK):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), WebhookHandler)
+    server.daemon_threads = True
+    server.received = []
+    server.delay = delay
+    server.status = status
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def make_sinks(smtp, webhook):
+    import notifiers
+
+    url = f'http://127.0.0.1:{webhook.server_address[1]}/hook'
+    return [
+        notifiers.Sink(notifiers.WebhookNotifier(url, timeout=5), workers=1),
+        notifiers.Sink(notifiers.SmtpNotifier(
+            '127.0.0.1', smtp.server_address[1], 'bot@localhost',
+            ['mentor@localhost'], timeout=5), workers=1),
+    ]
+
+
+class TestNotifiers:
+
+    def test_slow_sink_does_not_delay_others(self):
+        import notifiers
+
+        smtp, webhook = start_smtp(), start_webhook(delay=1.0)
+        bot = RecordingBot()
+        fan_out = notifiers.FanOut(bot, make_sinks(smtp, webhook))
+        delivered = []
+        started = time.monotonic()
+        fan_out.send_message(chat_id=7, text='Работа проверена',
+                             callback=delivered.append)
+        assert time.monotonic() - started < 0.5, (
+            'Рассылка не должна ждать дополнительные приёмники'
+        )
+        assert bot.sent == [(7, 'Работа проверена')] and delivered == [True]
+        assert wait_for(lambda: smtp.messages), 'Письмо не пришло'
+        assert not webhook.received, (
+            'Письмо должно уйти, пока медленный webhook ещё отвечает'
+        )
+        assert 'Работа проверена' in smtp.messages[0]
+        fan_out.stop()
+        assert webhook.received == [{'chat_id': 7,
+                                     'text': 'Работа проверена'}]
+        smtp.shutdown()
+        webhook.shutdown()
+
+    def test_failed_sink_does_not_block_outbox(self, tmp_path):
+        import notifiers
+        import outbox
+        import state
+
+        smtp = start_smtp()
+        webhook = start_webhook(status=HTTPStatus.INTERNAL_SERVER_ERROR)
+        sinks = make_sinks(smtp, webhook)
+        store = state.StateStore(str(tmp_path / 'state.sqlite3'))
+        store.enqueue('1:hw1:approved:1', 1, 'Ура!')
+        store.flush()
+        fan_out = notifiers.FanOut(RecordingBot(), sinks)
+
+        outbox.deliver(fan_out, store)
+        fan_out.stop()
+
+        assert store.take_undelivered() == [], (
+            'Сбой webhook не должен мешать отметке о доставке в Telegram'
+        )
+        assert webhook.received and smtp.messages
+        assert sinks[0].deliver(1, 'Ура!') is False
+        smtp.shutdown()
+        webhook.shutdown()
+
+    def test_full_backlog_drops(self):
+        import notifiers
+
+        release = threading.Event()
+
+        class Blocked:
+            name = 'blocked'
+
+            def send(self, chat_id, text):
+                release.wait(5)
+
+        sink = notifiers.Sink(Blocked(), workers=1, backlog=1)
+        results = []
+        assert sink.submit(1, 'первое') is not None
+        assert sink.submit(1, 'второе', results.append) is None, (
+            'Сообщение сверх очереди приёмника должно отбрасываться'
+        )
+        assert results == [False]
+        release.set()
+        sink.stop()
+
+    def test_sinks_get_outbox_entries_once(self, tmp_path, monkeypatch):
+        import notifiers
+        import outbox
+        import state
+
+        class Sink:
+            def __init__(self, name, failures=0):
+                self.name = name
+                self.failures = failures
+                self.received = []
+
+            def submit(self, chat_id, text, callback=None):
+                self.received.append((chat_id, text))
+                delivered = len(self.received) > self.failures
+                callback(delivered)
+
+        class RejectingBot:
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                raise ConnectionError('Telegram отклонил сообщение')
+
+        monkeypatch.setattr(outbox, 'OUTBOX_MAX_ATTEMPTS', 3)
+        path = str(tmp_path / 'state.sqlite3')
+        store = state.StateStore(path)
+        store.enqueue('7:hw:approved:1', 7, 'Работа проверена')
+        store.flush()
+        webhook, smtp = Sink('webhook'), Sink('smtp', failures=1)
+        fan_out = notifiers.FanOut(RejectingBot(), [webhook, smtp])
+        for _ in range(5):
+            outbox.deliver(fan_out, store)
+        assert store.dead_letters(), 'Telegram должен был отклонить все'
+        assert webhook.received == [('7', 'Работа проверена')], (
+            'Приёмник должен получить уведомление один раз, даже если '
+            'Telegram его отклонил'
+        )
+        assert len(smtp.received) == 2, (
+            'Сбой приёмника должен повторяться отдельно от Telegram'
+        )
+        store.close()
+        store = state.StateStore(path)
+        outbox.deliver(notifiers.FanOut(RecordingBot(), [webhook, smtp]),
+                       store)
+        assert len(webhook.received) == 1 and len(smtp.received) == 2, (
+            'После перезапуска доставленное в приёмник не повторяется'
+        )
+        store.close()
@@ -0,0 +1,210 @@
+import multiprocessing
+import os
+
+import pytest
+from utils import MockResponse
+
+FAULTS = ('detected', 'flushed', 'sent', 'marked')
+HOMEWORKS = [
+    {'homework_name': 'hw1', 'status': 'approved',
+     'date_updated': '2020-02-13T14:40:57Z'},
+    {'homework_name': 'hw2', 'status': 'rejected',
+     'date_updated': '2020-02-14T10:00:00Z'},
+]
+
+
+class FileBot:
+    """Бот, пишущий отправленное в файл: файл переживает падение."""
+
+    def __init__(self, path, fault=None):
+        self.path = path
+        self.fault = fault
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write(text.replace('\n', ' ') + '\n')
+        if self.fault == 'sent':
+            os._exit(1)
+
+
+def run_cycle(db_path, sent_path, fault=None):
+    """Цикл опроса, который «убивает» процесс на шаге `fault`."""
+    import requests
+
+    import state
+    import tenants
+
+    requests.get = lambda url, **kwargs: MockResponse(HOMEWORKS)
+
+    def die_after(func):
+        def wrapper(*args, **kwargs):
+            result = func(*args, **kwargs)
+            os._exit(1)
+            return result
+        return wrapper
+
+    if fault == 'detected':
+        state.StateStore.flush = lambda self: os._exit(1)
+    elif fault == 'flushed':
+        state.StateStore.flush = die_after(state.StateStore.flush)
+    elif fault == 'marked':
+        state.StateStore.mark_delivered = die_after(
+            state.StateStore.mark_delivered)
+    store = state.StateStore(db_path)
+    registry = tenants.Registry()
+    registry.subscribe('token', 1, timestamp=store.get_cursor('token', 1))
+    bot = FileBot(sent_path, fault)
+    tenants.poll_all(bot, registry, store=store)
+    tenants.save_state(registry, store, bot)
+
+
+def run_process(*args):
+    process = multiprocessing.get_context('spawn').Process(
+        target=run_cycle, args=args)
+    process.start()
+    process.join(30)
+    return process.exitcode
+
+
+class TestOutbox:
+
+    @pytest.mark.parametrize('fault', FAULTS)
+    def test_restart_delivers_each_status_once(self, tmp_path, fault):
+        db_path = str(tmp_path / 'state.sqlite3')
+        sent_path = str(tmp_path / 'sent.txt')
+        assert run_process(db_path, sent_path, fault) == 1
+        assert run_process(db_path, sent_path) == 0
+        assert run_process(db_path, sent_path) == 0
+        with open(sent_path, encoding='utf-8') as file:
+            sent = file.read().splitlines()
+        expected = 1 if fault != 'sent' else 2
+        assert sent.count(sent[0]) == expected, (
+            'После падения уведомление не должно теряться или '
+            'повторяться, кроме падения между отправкой и отметкой'
+        )
+        assert len(set(sent)) == 2 and len(sent) == 1 + expected, (
+            'После перезапуска должны доставляться все смены статусов'
+        )
+
+    def test_failed_send_stays_in_outbox(self, tmp_path):
+        import outbox
+        import state
+
+        class BrokenBot:
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                raise ConnectionError('Telegram недоступен')
+
+        store = state.StateStore(str(tmp_path / 'state.sqlite3'))
+        store.enqueue('1:hw:approved:1', 1, 'статус')
+        store.enqueue('1:hw:approved:1', 1, 'статус')
+        store.flush()
+        assert outbox.deliver(BrokenBot(), store) == 1, (
+            'Повтор с тем же ключом идемпотентности не должен ставиться'
+        )
+        sent = []
+
+        class Bot:
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                sent.append((chat_id, text))
+
+        assert outbox.deliver(Bot(), store) == 1, (
+            'Упавшая отправка должна остаться в outbox'
+        )
+        assert outbox.deliver(Bot(), store) == 0
+        assert sent == [('1', 'статус')]
+
+    def test_send_queue_confirms_delivery(self, tmp_path):
+        import outbox
+        import send_queue
+        import state
+
+        sent = []
+
+        class Bot:
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                sent.append(text)
+
+        store = state.StateStore(str(tmp_path / 'state.sqlite3'))
+        store.enqueue('key', 1, 'статус')
+        store.flush()
+        queue = send_queue.SendQueue(Bot(), global_rate=1000, chat_rate=1000)
+        assert outbox.deliver(queue, store) == 1
+        assert outbox.deliver(queue, store) == 0, (
+            'Уведомление в очереди отправки не должно браться повторно'
+        )
+        queue.start()
+        queue.stop(timeout=5)
+        assert sent == ['статус'] and store.take_undelivered() == []
+
+    def test_dead_letter_after_max_attempts(self, tmp_path, monkeypatch):
+        import sqlite3
+
+        import outbox
+        import state
+
+        class BrokenBot:
+            calls = 0
+
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                BrokenBot.calls += 1
+                raise ConnectionError('Telegram отклонил сообщение')
+
+        path = str(tmp_path / 'state.sqlite3')
+        conn = sqlite3.connect(path)
+        with conn:
+            conn.execute('CREATE TABLE outbox (id INTEGER PRIMARY KEY '
+                         'AUTOINCREMENT, key TEXT NOT NULL UNIQUE, chat_id '
+                         'TEXT NOT NULL, text TEXT NOT NULL, created_at '
+                         'INTEGER NOT NULL, delivered_at INTEGER)')
+            conn.execute("INSERT INTO outbox (key, chat_id, text, "
+                         "created_at) VALUES ('old', '1', 'старое', 0)")
+        conn.close()
+        monkeypatch.setattr(outbox, 'OUTBOX_MAX_ATTEMPTS', 3)
+        store = state.StateStore(path)
+        for _ in range(5):
+            outbox.deliver(BrokenBot(), store)
+        assert BrokenBot.calls == 3, (
+            'Уведомление не должно отправляться больше OUTBOX_MAX_ATTEMPTS '
+            'раз'
+        )
+        assert store.take_undelivered() == [], (
+            'Отложенное уведомление не должно возвращаться в очередь'
+        )
+        assert store.dead_letters() == [(1, '1', 'старое', 3)], (
+            'Отложенное уведомление должно оставаться в базе'
+        )
+        store.close()
+
+    def test_two_stores_share_outbox_once(self, tmp_path):
+        import outbox
+        import state
+
+        path = str(tmp_path / 'state.sqlite3')
+        first = state.StateStore(path, owner='worker-0')
+        second = state.StateStore(path, owner='worker-1')
+        for number in range(10):
+            first.enqueue(f'key-{number}', number, f'статус {number}')
+        first.flush()
+        sent = []
+
+        class Bot:
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                sent.append(text)
+
+        held = first.take_undelivered(limit=3)
+        assert outbox.deliver(Bot(), second) == 7, (
+            'Воркер не должен забирать уведомления, которые шлёт другой'
+        )
+        assert outbox.deliver(Bot(), first) == 0
+        first.close()
+        restarted = state.StateStore(path, owner='worker-0')
+        assert outbox.deliver(Bot(), restarted) == len(held), (
+            'Перезапущенный воркер должен забрать свои неотправленные '
+            'уведомления назад'
+        )
+        assert sorted(sent) == sorted(f'статус {number}'
+                                      for number in range(10)), (
+            'Каждое уведомление должно уйти ровно один раз'
+        )
+        restarted.close()
+        second.close()
@@ -0,0 +1,79 @@
+import random
+
+import exceptions
+
+
+class TestScheduler:
+
+    def test_timetable_pops_in_due_order(self):
+        import scheduler
+
+        timetable = scheduler.Timetable()
+        first, second, third = (scheduler.PollState() for _ in range(3))
+        timetable.schedule(first, 30)
+        timetable.schedule(second, 10)
+        timetable.schedule(third, 20)
+        timetable.schedule(first, 5)
+        assert timetable.next_due() == 5
+        assert timetable.pop_due(20) == [first, second, third], (
+            'Опросы должны извлекаться по сроку, перенос заменяет старый срок'
+        )
+        assert timetable.pop_due(100) == [], (
+            'Устаревшая запись после переноса не должна извлекаться'
+        )
+        assert timetable.next_due() is None
+
+    def test_reviewing_polls_faster_than_idle(self):
+        import scheduler
+
+        rng = random.Random(1)
+        poll_state = scheduler.PollState()
+        reviewing = scheduler.next_delay(
+            poll_state, [('hw1', 'reviewing')], rng=rng)
+        assert reviewing < 600, (
+            'Пока работа на ревью, опрос должен быть чаще RETRY_TIME'
+        )
+        scheduler.next_delay(poll_state, [('hw1', 'approved')], rng=rng)
+        delays = [scheduler.next_delay(poll_state, [], rng=rng)
+                  for _ in range(scheduler.IDLE_AFTER + 5)]
+        assert delays[-1] > delays[0] and max(delays) <= (
+            scheduler.MAX_IDLE_INTERVAL * (1 + scheduler.JITTER)
+        ), 'Опрос неактивной подписки должен замедляться до предела'
+
+    def test_other_verdict_keeps_reviewing(self):
+        import scheduler
+
+        rng = random.Random(1)
+        poll_state = scheduler.PollState()
+        scheduler.next_delay(
+            poll_state, [('hw1', 'reviewing'), ('hw2', 'reviewing')], rng=rng)
+        delay = scheduler.next_delay(poll_state, [('hw2', 'approved')],
+                                     rng=rng)
+        assert poll_state.reviewing and delay < 600, (
+            'Вердикт по одной домашке не должен сбрасывать частый опрос, '
+            'пока другая ещё на ревью'
+        )
+        scheduler.next_delay(poll_state, [], rng=rng)
+        assert poll_state.reviewing, (
+            'Пустой ответ не должен сбрасывать ревью: API присылает '
+            'только изменения'
+        )
+        scheduler.next_delay(poll_state, [('hw1', 'rejected')], rng=rng)
+        assert not poll_state.reviewing
+
+    def test_backoff_on_api_errors(self):
+        import scheduler
+
+        rng = random.Random(1)
+        poll_state = scheduler.PollState()
+        error = exceptions.ApiNotResponse('нет ответа')
+        delays = [scheduler.next_delay(poll_state, error=error, rng=rng)
+                  for _ in range(12)]
+        assert delays[5] > delays[0], (
+            'Интервал должен расти с каждой ошибкой API'
+        )
+        assert max(delays) <= scheduler.MAX_ERROR_INTERVAL
+        scheduler.next_delay(poll_state, [], rng=rng)
+        assert poll_state.failures == 0, (
+            'Успешный опрос должен сбрасывать счётчик ошибок'
+        )
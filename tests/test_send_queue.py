@@ -0,0 +1,107 @@
+import threading
+
+from telegram.error import NetworkError, RetryAfter
+from utils import FakeClock
+
+
+class MockTelegramBot:
+
+    def __init__(self, failures=()):
+        self.sent = []
+        self.failures = list(failures)
+        self.delivered = threading.Event()
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        assert chat_id is not None and text is not None
+        if self.failures:
+            raise self.failures.pop(0)
+        self.sent.append((chat_id, text))
+        self.delivered.set()
+
+
+class TestSendQueue:
+
+    def test_token_bucket(self):
+        import send_queue
+
+        bucket = send_queue.TokenBucket(rate=2, capacity=2, now=0)
+        assert bucket.take(0) == 0 and bucket.take(0) == 0
+        assert bucket.take(0) == 0.5, (
+            'Пустое ведро должно сообщать, сколько ждать следующий токен'
+        )
+        assert bucket.take(0.5) == 0
+
+    def test_coalesces_messages_for_one_chat(self):
+        import send_queue
+
+        bot = MockTelegramBot()
+        queue = send_queue.SendQueue(bot)
+        queue.send_message(chat_id=1, text='первое')
+        queue.send_message(chat_id=1, text='второе')
+        queue.send_message(chat_id=2, text='третье')
+        assert queue.depth == 3
+        queue.start()
+        queue.stop(timeout=5)
+        assert sorted(bot.sent) == [(1, 'первое\nвторое'), (2, 'третье')], (
+            'Сообщения для одного чата должны склеиваться в одно'
+        )
+        stats = queue.stats()
+        assert stats['depth'] == 0 and stats['sent'] == 2
+        assert stats['coalesced'] == 1
+        assert stats['latency_p50'] is not None
+
+    def test_retry_after_delays_chat(self):
+        import send_queue
+
+        clock = FakeClock()
+        bot = MockTelegramBot(failures=[RetryAfter(30)])
+        queue = send_queue.SendQueue(bot, clock=clock)
+        queue.send_message(chat_id=1, text='статус')
+        queue.start()
+        assert not bot.delivered.wait(0.2), (
+            'После 429 сообщение не должно уходить раньше retry_after'
+        )
+        clock.now = 31
+        with queue._cond:
+            queue._cond.notify()
+        assert bot.delivered.wait(5)
+        queue.stop(timeout=5)
+        assert bot.sent == [(1, 'статус')]
+        assert queue.stats()['retried'] == 1
+
+    def test_gives_up_after_max_attempts(self, monkeypatch):
+        import send_queue
+
+        monkeypatch.setattr(send_queue, 'MAX_ATTEMPTS', 2)
+        clock = FakeClock()
+        bot = MockTelegramBot(failures=[NetworkError('сбой')] * 2)
+        queue = send_queue.SendQueue(bot, clock=clock)
+        queue.send_message(chat_id=1, text='статус')
+        queue.start()
+        while queue.stats()['retried'] < 1:
+            threading.Event().wait(0.01)
+        clock.now = 100
+        with queue._cond:
+            queue._cond.notify()
+        queue.stop(timeout=5)
+        assert bot.sent == [] and queue.stats()['failed'] == 1
+
+    def test_unexpected_error_does_not_kill_worker(self):
+        import send_queue
+
+        bot = MockTelegramBot(failures=[ValueError('неожиданный сбой')])
+        queue = send_queue.SendQueue(bot, global_rate=1000, chat_rate=1000)
+        delivered = []
+        queue.send_message(chat_id=1, text='первое',
+                           callback=delivered.append)
+        queue.start()
+        queue.send_message(chat_id=2, text='второе',
+                           callback=delivered.append)
+        assert bot.delivered.wait(5), (
+            'Поток отправки должен пережить неожиданную ошибку'
+        )
+        queue.stop(timeout=5)
+        assert sorted(delivered) == [False, True], (
+            'Обработчик сообщения со сбоем должен получить False'
+        )
+        assert bot.sent == [(2, 'второе')] and queue.stats()['failed'] == 1
@@ -0,0 +1,84 @@
+import os
+import threading
+
+import requests
+from utils import MockResponse, RecordingBot
+
+
+class TestSnapshot:
+
+    def test_save_and_load(self, tmp_path):
+        import scheduler
+        import snapshot
+        path = os.path.join(tmp_path, 'snapshot.bin')
+        entries = []
+        for number in range(1000):
+            poll_state = scheduler.PollState()
+            poll_state.due = 1000.0 + number
+            poll_state.failures = number % 3
+            poll_state.idle_polls = number % 7
+            poll_state.reviewing = number % 2 == 0
+            entries.append((f'token-{number}', poll_state))
+        assert snapshot.save(entries, path) == 1000
+        with snapshot.load(path) as loaded:
+            assert len(loaded) == 1000, 'В снимке должны быть все подписки'
+            restored = scheduler.PollState()
+            assert loaded.recall('token-42', restored) == 1042.0, (
+                'Снимок должен возвращать срок опроса подписки'
+            )
+            assert (restored.failures, restored.idle_polls,
+                    restored.reviewing) == (0, 0, True), (
+                'Снимок должен возвращать счётчики расписания'
+            )
+            assert loaded.get('unknown') is None, (
+                'Для подписки не из снимка должно возвращаться None'
+            )
+        with open(path, 'r+b') as file:
+            file.truncate(100)
+        assert snapshot.load(path) is None, (
+            'Испорченный снимок должен пропускаться, а не ронять запуск'
+        )
+        assert snapshot.load(os.path.join(tmp_path, 'missing.bin')) is None
+
+    def test_run_scheduled_stops_and_resumes(self, tmp_path, monkeypatch):
+        import scheduler
+        import snapshot
+        import tenants
+        path = os.path.join(tmp_path, 'snapshot.bin')
+        stop = threading.Event()
+        registry = tenants.Registry()
+        polled = []
+
+        def mock_get(url, headers=None, params=None, **kwargs):
+            polled.append(headers['Authorization'])
+            stop.set()
+            registry.changed.set()
+            return MockResponse([{'homework_name': 'hw',
+                                  'status': 'reviewing'}])
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        for number in range(3):
+            registry.subscribe(f'token-{number}', number)
+        tenants.run_scheduled(RecordingBot(), registry, stop=stop,
+                              snapshot_path=path)
+        assert len(polled) == 1, (
+            'После остановки новые опросы не должны начинаться'
+        )
+        first = registry.get(polled[0][len('OAuth '):])
+        assert first.reviewing and first.due > 0, (
+            'Начатый опрос должен доводиться до конца'
+        )
+
+        restarted = tenants.Registry()
+        for number in range(3):
+            restarted.subscribe(f'token-{number}', number)
+        timetable = scheduler.Timetable()
+        assert snapshot.restore(restarted, timetable, 0.0, path) == 3, (
+            'После перезапуска подписки должны восстанавливаться из снимка'
+        )
+        assert restarted.get(first.token).due == first.due, (
+            'Подписка должна продолжать со своим сроком опроса'
+        )
+        assert restarted.get(first.token).reviewing, (
+            'Подписка должна продолжать со своими счётчиками'
+        )
@@ -0,0 +1,86 @@
+
+import requests
+from utils import MockResponse, RecordingBot
+
+
+class TestStateStore:
+
+    def test_transitions_survive_restart(self, tmp_path):
+        import state
+
+        path = str(tmp_path / 'state.sqlite3')
+        store = state.StateStore(path)
+        assert store.is_transition(1, 'hw1', 'reviewing')
+        store.record(1, 'hw1', 'reviewing', 1000198000)
+        store.set_cursor('token', 1000198000)
+        assert not store.is_transition(1, 'hw1', 'reviewing')
+        assert store.flush() == 2, (
+            'Проверьте, что flush пишет накопленные изменения одним пакетом'
+        )
+        store.close()
+
+        store = state.StateStore(path)
+        assert not store.is_transition('1', 'hw1', 'reviewing'), (
+            'Последний статус должен сохраняться между перезапусками'
+        )
+        assert store.is_transition(1, 'hw1', 'approved')
+        assert store.get_cursor('token') == 1000198000
+
+    def test_cursor_per_token(self, tmp_path):
+        import sqlite3
+
+        import state
+
+        path = str(tmp_path / 'state.sqlite3')
+        conn = sqlite3.connect(path)
+        with conn:
+            conn.execute('CREATE TABLE cursors (chat_id TEXT PRIMARY KEY, '
+                         'from_date INTEGER NOT NULL)')
+            conn.execute("INSERT INTO cursors VALUES ('1', 500)")
+        conn.close()
+        store = state.StateStore(path)
+        assert store.get_cursor('first', chat_id=1) == 500, (
+            'Курсор чата из прежней схемы должен достаться его подпискам'
+        )
+        store.set_cursor('first', 1000)
+        store.set_cursor('second', 2000)
+        store.close()
+
+        store = state.StateStore(path)
+        assert (store.get_cursor('first', chat_id=1),
+                store.get_cursor('second', chat_id=1)) == (1000, 2000), (
+            'Подписки одного чата не должны затирать курсоры друг друга'
+        )
+        assert store.get_cursor(state.token_id('first')) == 1000, (
+            'Курсор должен находиться и по id спрятанного токена'
+        )
+        conn = sqlite3.connect(path)
+        keys = [row[0] for row in conn.execute(
+            'SELECT token_id FROM token_cursors')]
+        conn.close()
+        assert 'first' not in keys, 'Токен не должен храниться открытым'
+
+    def test_alternating_homeworks_not_resent(self, monkeypatch, tmp_path):
+        homeworks = [
+            {'homework_name': 'hw1', 'status': 'reviewing'},
+            {'homework_name': 'hw2', 'status': 'approved'},
+        ]
+        monkeypatch.setattr(
+            requests, 'get', lambda url, **kwargs: MockResponse(homeworks))
+
+        import state
+        import tenants
+
+        store = state.StateStore(str(tmp_path / 'state.sqlite3'))
+        registry = tenants.Registry()
+        registry.subscribe('token', 1)
+        bot = RecordingBot()
+        tenants.poll_all(bot, registry, store=store)
+        tenants.poll_all(bot, registry, store=store)
+        assert len(bot.sent) == 2, (
+            'Повторно пришедшие статусы двух домашек не должны '
+            'отправляться снова'
+        )
+        homeworks[0]['status'] = 'approved'
+        tenants.poll_all(bot, registry, store=store)
+        assert len(bot.sent) == 3 and bot.sent[-1][1].endswith('Ура!')
@@ -0,0 +1,84 @@
+def echo_worker(index, conn, workers):
+    while True:
+        conn.send((index, conn.recv()))
+
+
+def make_registry(count):
+    import tenants
+
+    registry = tenants.Registry()
+    for number in range(count):
+        registry.subscribe(f'token{number}', number)
+    return registry
+
+
+class TestSupervisor:
+
+    def test_ring_moves_only_departed_share(self):
+        import ring
+
+        tokens = [f'token{number}' for number in range(3000)]
+        hash_ring = ring.HashRing(range(4))
+        before = {token: hash_ring.node_for(token) for token in tokens}
+        shares = [list(before.values()).count(node) for node in range(4)]
+        assert min(shares) > 3000 / 4 * 0.7, (
+            'Подписки должны делиться между воркерами примерно поровну'
+        )
+        hash_ring.remove(2)
+        after = {token: hash_ring.node_for(token) for token in tokens}
+        moved = [token for token in tokens if before[token] != after[token]]
+        assert all(before[token] == 2 for token in moved), (
+            'При уходе воркера должны переезжать только его подписки'
+        )
+        assert hash_ring.nodes == {0, 1, 3}
+
+    def test_shards_split_tokens_and_rebalance(self, tmp_path):
+        import state
+        import supervisor
+
+        everyone = make_registry(200)
+        store = state.StateStore(str(tmp_path / 'state.sqlite3'))
+        store.record(5, 'hw', 'approved')
+        store.set_cursor('token5', 1000)
+        store.set_locale(5, 'en')
+        store.flush()
+        shards = [supervisor.Shard(index, store, lambda: everyone)
+                  for index in range(2)]
+        for shard in shards:
+            shard.sync([0, 1])
+        owned = [set(tenant.token for tenant in shard.registry)
+                 for shard in shards]
+        assert not owned[0] & owned[1], (
+            'Одну подписку должен опрашивать только один воркер'
+        )
+        assert len(owned[0] | owned[1]) == 200
+
+        assert shards[0].sync([0]) == 200, (
+            'Подписки ушедшего воркера должны перейти к оставшемуся'
+        )
+        moved = shards[0].registry.get('token5')
+        assert moved.timestamp == 1000 and moved.locale == 'en', (
+            'Переехавшая подписка продолжает опрос с сохранённого курсора'
+        )
+        everyone.unsubscribe('token7')
+        shards[0].sync()
+        assert 'token7' not in shards[0].registry
+
+    def test_supervisor_rebalances_on_death_and_scale(self):
+        import supervisor
+
+        boss = supervisor.Supervisor(2, target=echo_worker,
+                                     restart_delay=60).start()
+        try:
+            for index in range(2):
+                assert boss.processes[index][1].recv() == (index, [0, 1])
+            boss.processes[1][0].terminate()
+            assert boss.check(timeout=10), (
+                'Смерть воркера должна менять состав кольца'
+            )
+            assert boss.processes[0][1].recv() == (0, [0])
+            boss.scale(2)
+            assert boss.processes[0][1].recv() == (0, [0, 1])
+            assert boss.processes[1][1].recv() == (1, [0, 1])
+        finally:
+            boss.stop()
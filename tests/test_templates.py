@@ -0,0 +1,52 @@
+import pytest
+
+import exceptions
+
+
+class TestTemplates:
+
+    def test_render_matches_legacy_message(self):
+        import homework
+        import templates
+
+        for status, verdict in homework.HOMEWORK_STATUSES.items():
+            assert templates.render('hw', status) == (
+                f'Изменился статус проверки работы "hw". {verdict}'
+            ), 'Текст по умолчанию должен совпадать с прежним'
+
+    def test_locale_and_cache(self):
+        import templates
+
+        english = templates.render('hw', 'approved', 'en')
+        assert english.startswith('Homework "hw"'), (
+            'Уведомление должно рендериться на языке чата'
+        )
+        assert templates.render('hw', 'approved', 'xx') == (
+            templates.render('hw', 'approved')
+        ), 'Неизвестный язык должен заменяться языком по умолчанию'
+        hits = templates.cache_info().hits
+        assert templates.render('hw', 'approved', 'en') == english
+        assert templates.cache_info().hits == hits, (
+            'Обычное уведомление не должно идти через кэш'
+        )
+        assert templates.normalize_locale('en-US') == 'en'
+        assert templates.normalize_locale('de') is None
+
+    def test_lesson_and_comment(self, monkeypatch):
+        import templates
+
+        assert 'Урок' not in templates.render(
+            'hw', 'rejected', lesson='Спринт 1', comment='Поправьте')
+        monkeypatch.setattr(templates, 'SHOW_LESSON', True)
+        monkeypatch.setattr(templates, 'SHOW_COMMENT', True)
+        message = templates.render('hw', 'rejected', lesson='Спринт 1',
+                                   comment='Поправьте')
+        assert message.endswith(
+            'Урок: Спринт 1.\nКомментарий ревьюера: Поправьте'
+        ), 'Урок и комментарий ревьюера должны добавляться по настройке'
+
+    def test_unknown_status(self):
+        import templates
+
+        with pytest.raises(exceptions.ApiStatusNotInDocs):
+            templates.render('hw', 'unknown')
@@ -0,0 +1,126 @@
+from http import HTTPStatus
+
+import requests
+from utils import MockResponse, RecordingBot
+
+
+class TestTenants:
+
+    def test_registry_subscribe(self):
+        import tenants
+
+        registry = tenants.Registry()
+        registry.subscribe('token-1', 1)
+        registry.subscribe('token-2', 2)
+        registry.subscribe('token-1', 3)
+        assert len(registry) == 2, (
+            'Повторная подписка с тем же токеном не должна дублироваться'
+        )
+        assert registry.get('token-1').chat_id == 3, (
+            'Повторная подписка должна обновлять чат'
+        )
+        registry.unsubscribe('token-2')
+        assert 'token-2' not in registry
+
+    def test_poll_all_uses_tenant_headers(self, monkeypatch):
+        seen = []
+
+        def mock_get(url, headers=None, params=None, **kwargs):
+            seen.append(headers['Authorization'])
+            return MockResponse([{
+                'homework_name': headers['Authorization'],
+                'status': 'approved',
+            }])
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+
+        import tenants
+
+        registry = tenants.Registry()
+        registry.subscribe('token-1', 1)
+        registry.subscribe('token-2', 2)
+        bot = RecordingBot()
+        assert tenants.poll_all(bot, registry) == 2
+        assert sorted(seen) == ['OAuth token-1', 'OAuth token-2'], (
+            'Каждая подписка должна опрашиваться со своим токеном'
+        )
+        assert sorted(chat for chat, _ in bot.sent) == [1, 2]
+
+        tenants.poll_all(bot, registry)
+        assert len(bot.sent) == 2, (
+            'Повторный статус не должен отправляться подписчику снова'
+        )
+
+    def test_poll_all_isolates_errors(self, monkeypatch):
+        def mock_get(url, headers=None, params=None, **kwargs):
+            if headers['Authorization'] == 'OAuth broken':
+                return MockResponse([], HTTPStatus.UNAUTHORIZED)
+            return MockResponse([])
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+
+        import tenants
+
+        registry = tenants.Registry()
+        registry.subscribe('broken', 1)
+        registry.subscribe('healthy', 2)
+        bot = RecordingBot()
+        assert tenants.poll_all(bot, registry) == 2
+        assert [chat for chat, _ in bot.sent] == [1], (
+            'Сбой одной подписки должен уходить только в её чат'
+        )
+
+    def test_outage_goes_to_operator_once(self, monkeypatch):
+        monkeypatch.setattr(
+            requests, 'get', lambda url, **kwargs: MockResponse(
+                [], HTTPStatus.INTERNAL_SERVER_ERROR))
+
+        import breaker
+        import homework
+        import tenants
+
+        clock = [0.0]
+        monkeypatch.setattr(breaker, 'PRACTICUM',
+                            breaker.CircuitBreaker('practicum-test'))
+        monkeypatch.setattr(homework, 'TELEGRAM_CHAT_ID', 'operator')
+        monkeypatch.setattr(tenants, 'OUTAGE_DIGEST', breaker.ErrorDigest(
+            interval=600, clock=lambda: clock[0]))
+        registry = tenants.Registry()
+        for number in range(50):
+            registry.subscribe(f'token-{number}', number)
+        bot = RecordingBot()
+        tenants.poll_all(bot, registry)
+        tenants.report_digest(bot)
+        assert [chat for chat, _ in bot.sent] == ['operator'], (
+            'Сбой всего API должен уходить одним сообщением оператору, '
+            'а не каждому подписчику'
+        )
+        clock[0] = 601
+        tenants.report_digest(bot)
+        assert [chat for chat, _ in bot.sent] == ['operator'] * 2, (
+            'Подавленные сбои API должны приходить оператору сводкой'
+        )
+        assert '49 раз' in bot.sent[1][1]
+
+    def test_cursor_follows_current_date(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(
+            requests, 'get', lambda url, **kwargs: MockResponse([]))
+
+        import state
+        import tenants
+
+        registry = tenants.Registry()
+        tenant = registry.subscribe('token-1', 1, timestamp=1)
+        tenants.poll_all(RecordingBot(), registry)
+        assert tenant.timestamp == 1000198000, (
+            'Курсор подписки должен браться из current_date ответа API'
+        )
+
+        path = str(tmp_path / 'state.sqlite3')
+        tenants.save_state(registry, state.StateStore(path))
+        restored = tenants.Registry()
+        restored.subscribe('token-1', 1, timestamp=1)
+        tenants.restore_cursors(restored, state.StateStore(path))
+        assert restored.get('token-1').timestamp == 1000198000, (
+            'После перезапуска опрос должен продолжаться с сохранённого курсора'
+        )
@@ -0,0 +1,120 @@
+import base64
+import os
+import sqlite3
+from utils import FakeClock
+
+KEY_A = base64.urlsafe_b64encode(b'a' * 32).decode()
+KEY_B = base64.urlsafe_b64encode(b'b' * 32).decode()
+
+
+class TestVault:
+
+    def make_vault(self, tmp_path, keys=f'old:{KEY_A}', **kwargs):
+        import vault
+        return vault.Vault(vault.Keyring(vault.parse_keys(keys)),
+                           os.path.join(tmp_path, 'state.db'), **kwargs)
+
+    def test_tokens_encrypted_at_rest(self, tmp_path):
+        import homework
+        vault = self.make_vault(tmp_path)
+        sealed = vault.put('secret-practicum-token')
+        assert vault.put('secret-practicum-token') == sealed, (
+            'Повторное сохранение токена должно вернуть тот же id'
+        )
+        vault.close()
+        with open(os.path.join(tmp_path, 'state.db'), 'rb') as file:
+            raw = file.read()
+        conn = sqlite3.connect(os.path.join(tmp_path, 'state.db'))
+        rows = conn.execute('SELECT ciphertext FROM vault').fetchall()
+        conn.close()
+        assert len(rows) == 1, 'В хранилище должна быть одна запись'
+        assert b'secret-practicum-token' not in raw + rows[0][0], (
+            'Токен не должен храниться в базе открытым текстом'
+        )
+        vault = self.make_vault(tmp_path)
+        assert vault.headers(sealed) == homework.make_headers(
+            'secret-practicum-token'), (
+            'Заголовки должны собираться из расшифрованного токена'
+        )
+
+    def test_cache_lru_and_ttl(self, tmp_path):
+        clock = FakeClock()
+        vault = self.make_vault(tmp_path, cache_size=2, ttl=60, clock=clock)
+        first, second, third = (vault.put(f'token-{i}') for i in range(3))
+        opened = []
+        original = vault.reveal
+
+        def reveal(sealed_id):
+            opened.append(sealed_id)
+            return original(sealed_id)
+
+        vault.reveal = reveal
+        headers = vault.headers(first)
+        assert vault.headers(first) is headers, (
+            'Повторный запрос заголовков должен брать их из кэша'
+        )
+        assert opened == [first], 'Попадание в кэш не должно расшифровывать'
+        vault.headers(second)
+        vault.headers(first)
+        vault.headers(third)
+        vault.headers(second)
+        assert opened == [first, second, third, second], (
+            'Кэш должен вытеснять давно не использованные записи'
+        )
+        clock.now = 61
+        vault.headers(first)
+        assert opened[-1] == first, (
+            'Запись кэша старше TTL должна расшифровываться заново'
+        )
+        assert (vault.hits, vault.misses) == (2, 5), (
+            'Хранилище должно считать попадания и промахи кэша'
+        )
+
+    def test_rotate(self, tmp_path):
+        import exceptions
+        import homework
+        import pytest
+        import vault as vault_module
+        vault = self.make_vault(tmp_path)
+        sealed = [vault.put(f'token-{i}') for i in range(5)]
+        cached = vault.headers(sealed[0])
+        keyring = vault_module.Keyring(
+            vault_module.parse_keys(f'new:{KEY_B},old:{KEY_A}'))
+        assert vault.rotate(keyring) == 5, (
+            'Ротация должна перешифровать все ключи данных'
+        )
+        assert vault.rotate() == 0, 'Повторная ротация ничего не делает'
+        assert vault.headers(sealed[0]) is cached, (
+            'Ротация не должна сбрасывать кэш заголовков'
+        )
+        vault.close()
+        rotated = self.make_vault(tmp_path, keys=f'new:{KEY_B}')
+        assert rotated.reveal(sealed[4]) == 'token-4', (
+            'После ротации токены должны читаться без старого ключа'
+        )
+        assert rotated.headers(sealed[1]) == homework.make_headers('token-1')
+        stale = self.make_vault(tmp_path, keys=f'old:{KEY_A}')
+        with pytest.raises(exceptions.TokenError):
+            stale.reveal(sealed[0])
+
+    def test_sealed_tenants(self, tmp_path, monkeypatch):
+        import homework
+        import state
+        import tenants
+        import vault
+        monkeypatch.setattr(homework, 'PRACTICUM_TOKEN', None)
+        monkeypatch.setattr(vault, 'VAULT', self.make_vault(tmp_path))
+        store = state.StateStore(os.path.join(tmp_path, 'state.db'))
+        store.save_subscription('plain-token', 100)
+        registry = tenants.load_subscriptions(
+            os.path.join(tmp_path, 'missing.txt'), store=store)
+        [(token, chat_id)] = store.subscriptions()
+        assert vault.is_sealed(token) and str(chat_id) == '100', (
+            'Открытый токен в базе подписок должен замениться на id'
+        )
+        tenant = registry.get(token)
+        assert tenant is not None, 'Подписка должна храниться по id токена'
+        assert tenant.headers == homework.make_headers('plain-token'), (
+            'Подписка по id должна получать заголовки из хранилища'
+        )
+        store.close()
@@ -1,3 +1,4 @@
+from http import HTTPStatus
 from inspect import signature
 from types import ModuleType
 
@@ -37,3 +38,36 @@ def check_default_var_exists(scope: ModuleType, var_name: str) -> None:
         f'{var_name} должна быть переменной, а не функцией.'
     )
 
+
+class MockResponse:
+    """Ответ API с заданными домашками и кодом статуса."""
+
+    def __init__(self, homeworks=None, http_status=HTTPStatus.OK,
+                 current_date=1000198000):
+        self.status_code = http_status
+        self.homeworks = [] if homeworks is None else homeworks
+        self.current_date = current_date
+
+    def json(self):
+        return {'homeworks': self.homeworks,
+                'current_date': self.current_date}
+
+
+class RecordingBot:
+    """Бот, запоминающий отправленные пары (chat_id, текст)."""
+
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+class FakeClock:
+    """Часы, которые тест переводит вручную через `now`."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
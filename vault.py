@@ -0,0 +1,284 @@
+import base64
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import config
+import exceptions
+import homework
+import state
+
+logger = logging.getLogger('homework.vault')
+
+PREFIX = state.TOKEN_PREFIX
+VAULT_KEYS = ''
+VAULT_CACHE_SIZE = 10000
+VAULT_CACHE_TTL = 3600
+NONCE_SIZE = 12
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS vault (
+    token_id TEXT PRIMARY KEY,
+    key_id TEXT NOT NULL,
+    wrapped_key BLOB NOT NULL,
+    nonce BLOB NOT NULL,
+    ciphertext BLOB NOT NULL
+) WITHOUT ROWID;
+'''
+
+VAULT = None
+
+
+def parse_keys(text):
+    """Ключи из `VAULT_KEYS`: `id:ключ,...`, первый — активный.
+
+    Ключ — 32 байта в urlsafe base64, например из
+    `base64.urlsafe_b64encode(os.urandom(32))`.
+    """
+    keys = []
+    for item in text.split(','):
+        key_id, _, encoded = item.strip().partition(':')
+        if not key_id:
+            continue
+        try:
+            key = base64.urlsafe_b64decode(encoded)
+        except ValueError:
+            key = b''
+        if len(key) != 32:
+            raise exceptions.ConfigError(
+                f'Ключ {key_id} в VAULT_KEYS должен быть 32 байтами в base64')
+        keys.append((key_id, key))
+    if not keys:
+        raise exceptions.ConfigError('В VAULT_KEYS нет ни одного ключа')
+    return keys
+
+
+token_id = state.token_id
+
+
+def is_sealed(token):
+    return token.startswith(PREFIX)
+
+
+class Keyring:
+    """Мастер-ключи хранилища: активным шифруются новые ключи данных.
+
+    Шифры AES-GCM создаются один раз при загрузке ключей, на каждую
+    расшифровку ключи заново не выводятся. Пакет `cryptography` нужен
+    только с хранилищем и импортируется здесь.
+    """
+
+    def __init__(self, keys):
+        from cryptography.exceptions import InvalidTag
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        self._aead = AESGCM
+        self._invalid = InvalidTag
+        self.ciphers = {key_id: AESGCM(key) for key_id, key in keys}
+        self.active = keys[0][0]
+
+    def wrap(self, data_key, aad):
+        nonce = os.urandom(NONCE_SIZE)
+        return self.active, nonce + self.ciphers[self.active].encrypt(
+            nonce, data_key, aad)
+
+    def unwrap(self, key_id, wrapped, aad):
+        cipher = self.ciphers.get(key_id)
+        if cipher is None:
+            raise exceptions.TokenError(
+                f'Мастер-ключа {key_id} нет в VAULT_KEYS')
+        try:
+            return cipher.decrypt(wrapped[:NONCE_SIZE], wrapped[NONCE_SIZE:],
+                                  aad)
+        except self._invalid as error:
+            raise exceptions.TokenError(
+                f'Ключ данных не расшифрован ключом {key_id}') from error
+
+    def seal(self, token, aad):
+        """Шифруем токен своим ключом данных, а его — мастер-ключом."""
+        data_key = self._aead.generate_key(256)
+        nonce = os.urandom(NONCE_SIZE)
+        ciphertext = self._aead(data_key).encrypt(nonce, token.encode(), aad)
+        key_id, wrapped = self.wrap(data_key, aad)
+        return key_id, wrapped, nonce, ciphertext
+
+    def open(self, key_id, wrapped, nonce, ciphertext, aad):
+        data_key = self.unwrap(key_id, wrapped, aad)
+        try:
+            token = self._aead(data_key).decrypt(nonce, ciphertext, aad)
+        except self._invalid as error:
+            raise exceptions.TokenError('Токен не расшифрован') from error
+        return token.decode()
+
+
+class Vault:
+    """Токены Практикума, зашифрованные конвертом, и кэш заголовков.
+
+    Каждый токен зашифрован своим ключом данных, ключ данных — активным
+    мастер-ключом; id токена входит в AAD обоих шифров, поэтому строки
+    нельзя переставить местами. Готовые заголовки `Authorization` лежат
+    в LRU-кэше на `cache_size` записей и живут `ttl` секунд: на горячем
+    пути опроса — только поиск в словаре. Ротация мастер-ключа
+    перешифровывает одни ключи данных, кэш и токены не трогает.
+    """
+
+    def __init__(self, keyring, path=None, cache_size=None, ttl=None,
+                 clock=time.monotonic):
+        self.keyring = keyring
+        self.cache_size = cache_size or VAULT_CACHE_SIZE
+        self.ttl = ttl or VAULT_CACHE_TTL
+        self.clock = clock
+        self._conn = sqlite3.connect(path or state.STATE_DB, timeout=30,
+                                     check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(
+                'SELECT COUNT(*) FROM vault').fetchone()[0]
+
+    def put(self, token):
+        """Кладём токен в хранилище и возвращаем его id."""
+        sealed_id = token_id(token)
+        with self._lock:
+            known = self._conn.execute(
+                'SELECT 1 FROM vault WHERE token_id = ?',
+                (sealed_id,)).fetchone()
+            if known is None:
+                with self._conn:
+                    self._conn.execute(
+                        'INSERT INTO vault (token_id, key_id, wrapped_key, '
+                        'nonce, ciphertext) VALUES (?, ?, ?, ?, ?)',
+                        (sealed_id, *self.keyring.seal(
+                            token, sealed_id.encode())))
+        return sealed_id
+
+    def reveal(self, sealed_id):
+        """Расшифровываем токен; нужно только при промахе кэша."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT key_id, wrapped_key, nonce, ciphertext FROM vault '
+                'WHERE token_id = ?', (sealed_id,)).fetchone()
+            keyring = self.keyring
+        if row is None:
+            raise exceptions.TokenError('Токена нет в хранилище')
+        return keyring.open(*row, sealed_id.encode())
+
+    def headers(self, sealed_id):
+        """Заголовки запроса к API для токена из хранилища."""
+        now = self.clock()
+        with self._lock:
+            entry = self._cache.get(sealed_id)
+            if entry is not None and entry[1] > now:
+                self._cache.move_to_end(sealed_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        headers = homework.make_headers(self.reveal(sealed_id))
+        with self._lock:
+            self._cache[sealed_id] = (headers, now + self.ttl)
+            self._cache.move_to_end(sealed_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return headers
+
+    def remove(self, sealed_id):
+        with self._lock, self._conn:
+            self._cache.pop(sealed_id, None)
+            self._conn.execute('DELETE FROM vault WHERE token_id = ?',
+                               (sealed_id,))
+
+    def rotate(self, keyring=None):
+        """Перешифровываем ключи данных активным мастер-ключом.
+
+        Опрос при этом не останавливается. Старый ключ можно убрать из
+        `VAULT_KEYS`, когда ротация закончилась. Возвращаем число
+        перешифрованных ключей.
+        """
+        with self._lock:
+            if keyring is not None:
+                self.keyring = keyring
+            keyring = self.keyring
+            rows = self._conn.execute(
+                'SELECT token_id, key_id, wrapped_key FROM vault '
+                'WHERE key_id != ?', (keyring.active,)).fetchall()
+            updates = []
+            for sealed_id, key_id, wrapped in rows:
+                aad = sealed_id.encode()
+                try:
+                    data_key = keyring.unwrap(key_id, wrapped, aad)
+                except exceptions.TokenError as error:
+                    logger.error('Не удалось перешифровать токен: %s', error)
+                    continue
+                updates.append((*keyring.wrap(data_key, aad), sealed_id))
+            with self._conn:
+                self._conn.executemany(
+                    'UPDATE vault SET key_id = ?, wrapped_key = ? '
+                    'WHERE token_id = ?', updates)
+        logger.info('Ключи данных перешифрованы ключом %s: %s',
+                    keyring.active, len(updates))
+        return len(updates)
+
+    def close(self):
+        self._conn.close()
+
+
+def apply_config(settings):
+    """Новые мастер-ключи сразу запускают ротацию открытого хранилища."""
+    global VAULT_KEYS, VAULT_CACHE_SIZE, VAULT_CACHE_TTL
+    changed = settings.vault_keys != VAULT_KEYS
+    VAULT_KEYS = settings.vault_keys
+    VAULT_CACHE_SIZE = settings.vault_cache_size
+    VAULT_CACHE_TTL = settings.vault_cache_ttl
+    if VAULT is not None and changed and VAULT_KEYS:
+        VAULT.rotate(Keyring(parse_keys(VAULT_KEYS)))
+
+
+config.on_reload(apply_config)
+
+
+def open_vault(path=None):
+    """Открываем хранилище, если заданы мастер-ключи `VAULT_KEYS`."""
+    global VAULT
+    if VAULT is None and VAULT_KEYS:
+        VAULT = Vault(Keyring(parse_keys(VAULT_KEYS)), path)
+    return VAULT
+
+
+def seal(token):
+    """Кладём токен в хранилище и возвращаем его id.
+
+    Без хранилища и для уже спрятанного токена возвращаем его как есть.
+    """
+    if VAULT is None or is_sealed(token):
+        return token
+    return VAULT.put(token)
+
+
+def headers_for(sealed_id):
+    if VAULT is None:
+        raise exceptions.TokenError('Хранилище токенов не настроено')
+    return VAULT.headers(sealed_id)
+
+
+def main():
+    """Перешифровываем ключи данных активным ключом из `VAULT_KEYS`.
+
+    Запуск: python vault.py rotate
+    """
+    config.setup(interval=0)
+    if sys.argv[1:] != ['rotate'] or open_vault() is None:
+        print('Запуск: VAULT_KEYS=... python vault.py rotate')
+        return
+    VAULT.rotate()
+
+
+if __name__ == '__main__':
+    main()